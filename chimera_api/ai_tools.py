@@ -1,14 +1,28 @@
+import os
+import asyncio
 import logging
 from datetime import datetime, timedelta, date as date_type
 from services import workout_service
 from services import plan_action_service
 from services.user_settings_service import update_coach_notes, get_user_settings
 from services.activity_filter_service import is_activity_included
+from services.plan_working_set import current_working_set
 from schemas import WorkoutCreate
 from db_client import supabase_admin
 
 logger = logging.getLogger(__name__)
 
+# Tools that only read; one model turn's reads run concurrently
+READ_ONLY_TOOLS = frozenset({
+    "get_upcoming_workouts",
+    "get_daily_logs",
+    "get_completed_activities",
+    "get_training_summary",
+})
+# Reads are abandoned after this; mutations always run to completion, since a
+# write cancelled part-way leaves an outcome the model can't know
+READ_TOOL_TIMEOUT_SECONDS = float(os.getenv("AGENT_TOOL_TIMEOUT_SECONDS", "15"))
+
 # --- TOOL DEFINITIONS ---
 tools_schema = [
     {
@@ -307,8 +321,19 @@ tools_schema = [
 ]
 
 
-# --- HELPER: Find Workout by Date ---
+# --- HELPERS: Plan reads (served from the run's working set when there is one) ---
+async def _workouts_between(user_id: str, start_range: str, end_range: str) -> list:
+    working_set = current_working_set(user_id)
+    if working_set:
+        return await working_set.between(start_range, end_range)
+    return await workout_service.get_workouts(user_id, start_range, end_range)
+
+
 async def _find_workout_on_day(date_iso: str, user_id: str, activity_type: str = None):
+    working_set = current_working_set(user_id)
+    if working_set:
+        return await working_set.find_on_day(date_type.fromisoformat(date_iso[:10]), activity_type)
+
     target_date = datetime.fromisoformat(date_iso.split("T")[0])
     start_range = target_date.replace(hour=0, minute=0, second=0).isoformat()
     end_range = target_date.replace(hour=23, minute=59, second=59).isoformat()
@@ -331,6 +356,8 @@ async def _find_workout_on_day(date_iso: str, user_id: str, activity_type: str =
 # --- EXECUTION LOGIC ---
 async def execute_tool_call(function_name, args, user_id: str):
     logger.info(f"Tool Execution: {function_name} | Args: {args}")
+    # Mutations write through to the run's working set, if any
+    working_set = current_working_set(user_id)
 
     # 1. CREATE
     if function_name == "create_workout":
@@ -347,6 +374,8 @@ async def execute_tool_call(function_name, args, user_id: str):
             status="planned",
         )
         result = await workout_service.create_workout(workout_data, user_id)
+        if working_set:
+            working_set.put(result)
         return {
             "status": "success",
             "action": "created",
@@ -385,7 +414,9 @@ async def execute_tool_call(function_name, args, user_id: str):
         if not updates:
             return {"status": "error", "message": "No changes requested."}
 
-        await workout_service.update_workout(target["id"], updates, user_id)
+        updated = await workout_service.update_workout(target["id"], updates, user_id)
+        if working_set:
+            working_set.put(updated)
         return {
             "status": "success",
             "action": "updated",
@@ -401,6 +432,8 @@ async def execute_tool_call(function_name, args, user_id: str):
             return {"status": "error", "message": "No workout found on that date to delete."}
 
         await workout_service.delete_workout(target["id"], user_id)
+        if working_set:
+            working_set.remove(target["id"])
         return {
             "status": "success",
             "action": "deleted",
@@ -417,7 +450,7 @@ async def execute_tool_call(function_name, args, user_id: str):
 
         start_range = f"{start}T00:00:00"
         end_range = f"{end}T23:59:59"
-        workouts = await workout_service.get_workouts(user_id, start_range, end_range)
+        workouts = await _workouts_between(user_id, start_range, end_range)
 
         return {
             "status": "success",
@@ -442,7 +475,7 @@ async def execute_tool_call(function_name, args, user_id: str):
 
         try:
             response = (
-                supabase_admin.table("daily_checkin")
+                await supabase_admin.table("daily_checkin")
                 .select("*")
                 .eq("user_id", user_id)
                 .gte("date", start)
@@ -497,7 +530,7 @@ async def execute_tool_call(function_name, args, user_id: str):
                 .lte("start_time", f"{end}T23:59:59")
                 .order("start_time", desc=False)
             )
-            response = query.execute()
+            response = await query.execute()
             all_activities = response.data or []
 
             # Filter to stats-included activities
@@ -536,19 +569,11 @@ async def execute_tool_call(function_name, args, user_id: str):
 
         try:
             # Get planned workouts in range
-            planned_resp = (
-                supabase_admin.table("planned_workouts")
-                .select("id, status, activity_type")
-                .eq("user_id", user_id)
-                .gte("start_time", start_str)
-                .lte("start_time", end_str)
-                .execute()
-            )
-            planned = planned_resp.data or []
+            planned = await _workouts_between(user_id, start_str, end_str)
 
             # Get completed activities in range (filtered by tracked types)
             completed_resp = (
-                supabase_admin.table("completed_activities")
+                await supabase_admin.table("completed_activities")
                 .select("id, original_activity_type, stats_override, stats_excluded")
                 .eq("user_id", user_id)
                 .gte("start_time", start_str)
@@ -602,6 +627,8 @@ async def execute_tool_call(function_name, args, user_id: str):
         result = await plan_action_service.move_workout(
             target["id"], new_date, user_id, source="agent"
         )
+        if working_set:
+            working_set.put(result)
         return {
             "status": "success",
             "action": "moved",
@@ -622,6 +649,8 @@ async def execute_tool_call(function_name, args, user_id: str):
         result = await plan_action_service.duplicate_workout(
             target["id"], target_date, user_id, source="agent"
         )
+        if working_set:
+            working_set.put(result)
         return {
             "status": "success",
             "action": "duplicated",
@@ -637,6 +666,8 @@ async def execute_tool_call(function_name, args, user_id: str):
         result = await plan_action_service.duplicate_week(
             source_start, target_start, user_id, source="agent"
         )
+        if working_set:
+            working_set.invalidate(target_start, target_start + timedelta(days=6))
         return result
 
     # 12. CLEAR WEEK
@@ -645,6 +676,8 @@ async def execute_tool_call(function_name, args, user_id: str):
         result = await plan_action_service.clear_week(
             week_start, user_id, source="agent"
         )
+        if working_set:
+            working_set.invalidate(week_start, week_start + timedelta(days=6))
         return result
 
     # 13. CREATE TRAINING PHASE
@@ -695,6 +728,122 @@ async def execute_tool_call(function_name, args, user_id: str):
         result = await plan_action_service.apply_template(
             args["template_id"], start_date, detail_level, user_id, source="agent"
         )
+        if working_set:
+            working_set.invalidate()  # template length is only known to the template
         return result
 
     return {"status": "error", "message": f"Unknown function: {function_name}"}
+
+
+# --- BATCH EXECUTION (one model turn) ---
+def _days(date_iso: str, count: int = 1) -> set[str]:
+    start = date_type.fromisoformat(date_iso[:10])
+    return {f"day:{start + timedelta(days=i)}" for i in range(count)}
+
+
+def mutation_footprint(function_name: str, args: dict) -> tuple[set[str], set[str]]:
+    """
+    (lookups, writes) of a mutating tool: the plan days ("day:YYYY-MM-DD") and
+    phases ("phase:<id>") it finds its target on, and the ones it changes.
+    """
+    if function_name == "create_workout":
+        return set(), _days(args["start_time_iso"])
+    if function_name == "update_workout":
+        target = _days(args["target_date_iso"])
+        moved = _days(args["new_start_time_iso"]) if args.get("new_start_time_iso") else set()
+        return target, target | moved
+    if function_name == "delete_workout":
+        target = _days(args["target_date_iso"])
+        return target, target
+    if function_name == "move_workout_to_date":
+        target = _days(args["target_date_iso"])
+        return target, target | _days(args["new_date_iso"])
+    if function_name == "duplicate_workout_to_date":
+        return _days(args["target_date_iso"]), _days(args["new_date_iso"])
+    if function_name == "duplicate_week":
+        return _days(args["source_week_start"], 7), _days(args["target_week_start"], 7)
+    if function_name == "clear_week":
+        week = _days(args["week_start"], 7)
+        return week, week
+    if function_name in ("update_training_phase", "delete_training_phase"):
+        phase = {f"phase:{args['phase_id']}"}
+        return phase, phase
+    if function_name == "apply_template":
+        # Template length is only known once loaded: treat every day as changed
+        return set(), {"day:*"}
+    return set(), set()
+
+
+def _conflict(lookups: set[str], written: dict[str, str]) -> tuple[str, str] | None:
+    """(key, earlier tool) if a lookup hits something changed earlier in the turn."""
+    for key in sorted(lookups):
+        if key in written:
+            return key, written[key]
+        if key.startswith("day:") and "day:*" in written:
+            return key, written["day:*"]
+    return None
+
+
+async def _run_tool(function_name: str, args: dict, user_id: str) -> tuple[dict, bool]:
+    try:
+        if function_name in READ_ONLY_TOOLS:
+            result = await asyncio.wait_for(
+                execute_tool_call(function_name, args, user_id), READ_TOOL_TIMEOUT_SECONDS
+            )
+        else:
+            result = await execute_tool_call(function_name, args, user_id)
+        return result, True
+    except asyncio.TimeoutError:
+        logger.error(f"Tool execution timed out ({function_name}) after {READ_TOOL_TIMEOUT_SECONDS:g}s")
+        return {
+            "status": "error",
+            "message": f"{function_name} timed out after {READ_TOOL_TIMEOUT_SECONDS:g}s",
+        }, False
+    except Exception as e:
+        # Errors go back to the model so it can retry or explain
+        logger.error(f"Tool execution error ({function_name}): {e}")
+        return {"status": "error", "message": str(e)}, False
+
+
+async def execute_tool_calls(calls: list[tuple[str, dict]], user_id: str) -> list[tuple[dict, bool]]:
+    """
+    Run one model turn's tool calls. Returns (result, ok) per call, in call order.
+
+    Read-only tools run concurrently, against the plan as the model saw it,
+    each with a timeout. Mutations then run one at a time in the order the
+    model issued them. A mutation that would find its target on a day (or
+    phase) an earlier successful call of the same turn changed is not run:
+    which workout it meant is ambiguous, so the model gets an error and can
+    call it again next turn.
+    """
+    results: list[tuple[dict, bool] | None] = [None] * len(calls)
+
+    reads = [i for i, (name, _) in enumerate(calls) if name in READ_ONLY_TOOLS]
+    outcomes = await asyncio.gather(*(_run_tool(*calls[i], user_id) for i in reads))
+    for i, outcome in zip(reads, outcomes):
+        results[i] = outcome
+
+    written: dict[str, str] = {}
+    for i, (name, args) in enumerate(calls):
+        if name in READ_ONLY_TOOLS:
+            continue
+        try:
+            lookups, writes = mutation_footprint(name, args)
+        except (KeyError, ValueError, TypeError):
+            lookups, writes = set(), set()  # malformed args: the tool reports them
+        conflict = _conflict(lookups, written)
+        if conflict:
+            key, earlier = conflict
+            logger.info(f"Skipped {name}: {key} already changed by {earlier} this turn")
+            results[i] = ({
+                "status": "error",
+                "message": f"Not run: {key.split(':', 1)[1]} was already changed by {earlier} "
+                           f"in this turn. Check the plan and call {name} again if still needed.",
+            }, False)
+            continue
+        results[i] = result, ok = await _run_tool(name, args, user_id)
+        # Tools also report failures as {"status": "error"}; only real changes count
+        if ok and result.get("status") != "error":
+            for key in writes:
+                written.setdefault(key, name)
+    return results
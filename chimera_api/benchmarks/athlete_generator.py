@@ -0,0 +1,178 @@
+"""
+Synthetic athlete histories for benchmarks.
+
+generate_athlete(years) builds a deterministic, realistic-looking account:
+~5 sessions a week across run/ride/swim/strength with seasonal volume,
+daily check-ins with gaps, workout RPE updates, training phases and a plan
+that mirrors the activity history plus four weeks ahead.
+Rows use the same columns the services read from Supabase.
+"""
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+SPORTS = [
+    # (strava type, internal type, weight, distance m range, speed m/s range)
+    ("Run", "run", 0.5, (5000, 22000), (2.6, 4.0)),
+    ("Ride", "bike", 0.25, (20000, 110000), (6.0, 9.5)),
+    ("Swim", "swim", 0.1, (1500, 4000), (0.8, 1.3)),
+    ("WeightTraining", "strength", 0.15, (0, 0), (0, 0)),
+]
+PHASE_CYCLE = [("base", 8), ("build", 6), ("peak", 3), ("taper", 2), ("recovery", 2)]
+PLAN_TITLES = {
+    "run": ["Easy Run", "Tempo Run", "Long Run", "Interval Session", "Hill Repeats"],
+    "bike": ["Endurance Ride", "Sweet Spot Ride", "Zwift Intervals"],
+    "swim": ["Pool Intervals", "Open Water Swim"],
+    "strength": ["Gym Strength", "Core & Mobility"],
+    "other": ["Rest Day"],
+}
+
+
+def _pick_sport(rng: random.Random):
+    roll, acc = rng.random(), 0.0
+    for sport in SPORTS:
+        acc += sport[2]
+        if roll <= acc:
+            return sport
+    return SPORTS[0]
+
+
+def generate_athlete(years: int, seed: int = 42, today: date | None = None) -> dict:
+    """Return {user_id, settings, profile, activities, checkins, phases, planned_workouts}."""
+    rng = random.Random(seed * 1000 + years)
+    today = today or date.today()
+    user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    start = today - timedelta(days=365 * years)
+
+    activities, checkins, planned = [], [], []
+    day = start
+    while day <= today:
+        # Seasonal load: more volume in summer, fewer sessions mid-winter
+        season = 0.75 + 0.25 * abs(6 - day.month) / 6
+        sessions = 0 if rng.random() < 0.25 else (2 if rng.random() < 0.1 * season else 1)
+
+        for n in range(sessions):
+            strava_type, internal, _, dist_range, speed_range = _pick_sport(rng)
+            distance = rng.uniform(*dist_range) * season if dist_range[1] else 0
+            moving = int(distance / rng.uniform(*speed_range)) if distance else rng.randint(1800, 4200)
+            hour = 6 + n * 11 + rng.randint(0, 2)
+            start_time = datetime(day.year, day.month, day.day, hour, rng.randint(0, 59))
+            source_id = str(rng.getrandbits(40))
+            activities.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "user_id": user_id,
+                "source_type": "strava",
+                "source_id": source_id,
+                "name": f"{'Morning' if hour < 12 else 'Evening'} {strava_type}",
+                "activity_type": internal,
+                "original_activity_type": strava_type,
+                "sport_type": strava_type,
+                "start_time": start_time.isoformat() + "+00:00",
+                "start_date_local": start_time.isoformat(),
+                "distance_meters": round(distance, 1),
+                "moving_time_seconds": moving,
+                "elapsed_time_seconds": moving + rng.randint(0, 600),
+                "total_elevation_gain": round(distance * rng.uniform(0.0, 0.02), 1),
+                "average_heartrate": rng.randint(120, 165) if rng.random() < 0.9 else None,
+                "stats_override": False,
+                "stats_excluded": False,
+                "planned_workout_id": None,
+            })
+            if rng.random() < 0.6:
+                checkins.append({
+                    "user_id": user_id,
+                    "date": day.isoformat(),
+                    "entry_type": "workout_update",
+                    "strava_activity_id": source_id,
+                    "session_rpe": rng.randint(1, 5),
+                })
+
+        if rng.random() < 0.85:
+            checkins.append({
+                "user_id": user_id,
+                "date": day.isoformat(),
+                "entry_type": "morning_checkin",
+                "readiness": rng.randint(1, 5),
+                "soreness": rng.randint(1, 5),
+                "energy": rng.randint(1, 5),
+                "mood": rng.randint(1, 5),
+                "note": "Legs heavy after yesterday" if rng.random() < 0.1 else None,
+                "body_weight": round(72 + rng.uniform(-2, 2), 1) if rng.random() < 0.5 else None,
+                "body_weight_unit": "kg",
+            })
+        day += timedelta(days=1)
+
+    # Plan mirrors history (completed/missed) and extends four weeks ahead
+    day = start
+    while day <= today + timedelta(weeks=4):
+        if day.weekday() != 0 or rng.random() < 0.9:
+            internal = rng.choice(["run", "run", "run", "bike", "swim", "strength", "other"])
+            when = datetime(day.year, day.month, day.day, 6)
+            status = "planned" if day >= today else rng.choice(["completed"] * 4 + ["missed"])
+            planned.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "user_id": user_id,
+                "title": rng.choice(PLAN_TITLES[internal]),
+                "activity_type": internal,
+                "start_time": when.isoformat(),
+                "end_time": (when + timedelta(minutes=rng.choice([30, 45, 60, 90]))).isoformat(),
+                "description": "Keep HR in zone 2" if internal == "run" else None,
+                "status": status,
+                "source": "import",
+            })
+        day += timedelta(days=1)
+
+    phases, phase_start, i = [], start, 0
+    while phase_start <= today:
+        phase_type, weeks = PHASE_CYCLE[i % len(PHASE_CYCLE)]
+        phase_end = phase_start + timedelta(weeks=weeks) - timedelta(days=1)
+        phases.append({
+            "user_id": user_id,
+            "title": f"{phase_type.title()} {i // len(PHASE_CYCLE) + 1}",
+            "phase_type": phase_type,
+            "start_date": phase_start.isoformat(),
+            "end_date": phase_end.isoformat(),
+            "sort_order": i,
+        })
+        phase_start, i = phase_end + timedelta(days=1), i + 1
+
+    return {
+        "user_id": user_id,
+        "today": today,
+        "profile": {"id": user_id, "name": "Synthetic Athlete", "email": f"athlete-{years}y@example.com"},
+        "settings": {
+            "user_id": user_id,
+            "timezone": "America/New_York",
+            "tracked_activity_types": ["Run", "Ride", "Swim"],
+            "default_workout_time": "06:00",
+            "training_goals": "Sub-3 marathon and a strong 70.3",
+            "coach_notes": "\n".join(
+                f"[{(today - timedelta(days=7 * k)).isoformat()}] Athlete responded well to threshold work."
+                for k in range(40)
+            ),
+        },
+        "activities": activities,
+        "checkins": checkins,
+        "phases": phases,
+        "planned_workouts": planned,
+    }
+
+
+def coach_plan_entries(weeks: int, seed: int = 7, start: date | None = None) -> list[dict]:
+    """Coach-style import rows with aliased fields and mixed date formats."""
+    rng = random.Random(seed)
+    start = start or date.today()
+    formats = ["%Y-%m-%d", "%m/%d/%Y", "%B %d, %Y", "%b %d %Y", "%Y%m%d"]
+    entries = []
+    for d in range(weeks * 7):
+        day = start + timedelta(days=d)
+        internal = rng.choice(["run", "run", "bike", "swim", "strength"])
+        entries.append({
+            "Workout Date": day.strftime(rng.choice(formats)),
+            "Workout Name": rng.choice(PLAN_TITLES[internal]),
+            "Minutes": str(rng.choice([30, 45, 60, 90])),
+            "Notes": "Stay relaxed, negative split the last third",
+            "Block": ["Base", "Build", "Peak", "Taper"][min(3, d // max(1, weeks * 7 // 4))],
+            **({"Sport": internal} if rng.random() < 0.5 else {}),
+        })
+    return entries
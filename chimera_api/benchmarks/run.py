@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Service benchmarks over synthetic athlete histories.
+
+Usage (from chimera_api/):
+    python -m benchmarks.run                     # run all, compare with baseline.json
+    python -m benchmarks.run --years 1 5         # subset of history sizes
+    python -m benchmarks.run --only compliance   # name filter
+    python -m benchmarks.run --save-baseline     # record results as the new baseline
+    python -m benchmarks.run --fail-on-regression
+
+Each benchmark reports mean time per run, runs/s, items/s (rows processed per
+second) and peak traced memory for one run. Results slower or heavier than the
+baseline by more than --threshold are flagged as regressions. baseline.json
+is machine-specific: re-record it on the machine you compare against.
+
+auto_link_to_plan runs against tests/fake_supabase.py, so its numbers include
+the in-memory fake's filtering cost, not network latency.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.athlete_generator import generate_athlete, coach_plan_entries
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_YEARS = (1, 5, 10)
+MIN_SECONDS = 0.5
+MAX_RUNS = 200
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[dict], Any]  # athlete -> state (not timed)
+    run: Callable[[Any], Any]  # state -> result, sync or async
+    items: Callable[[Any], int]  # rows processed per run
+
+
+# --- Benchmarks ---
+
+
+def _setup_aggregate_weekly(athlete):
+    from services.training_rollup_service import compute_rollups
+
+    today = athlete["today"]
+    rollups = list(compute_rollups(athlete["user_id"], athlete["activities"]).values())
+    weights = sorted(
+        (
+            {"date": c["date"], "body_weight": c["body_weight"]}
+            for c in athlete["checkins"]
+            if c.get("body_weight") is not None
+        ),
+        key=lambda c: c["date"],
+        reverse=True,
+    )
+    start = min(a["start_time"][:10] for a in athlete["activities"])
+    return rollups, weights, date.fromisoformat(start), today
+
+
+def _run_aggregate_weekly(state):
+    from services.dashboard_service import _aggregate_weekly
+
+    rollups, weights, start, today = state
+    return _aggregate_weekly(rollups, weights, start, today)
+
+
+def _run_paced_deltas(athlete):
+    from services.dashboard_service import _compute_paced_deltas
+
+    return _compute_paced_deltas(athlete["activities"], athlete["today"])
+
+
+def _setup_compliance(athlete):
+    today = athlete["today"]
+    window_start = (today - timedelta(weeks=4)).isoformat()
+    planned = [
+        p for p in athlete["planned_workouts"]
+        if window_start <= p["start_time"][:10] <= today.isoformat()
+    ]
+    return planned, athlete["activities"], athlete["settings"]["tracked_activity_types"], today
+
+
+def _run_compliance(state):
+    from services.dashboard_service import _compute_compliance
+
+    return _compute_compliance(*state)
+
+
+def _setup_format_context(athlete):
+    today = athlete["today"]
+    week_ago = (today - timedelta(days=7)).isoformat()
+    week_ahead = (today + timedelta(days=7)).isoformat()
+    settings = athlete["settings"]
+    return {
+        "profile": athlete["profile"],
+        "timezone": settings["timezone"],
+        "local_time": f"{today.isoformat()} 07:30:00",
+        "day_of_week": today.strftime("%A"),
+        "tz_offset": "-0500",
+        "training_goals": settings["training_goals"],
+        "default_workout_time": settings["default_workout_time"],
+        "coach_notes": settings["coach_notes"],
+        "strava_connected": True,
+        "upcoming_workouts": [
+            p for p in athlete["planned_workouts"]
+            if today.isoformat() <= p["start_time"][:10] <= week_ahead
+        ],
+        "recent_daily_logs": [c for c in athlete["checkins"] if c["date"] >= week_ago],
+        "recent_activities": [
+            {
+                "start_time": a["start_time"],
+                "distance_km": round(a["distance_meters"] / 1000, 2),
+                "moving_time_min": round(a["moving_time_seconds"] / 60, 1),
+                "avg_hr": a["average_heartrate"],
+            }
+            for a in athlete["activities"]
+            if a["start_time"][:10] >= week_ago
+        ],
+    }
+
+
+def _run_format_context(ctx):
+    from services.context_service import format_context_for_prompt
+
+    return format_context_for_prompt(ctx)
+
+
+def _setup_import_normalization(athlete):
+    return coach_plan_entries(weeks=len(athlete["activities"]) // 5 // 7 or 1, start=athlete["today"])
+
+
+async def _run_import_normalization(raw_entries):
+    """The pure part of import_plan: alias mapping, date parsing, validation, phases, rows."""
+    from services import plan_import_service as pis
+
+    entries = [pis.normalize_entry(e) for e in raw_entries]
+    for entry in entries:
+        entry["_parsed_date"] = pis.parse_flexible_date(entry.get("date"))
+    errors = pis.validate_entries(entries)
+    phases = pis.extract_phases(entries)
+    rows = [await pis._create_workout_row("bench-user", e) for e in entries]
+    return errors, phases, rows
+
+
+AUTO_LINK_BATCH = 20
+
+
+def _setup_auto_link(athlete):
+    from tests.fake_supabase import FakeSupabase
+
+    today = athlete["today"]
+    fake = FakeSupabase()
+    fake.seed("user_settings", [athlete["settings"]])
+    fake.seed("completed_activities", athlete["activities"])
+    # The recent part of the plan is still open, so every activity has candidates
+    recent = (today - timedelta(days=60)).isoformat()
+    open_plan = [
+        {**p, "status": "planned"} if p["start_time"][:10] >= recent else p
+        for p in athlete["planned_workouts"]
+    ]
+    fake.seed("planned_workouts", open_plan)
+    open_rows = [p for p in fake.tables["planned_workouts"] if p["status"] == "planned"]
+    batch = athlete["activities"][-AUTO_LINK_BATCH:]
+    return fake, open_rows, batch, athlete["user_id"]
+
+
+async def _run_auto_link(state):
+    from services import strava_service
+    from tests.fake_supabase import install_fake
+
+    fake, open_rows, batch, user_id = state
+    for row in open_rows:
+        row["status"] = "planned"
+    with install_fake(fake):
+        for a in batch:
+            await strava_service._auto_link_to_plan(
+                user_id,
+                a["id"],
+                {"start_date_local": a["start_date_local"], "type": a["original_activity_type"]},
+            )
+
+
+BENCHMARKS = [
+    Benchmark("aggregate_weekly", _setup_aggregate_weekly, _run_aggregate_weekly, lambda s: len(s[0])),
+    Benchmark("paced_deltas", lambda a: a, _run_paced_deltas, lambda a: len(a["activities"])),
+    Benchmark("compliance", _setup_compliance, _run_compliance, lambda s: len(s[0]) + len(s[1])),
+    Benchmark(
+        "format_context_for_prompt",
+        _setup_format_context,
+        _run_format_context,
+        lambda c: len(c["upcoming_workouts"]) + len(c["recent_daily_logs"]) + len(c["recent_activities"]),
+    ),
+    Benchmark("import_plan_normalization", _setup_import_normalization, _run_import_normalization, len),
+    Benchmark("auto_link_to_plan", _setup_auto_link, _run_auto_link, lambda s: len(s[2])),
+]
+
+
+# --- Runner ---
+
+
+def _call(loop, fn, state):
+    result = fn(state)
+    if asyncio.iscoroutine(result):
+        result = loop.run_until_complete(result)
+    return result
+
+
+def measure(bench: Benchmark, athlete: dict, loop) -> dict:
+    state = bench.setup(athlete)
+    _call(loop, bench.run, state)  # warm-up
+
+    runs, start = 0, time.perf_counter()
+    while runs < MAX_RUNS:
+        _call(loop, bench.run, state)
+        runs += 1
+        if time.perf_counter() - start >= MIN_SECONDS:
+            break
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    _call(loop, bench.run, state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    items = bench.items(state)
+    return {
+        "mean_ms": round(elapsed / runs * 1000, 3),
+        "runs_per_sec": round(runs / elapsed, 1),
+        "items_per_sec": round(items * runs / elapsed),
+        "items": items,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric in ("mean_ms", "peak_kb"):
+            if base.get(metric) and result[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f"{key}: {metric} {result[metric]} vs baseline {base[metric]} "
+                    f"(+{round((result[metric] / base[metric] - 1) * 100)}%)"
+                )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, nargs="+", default=list(DEFAULT_YEARS))
+    parser.add_argument("--only", help="Run benchmarks whose name contains this string")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for years in args.years:
+            athlete = generate_athlete(years)
+            print(
+                f"\n== {years}y athlete: {len(athlete['activities'])} activities, "
+                f"{len(athlete['checkins'])} check-ins, {len(athlete['planned_workouts'])} planned =="
+            )
+            for bench in BENCHMARKS:
+                if args.only and args.only not in bench.name:
+                    continue
+                key = f"{bench.name}[{years}y]"
+                result = results[key] = measure(bench, athlete, loop)
+                base = baseline.get(key, {})
+                delta = (
+                    f" ({(result['mean_ms'] / base['mean_ms'] - 1) * 100:+.0f}% vs baseline)"
+                    if base.get("mean_ms") else ""
+                )
+                print(
+                    f"  {bench.name:<28} {result['mean_ms']:>10.3f} ms  {result['runs_per_sec']:>9.1f} runs/s  "
+                    f"{result['items_per_sec']:>10} items/s  {result['peak_kb']:>9.1f} KB{delta}"
+                )
+    finally:
+        loop.close()
+
+    if args.save_baseline:
+        baseline.update(results)
+        BASELINE_PATH.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + "\n")
+        print(f"\nSaved {len(results)} results to {BASELINE_PATH}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for r in regressions:
+            print(f"  - {r}")
+        return 1 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,12 @@
 import os
-import sys
+import time
+import asyncio
 import logging
-from supabase import create_client, Client
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.utils import AsyncClient
 from dotenv import load_dotenv
+from query_metrics import InstrumentedClient, record_response_bytes
 
 # Load environment variables first
 load_dotenv()
@@ -14,77 +18,114 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def initialize_supabase() -> Client:
-    """
-    Initialize and validate Supabase client with comprehensive error handling.
-    Returns a working Supabase client or exits the application.
+# Shared connection pool for every PostgREST round trip on this worker
+POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+REQUEST_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client on a single long-lived HTTP/2 connection pool."""
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None) -> AsyncClient:
+        return AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            ),
+            event_hooks={"response": [record_response_bytes]},
+        )
+
+
+def _rest_headers(key: str) -> dict:
+    return {"apikey": key, "Authorization": f"Bearer {key}"}
+
+
+def validate_supabase_config(url: str, key: str) -> list[str]:
+    """Return the problems with the Supabase credentials (empty when they look usable)."""
+    problems = []
+    if not url:
+        problems.append("SUPABASE_URL is missing")
+    elif not url.startswith("https://"):
+        problems.append(f"SUPABASE_URL must start with 'https://' (got {url[:50]!r})")
+    if not key:
+        problems.append("SUPABASE_SERVICE_KEY is missing")
+    elif len(key) < 100:
+        problems.append(
+            f"SUPABASE_SERVICE_KEY appears invalid (too short): {len(key)} characters (expected 200+)"
+        )
+    return problems
+
+
+SUPABASE_URL = os.getenv("SUPABASE_URL", "").strip()
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "").strip()
+CONFIG_PROBLEMS = validate_supabase_config(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+READY_TIMEOUT = float(os.getenv("SUPABASE_READY_TIMEOUT_SECONDS", "5"))
+
+
+def initialize_supabase() -> PooledPostgrestClient:
     """
-    # 1. Load and clean credentials
-    url = os.getenv("SUPABASE_URL", "").strip()
-    key = os.getenv("SUPABASE_SERVICE_KEY", "").strip()
+    Build the async Supabase (PostgREST) client without touching the network.
 
-    # 2. Validate credentials exist
-    if not url or not key:
+    Bad credentials are logged here and reported by check_supabase_ready(), which
+    the app runs at startup and on GET /ready, instead of exiting the process
+    at import time.
+    """
+    if CONFIG_PROBLEMS:
         logger.critical("=" * 80)
-        logger.critical("❌ FATAL: Supabase credentials missing")
-        logger.critical("Required environment variables:")
-        logger.critical("  - SUPABASE_URL: %s", "✓ Present" if url else "✗ MISSING")
-        logger.critical("  - SUPABASE_SERVICE_KEY: %s", "✓ Present" if key else "✗ MISSING")
+        logger.critical("❌ Supabase configuration is invalid; /ready will report not ready")
+        for problem in CONFIG_PROBLEMS:
+            logger.critical("  - %s", problem)
         logger.critical("=" * 80)
-        sys.exit(1)
+    else:
+        logger.info("🔄 Initializing Supabase client...")
+        logger.info("   URL: %s", SUPABASE_URL)
+        logger.info("   Key length: %d characters", len(SUPABASE_SERVICE_KEY))
 
-    # 3. Validate URL format
-    if not url.startswith("https://"):
-        logger.critical("=" * 80)
-        logger.critical("❌ FATAL: SUPABASE_URL must start with 'https://'")
-        logger.critical("Current value: %s", url[:50])
-        logger.critical("=" * 80)
-        sys.exit(1)
+    rest_url = f"{SUPABASE_URL.rstrip('/')}/rest/v1"
+    return PooledPostgrestClient(
+        rest_url, headers=_rest_headers(SUPABASE_SERVICE_KEY), timeout=REQUEST_TIMEOUT
+    )
 
-    # 4. Validate key format (should be a JWT-like string)
-    if len(key) < 100:
-        logger.critical("=" * 80)
-        logger.critical("❌ FATAL: SUPABASE_SERVICE_KEY appears invalid (too short)")
-        logger.critical("Key length: %d characters (expected 200+)", len(key))
-        logger.critical("Key preview: %s...", key[:20])
-        logger.critical("=" * 80)
-        sys.exit(1)
 
-    # 5. Create client
-    try:
-        logger.info("🔄 Initializing Supabase client...")
-        logger.info("   URL: %s", url)
-        logger.info("   Key length: %d characters", len(key))
-
-        client = create_client(url, key)
-
-        # 6. Test the connection by making a simple query
-        logger.info("🔄 Testing database connection...")
-        try:
-            # Try to query the users table (should exist based on your schema)
-            test_response = client.table("users").select("id").limit(1).execute()
-            logger.info("✅ Database connection successful!")
-            logger.info("=" * 80)
-            return client
-        except Exception as test_error:
-            logger.critical("=" * 80)
-            logger.critical("❌ FATAL: Supabase client created but connection test failed")
-            logger.critical("Error: %s", str(test_error))
-            logger.critical("Possible causes:")
-            logger.critical("  1. Invalid SUPABASE_SERVICE_KEY (wrong key or expired)")
-            logger.critical("  2. Database is paused or unavailable")
-            logger.critical("  3. Network connectivity issues")
-            logger.critical("  4. Table 'users' doesn't exist in database")
-            logger.critical("=" * 80)
-            sys.exit(1)
+# Initialize the client at module load (every query is recorded by query_metrics)
+supabase_admin = InstrumentedClient(initialize_supabase())
 
+
+async def check_supabase_ready(timeout: float = READY_TIMEOUT) -> dict:
+    """
+    Readiness probe: validate the config and run one cheap query against users.
+    Never raises; returns {"ok", "latency_ms", "error"}.
+    """
+    if CONFIG_PROBLEMS:
+        return {"ok": False, "latency_ms": None, "error": "; ".join(CONFIG_PROBLEMS)}
+
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            supabase_admin.table("users").select("id").limit(1).execute(), timeout
+        )
     except Exception as e:
+        error = f"timed out after {timeout}s" if isinstance(e, asyncio.TimeoutError) else str(e)
         logger.critical("=" * 80)
-        logger.critical("❌ FATAL: Failed to create Supabase client")
-        logger.critical("Error type: %s", type(e).__name__)
-        logger.critical("Error message: %s", str(e))
+        logger.critical("❌ Supabase connection test failed: %s", error)
+        logger.critical("Possible causes:")
+        logger.critical("  1. Invalid SUPABASE_SERVICE_KEY (wrong key or expired)")
+        logger.critical("  2. Database is paused or unavailable")
+        logger.critical("  3. Network connectivity issues")
+        logger.critical("  4. Table 'users' doesn't exist in database")
         logger.critical("=" * 80)
-        sys.exit(1)
+        return {"ok": False, "latency_ms": None, "error": error}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1), "error": None}
+
 
-# Initialize the client at module load
-supabase_admin = initialize_supabase()
+async def close_supabase():
+    """Release the pooled HTTP connections on shutdown."""
+    await supabase_admin.aclose()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Import a Strava bulk-export ZIP (activities.csv) for one user, without Strava API calls.
+
+Usage:
+    python import_strava_export.py --user <user_id> export_12345.zip
+"""
+import argparse
+import asyncio
+
+from services import strava_import_service
+
+
+async def main(args) -> None:
+    summary = await strava_import_service.import_archive(args.user, args.archive)
+    print(f"Imported Strava export for user {args.user}: {summary}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", required=True, help="User to import into")
+    parser.add_argument("archive", help="Path to the export ZIP")
+    asyncio.run(main(parser.parse_args()))
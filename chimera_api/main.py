@@ -1,7 +1,13 @@
-import os
+import time
+
+# Cold-start tracking: measured from the first import of this module
+_IMPORT_STARTED = time.perf_counter()
+
+import json
 import logging
-import google.generativeai as genai
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from typing import List, Optional
@@ -20,12 +26,21 @@ from schemas import (
 from services import workout_service
 from services import daily_checkin_service
 from services import activity_filter_service
-from services.agent_service import run_agent
+from services.agent_service import run_agent, stream_agent
 from dependencies import get_current_user
 
-from routers import auth, strava, dashboard, plan, integrations
+from routers import auth, strava, dashboard, plan, integrations, metrics
 from package_loader import get_config
 from services.analytics_service import track as analytics_track, shutdown as analytics_shutdown
+from db_client import close_supabase, check_supabase_ready
+from services.webhook_queue_service import worker_pool as webhook_workers
+from strava_client import strava_client
+from services.strava_backfill_service import resume_orphaned_backfills
+from services.strava_reconcile_service import reconciler as strava_reconciler
+from services.strava_token_service import token_cache as strava_tokens
+from services.strava_service import athlete_directory
+from request_loader import RequestLoaderMiddleware
+from query_metrics import QueryMetricsMiddleware
 
 load_dotenv()
 
@@ -36,7 +51,31 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Probe the database once before serving; failures are logged and reported by
+    # /ready instead of killing the process, so the platform can retry.
+    supabase = await check_supabase_ready()
+    if supabase["ok"]:
+        logger.info(f"✅ Database connection successful ({supabase['latency_ms']} ms)")
+        try:
+            logger.info(f"Warmed {await athlete_directory.warm()} Strava athlete mappings")
+        except Exception as e:
+            logger.warning(f"Strava athlete warm-up failed, resolving on demand: {e}")
+    webhook_workers.start()
+    strava_tokens.start()
+    strava_reconciler.start()
+    await resume_orphaned_backfills()
+    yield
+    await webhook_workers.stop()
+    await strava_tokens.stop()
+    await strava_reconciler.stop()
+    analytics_shutdown()
+    await strava_client.aclose()
+    await close_supabase()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # 👇 CONFIGURE CORS
 app.add_middleware(
@@ -51,29 +90,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request memoized loads of user_settings / users
+app.add_middleware(RequestLoaderMiddleware)
+
+# Per-request query log, N+1 detection and /v1/metrics/queries histograms
+app.add_middleware(QueryMetricsMiddleware)
+
 # 👇 REGISTER ROUTERS
 app.include_router(auth.router)
 app.include_router(strava.router)
 app.include_router(dashboard.router)
 app.include_router(plan.router)
 app.include_router(integrations.router)
+app.include_router(metrics.router)
 
-# --- GEMINI SETUP ---
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key.strip())
-
-
-@app.on_event("shutdown")
-def on_shutdown():
-    analytics_shutdown()
+# Heavy SDKs (Gemini, Google API client) are imported on first use, not here
+IMPORT_MS = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+logger.info(f"main imported in {IMPORT_MS} ms")
 
 
 @app.get("/")
-def health_check():
+async def health_check():
     return {"status": get_config()["healthCheckMessage"]}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the database answers, 503 otherwise."""
+    supabase = await check_supabase_ready()
+    body = {
+        "ready": supabase["ok"],
+        "checks": {"supabase": supabase},
+        "import_ms": IMPORT_MS,
+    }
+    return JSONResponse(body, status_code=200 if supabase["ok"] else 503)
+
+
 # --- AI CHAT (Agent-powered) ---
 @app.post("/v1/chat")
 async def chat_with_gemini(
@@ -88,6 +140,32 @@ async def chat_with_gemini(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/v1/chat/stream")
+async def stream_chat_with_gemini(
+    request: ChatRequest, user_id: str = Depends(get_current_user)
+):
+    """
+    Server-sent events: `token` events as the reply is generated, `tool_call` /
+    `tool_result` around each tool, then `done` with the final reply (or `error`).
+    """
+
+    async def events():
+        try:
+            async for event in stream_agent(user_id, request.message):
+                kind = event.pop("type")
+                yield f"event: {kind}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            logger.error(f"AI Error: {e}")
+            analytics_track(user_id, "coach_error", {"error": str(e)})
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # --- WORKOUTS (Kept in Main for now) ---
 @app.post("/v1/workouts", response_model=WorkoutResponse, tags=["Workouts"])
 async def create_workout(
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Move raw Strava payloads from completed_activities.activity_data_blob into the
+activity_payloads cold store (migration 013), in batches. Safe to re-run.
+
+Usage:
+    python migrate_payloads.py
+    python migrate_payloads.py --batch-size 500 --max-batches 10
+"""
+import argparse
+import asyncio
+
+from services import activity_payload_service
+
+
+async def main(args) -> None:
+    moved = await activity_payload_service.migrate_all(args.batch_size, args.max_batches)
+    print(f"Moved {moved} activity payloads to the cold store")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=activity_payload_service.MIGRATE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,30 @@
+-- Migration 006: Weekly training rollups
+-- Per user, per ISO week (Monday start), per original activity type aggregates
+-- maintained by services/training_rollup_service.py.
+-- stats_mode mirrors completed_activities.stats_override/stats_excluded:
+--   'default' follows tracked_activity_types, 'include'/'exclude' are per-activity overrides.
+-- After running, backfill with: python rebuild_rollups.py --all
+
+CREATE TABLE IF NOT EXISTS weekly_training_rollups (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    week_start DATE NOT NULL,
+    activity_type TEXT NOT NULL DEFAULT '',  -- '' = activity without original_activity_type
+    stats_mode TEXT NOT NULL DEFAULT 'default' CHECK (stats_mode IN ('default', 'include', 'exclude')),
+    volume_m DOUBLE PRECISION NOT NULL DEFAULT 0,
+    vert_m DOUBLE PRECISION NOT NULL DEFAULT 0,
+    duration_s BIGINT NOT NULL DEFAULT 0,
+    hr_weighted_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    hr_weight_s BIGINT NOT NULL DEFAULT 0,
+    long_run_m DOUBLE PRECISION NOT NULL DEFAULT 0,
+    activity_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, week_start, activity_type, stats_mode)
+);
+
+CREATE INDEX IF NOT EXISTS idx_weekly_training_rollups_user_week
+    ON weekly_training_rollups(user_id, week_start);
+
+ALTER TABLE weekly_training_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY weekly_training_rollups_user_policy ON weekly_training_rollups
+    FOR ALL USING (user_id = auth.uid());
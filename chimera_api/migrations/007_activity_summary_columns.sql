@@ -0,0 +1,37 @@
+-- Migration 007: Denormalized activity summary columns
+-- Promotes frequently read fields out of activity_data_blob so hot paths can use
+-- slim projections (see projections.py) instead of select("*").
+-- Run BEFORE deploying the matching API version: _build_activity_record writes these columns.
+
+ALTER TABLE completed_activities
+  ADD COLUMN IF NOT EXISTS name TEXT,
+  ADD COLUMN IF NOT EXISTS sport_type TEXT,
+  ADD COLUMN IF NOT EXISTS start_date_local TIMESTAMP,
+  ADD COLUMN IF NOT EXISTS timezone TEXT,
+  ADD COLUMN IF NOT EXISTS average_speed DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS max_speed DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS max_heartrate INT,
+  ADD COLUMN IF NOT EXISTS average_cadence DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS average_watts DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS suffer_score INT,
+  ADD COLUMN IF NOT EXISTS calories DOUBLE PRECISION;
+
+-- Backfill existing rows from the raw Strava payload
+UPDATE completed_activities
+SET
+  name = activity_data_blob->>'name',
+  sport_type = activity_data_blob->>'sport_type',
+  start_date_local = (activity_data_blob->>'start_date_local')::TIMESTAMP,
+  timezone = activity_data_blob->>'timezone',
+  average_speed = (activity_data_blob->>'average_speed')::DOUBLE PRECISION,
+  max_speed = (activity_data_blob->>'max_speed')::DOUBLE PRECISION,
+  max_heartrate = ROUND((activity_data_blob->>'max_heartrate')::NUMERIC)::INT,
+  average_cadence = (activity_data_blob->>'average_cadence')::DOUBLE PRECISION,
+  average_watts = (activity_data_blob->>'average_watts')::DOUBLE PRECISION,
+  suffer_score = ROUND((activity_data_blob->>'suffer_score')::NUMERIC)::INT,
+  calories = (activity_data_blob->>'calories')::DOUBLE PRECISION
+WHERE activity_data_blob IS NOT NULL
+  AND name IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_completed_activities_user_start
+  ON completed_activities(user_id, start_time DESC);
@@ -0,0 +1,33 @@
+-- Migration 008: Durable Strava webhook job queue
+-- POST /v1/webhooks/strava inserts one row per event and answers immediately;
+-- services/webhook_queue_service.py workers claim and process the rows.
+-- (object_id, aspect_type, event_time) is the idempotency key: Strava retries of
+-- the same event collapse onto the existing row.
+-- status: pending -> running -> done, or back to pending with run_after pushed
+-- out (retry with backoff), or dead once attempts reach the limit.
+
+CREATE TABLE IF NOT EXISTS webhook_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    object_id BIGINT NOT NULL,
+    owner_id BIGINT NOT NULL,
+    object_type TEXT NOT NULL DEFAULT 'activity',
+    aspect_type TEXT NOT NULL,
+    event_time BIGINT NOT NULL,
+    updates JSONB,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'dead')),
+    attempts INT NOT NULL DEFAULT 0,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+    locked_by TEXT,
+    locked_at TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (object_id, aspect_type, event_time)
+);
+
+-- Workers poll for due pending jobs in arrival order
+CREATE INDEX IF NOT EXISTS idx_webhook_jobs_due
+    ON webhook_jobs(status, run_after);
+
+-- Service role only: no user-facing policy
+ALTER TABLE webhook_jobs ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,33 @@
+-- Migration 009: Resumable Strava backfill jobs
+-- POST /v1/integrations/strava/sync creates a row and returns at once;
+-- services/strava_backfill_service.py works through the athlete's activity list
+-- page by page (oldest first) and checkpoints cursor_after (epoch seconds of the
+-- newest activity stored so far) after every page, so an interrupted job resumes
+-- where it stopped instead of starting over.
+-- status: pending -> running -> done | failed (failed jobs resume on the next sync)
+
+CREATE TABLE IF NOT EXISTS strava_backfill_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'failed')),
+    days INT NOT NULL,
+    cursor_after BIGINT NOT NULL,
+    pages INT NOT NULL DEFAULT 0,
+    listed INT NOT NULL DEFAULT 0,
+    synced INT NOT NULL DEFAULT 0,
+    errors INT NOT NULL DEFAULT 0,
+    linked INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    locked_by TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_strava_backfill_jobs_user
+    ON strava_backfill_jobs(user_id, created_at DESC);
+
+ALTER TABLE strava_backfill_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY strava_backfill_jobs_user_policy ON strava_backfill_jobs
+    FOR SELECT USING (user_id = auth.uid());
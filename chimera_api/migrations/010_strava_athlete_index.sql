@@ -0,0 +1,7 @@
+-- Migration 010: Index Strava athlete lookups
+-- Webhook dispatch resolves owner_id -> user_id through user_settings.strava_athlete_id
+-- (services/strava_service.AthleteDirectory); misses and the startup warm-up use this index.
+
+CREATE INDEX IF NOT EXISTS idx_user_settings_strava_athlete_id
+    ON user_settings(strava_athlete_id)
+    WHERE strava_athlete_id IS NOT NULL;
@@ -0,0 +1,14 @@
+-- Migration 011: Coalescing of bursty webhook events
+-- Creates/updates wait WEBHOOK_COALESCE_SECONDS before they are due; the worker
+-- that claims one folds every other pending job for the same (owner_id, object_id)
+-- into it. effective_aspect is the merged action (delete > create > update) and
+-- updates holds the merged field changes; the folded jobs are marked done with
+-- coalesced_into pointing at the job that did the work.
+
+ALTER TABLE webhook_jobs
+  ADD COLUMN IF NOT EXISTS effective_aspect TEXT,
+  ADD COLUMN IF NOT EXISTS coalesced_into UUID;
+
+CREATE INDEX IF NOT EXISTS idx_webhook_jobs_object
+    ON webhook_jobs(owner_id, object_id)
+    WHERE status = 'pending';
@@ -0,0 +1,20 @@
+-- Migration 012: Per-second Strava activity streams
+-- One row per activity whose streams were fetched (on first chart request).
+-- `data` is the base64 of a compact columnar encoding (see
+-- services/activity_stream_service.py): each channel quantized to integers,
+-- delta-encoded as little-endian int32 and zlib-compressed, typically a few
+-- percent of the Strava JSON size.
+
+CREATE TABLE IF NOT EXISTS activity_streams (
+    completed_activity_id UUID PRIMARY KEY REFERENCES completed_activities(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL,
+    encoding TEXT NOT NULL,
+    sample_count INT NOT NULL DEFAULT 0,
+    channels TEXT[] NOT NULL DEFAULT '{}',
+    data TEXT NOT NULL,
+    raw_bytes INT NOT NULL DEFAULT 0,
+    stored_bytes INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_activity_streams_user ON activity_streams(user_id);
@@ -0,0 +1,22 @@
+-- Migration 013: Cold store for raw Strava payloads
+-- Raw detail JSON moves out of completed_activities.activity_data_blob into
+-- activity_payloads, zlib-compressed (base64) and keyed by the SHA-256 of its
+-- canonical JSON. Activities reference it through payload_hash.
+-- Run BEFORE deploying the matching API version, then move existing rows in
+-- batches with `python migrate_payloads.py` (compression happens in the app).
+
+CREATE TABLE IF NOT EXISTS activity_payloads (
+    hash TEXT PRIMARY KEY,
+    encoding TEXT NOT NULL DEFAULT 'zlib+json',
+    data TEXT NOT NULL,
+    raw_bytes INT NOT NULL DEFAULT 0,
+    stored_bytes INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE completed_activities
+  ADD COLUMN IF NOT EXISTS payload_hash TEXT;
+
+-- Rows still to migrate
+CREATE INDEX IF NOT EXISTS idx_completed_activities_unmigrated_payload
+  ON completed_activities(id) WHERE payload_hash IS NULL AND activity_data_blob IS NOT NULL;
@@ -0,0 +1,22 @@
+-- Migration 014: Nightly Strava reconciliation runs
+-- One row per UTC date. services/strava_reconcile_service.py inserts the row
+-- to claim that night's run (insert-if-absent, so exactly one worker across all
+-- processes does it), diffs every connected athlete's recent activity list
+-- against completed_activities, and enqueues webhook_jobs for activities that
+-- are missing or whose summary changed.
+
+CREATE TABLE IF NOT EXISTS strava_reconcile_runs (
+    run_date DATE PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'done', 'failed')),
+    locked_by TEXT,
+    athletes INT NOT NULL DEFAULT 0,
+    listed INT NOT NULL DEFAULT 0,
+    missing INT NOT NULL DEFAULT 0,
+    changed INT NOT NULL DEFAULT 0,
+    errors INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ
+);
+
+ALTER TABLE strava_reconcile_runs ENABLE ROW LEVEL SECURITY;
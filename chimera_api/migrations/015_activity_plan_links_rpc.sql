@@ -0,0 +1,23 @@
+-- Migration 015: Batched activity -> plan link writes
+-- plan_link_service sets planned_workout_id on many activities at once (a
+-- full-history relink touches thousands). PostgREST can only PATCH one value
+-- per request, so set_activity_plan_links applies a chunk of
+-- {id, planned_workout_id} pairs in one UPDATE. A null planned_workout_id
+-- unlinks. Returns the number of activities updated.
+
+CREATE OR REPLACE FUNCTION set_activity_plan_links(links JSONB)
+RETURNS INT
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE completed_activities AS c
+        SET planned_workout_id = l.planned_workout_id
+        FROM jsonb_to_recordset(links) AS l(id UUID, planned_workout_id UUID)
+        WHERE c.id = l.id
+        RETURNING 1
+    )
+    SELECT count(*)::INT FROM updated;
+$$;
+
+-- Service role only: clients must not relink other users' activities
+REVOKE EXECUTE ON FUNCTION set_activity_plan_links(JSONB) FROM PUBLIC, anon, authenticated;
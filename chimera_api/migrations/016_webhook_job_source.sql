@@ -0,0 +1,8 @@
+-- Migration 016: Origin of webhook jobs
+-- The nightly reconciler (services/strava_reconcile_service.py) repairs missing
+-- or changed activities by queueing webhook_jobs. source tells the workers who
+-- queued a job: 'webhook' jobs run in the WEBHOOK rate-limit lane, 'reconcile'
+-- jobs in the BACKFILL lane, so repairs never spend the quota live events need.
+
+ALTER TABLE webhook_jobs
+  ADD COLUMN IF NOT EXISTS source TEXT NOT NULL DEFAULT 'webhook';
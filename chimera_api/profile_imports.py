@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the API (cold start as a number).
+
+Usage (from chimera_api/):
+    python profile_imports.py               # total + 25 slowest modules
+    python profile_imports.py --top 50
+    python profile_imports.py --module routers.strava
+    python profile_imports.py --json        # machine-readable, for CI tracking
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and ranks
+modules by cumulative import time (the module plus everything it pulled in).
+Nothing here touches the network: the Supabase check runs in the app lifespan.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+def profile(module: str = "main") -> list[dict]:
+    """Return one entry per imported module: name, self_us, cumulative_us, depth."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+        })
+    return entries
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    entries = profile(args.module)
+    root = next((e for e in entries if e["module"] == args.module), None)
+    total_ms = round((root["cumulative_us"] if root else sum(e["self_us"] for e in entries)) / 1000, 1)
+    slowest = sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[: args.top]
+
+    if args.json:
+        print(json.dumps({"module": args.module, "total_ms": total_ms, "modules": len(entries), "slowest": slowest}, indent=2))
+        return 0
+
+    print(f"import {args.module}: {total_ms} ms across {len(entries)} modules\n")
+    print(f"  {'cumulative ms':>13}  {'self ms':>8}  module")
+    for e in slowest:
+        print(f"  {e['cumulative_us'] / 1000:>13.1f}  {e['self_us'] / 1000:>8.1f}  {'  ' * e['depth']}{e['module']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""
+Column projections for hot-path queries.
+
+Services select from these instead of "*", so reads never drag wide columns
+over the wire unless they ask for them. Raw Strava payloads are not in
+completed_activities at all (see services/activity_payload_service.py).
+"""
+
+# completed_activities: everything the app and dashboard display, no raw blob
+ACTIVITY_SUMMARY = (
+    "id, user_id, source_type, source_id, planned_workout_id, "
+    "name, original_activity_type, sport_type, activity_type, "
+    "start_time, start_date_local, timezone, "
+    "distance_meters, moving_time_seconds, elapsed_time_seconds, total_elevation_gain, "
+    "average_heartrate, max_heartrate, average_speed, max_speed, "
+    "average_cadence, average_watts, suffer_score, calories, "
+    "stats_override, stats_excluded"
+)
+
+# completed_activities: fields needed to bucket activities into weekly rollups
+ACTIVITY_ROLLUP = (
+    "start_time, original_activity_type, stats_override, stats_excluded, "
+    "distance_meters, total_elevation_gain, moving_time_seconds, average_heartrate"
+)
+
+# user_settings: full row (preferences, training profile, Strava tokens)
+USER_SETTINGS = "*"
+
+# users: profile fields exposed to the app and coach context
+USER_PROFILE = "id, name, email"
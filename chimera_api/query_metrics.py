@@ -0,0 +1,275 @@
+"""
+Database query instrumentation.
+
+InstrumentedClient wraps the PostgREST client handed out as db_client.supabase_admin.
+Every builder chain records its table, operation and filter shape (columns and
+operators, never values); execute() records latency, row count and response bytes.
+
+Per HTTP request (QueryMetricsMiddleware) the records are kept in a QueryLog.
+When a request finishes, same-shape queries repeated N_PLUS_ONE_THRESHOLD or
+more times are logged as N+1 suspects, and the request is folded into the
+process-wide histograms served by GET /v1/metrics/queries.
+"""
+import os
+import time
+import logging
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "3"))
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, float("inf"))
+
+# Builder methods that shape a query; the first string arg is the column
+_SHAPE_METHODS = {
+    "eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "is_", "in_",
+    "contains", "contained_by", "filter", "match", "or_",
+    "order", "limit", "range", "single", "maybe_single",
+}
+_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+@dataclass
+class QueryRecord:
+    table: str
+    operation: str
+    shape: str
+    latency_ms: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    error: bool = False
+
+
+@dataclass
+class QueryLog:
+    """Queries issued while serving one request."""
+    records: list = field(default_factory=list)
+
+    def n_plus_one_suspects(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[dict]:
+        counts = Counter((r.table, r.operation, r.shape) for r in self.records)
+        return [
+            {"table": t, "operation": op, "shape": shape, "count": n}
+            for (t, op, shape), n in counts.items()
+            if n >= threshold
+        ]
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.total += 1
+        self.sum += value
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.total,
+            "sum": round(self.sum, 2),
+            "buckets": {
+                ("+Inf" if upper == float("inf") else str(upper)): n
+                for upper, n in zip(self.buckets, self.counts)
+            },
+        }
+
+
+_current_log: ContextVar["QueryLog | None"] = ContextVar("query_log", default=None)
+_current_query: ContextVar["QueryRecord | None"] = ContextVar("current_query", default=None)
+
+_table_stats: dict = {}
+_route_stats: dict = {}
+_recent_suspects: deque = deque(maxlen=50)
+
+
+def _record(entry: QueryRecord):
+    stats = _table_stats.get((entry.table, entry.operation))
+    if stats is None:
+        stats = _table_stats[(entry.table, entry.operation)] = {
+            "latency_ms": Histogram(LATENCY_BUCKETS_MS),
+            "rows": 0,
+            "bytes": 0,
+            "errors": 0,
+        }
+    stats["latency_ms"].observe(entry.latency_ms)
+    stats["rows"] += entry.rows
+    stats["bytes"] += entry.bytes
+    stats["errors"] += int(entry.error)
+
+    log = _current_log.get()
+    if log is not None:
+        log.records.append(entry)
+
+
+def finish_request(route: str, log: QueryLog):
+    """Fold a finished request into the route histograms and flag N+1 suspects."""
+    stats = _route_stats.get(route)
+    if stats is None:
+        stats = _route_stats[route] = {
+            "queries_per_request": Histogram(QUERY_COUNT_BUCKETS),
+            "db_time_ms": Histogram(LATENCY_BUCKETS_MS),
+            "n_plus_one_requests": 0,
+        }
+    stats["queries_per_request"].observe(len(log.records))
+    stats["db_time_ms"].observe(sum(r.latency_ms for r in log.records))
+
+    suspects = log.n_plus_one_suspects()
+    if suspects:
+        stats["n_plus_one_requests"] += 1
+        for s in suspects:
+            logger.warning(
+                f"N+1 suspect on {route}: {s['count']}x {s['operation']} {s['table']} {s['shape']}"
+            )
+            _recent_suspects.append({"route": route, **s})
+
+
+def snapshot() -> dict:
+    """Aggregated query metrics for the metrics endpoint."""
+    return {
+        "tables": {
+            f"{table}.{op}": {
+                "latency_ms": s["latency_ms"].to_dict(),
+                "rows": s["rows"],
+                "bytes": s["bytes"],
+                "errors": s["errors"],
+            }
+            for (table, op), s in sorted(_table_stats.items())
+        },
+        "routes": {
+            route: {
+                "queries_per_request": s["queries_per_request"].to_dict(),
+                "db_time_ms": s["db_time_ms"].to_dict(),
+                "n_plus_one_requests": s["n_plus_one_requests"],
+            }
+            for route, s in sorted(_route_stats.items())
+        },
+        "n_plus_one_suspects": list(_recent_suspects),
+        "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+    }
+
+
+@contextmanager
+def collect_queries():
+    """Collect the queries issued inside the block into a fresh QueryLog."""
+    log = QueryLog()
+    token = _current_log.set(log)
+    try:
+        yield log
+    finally:
+        _current_log.reset(token)
+
+
+def reset():
+    _table_stats.clear()
+    _route_stats.clear()
+    _recent_suspects.clear()
+
+
+async def record_response_bytes(response):
+    """httpx response hook: attribute the body size to the query being executed."""
+    entry = _current_query.get()
+    if entry is not None:
+        await response.aread()
+        entry.bytes = len(response.content)
+
+
+# --- Client wrapper ---
+
+
+class _InstrumentedBuilder:
+    """Proxy over a PostgREST request builder that tracks the query shape."""
+
+    def __init__(self, target, table: str, operation: str = "", shape: tuple = ()):
+        self._target = target
+        self._table = table
+        self._operation = operation
+        self._shape = shape
+
+    def _wrap(self, result, name: str, args: tuple):
+        if not hasattr(result, "execute"):
+            return result
+        operation, shape = self._operation, self._shape
+        if name in _OPERATIONS:
+            operation = name
+        elif name in _SHAPE_METHODS:
+            column = args[0] if args and isinstance(args[0], str) else ""
+            shape = shape + (f"{column}:{name.rstrip('_')}" if column else name.rstrip("_"),)
+        elif name == "not_":
+            shape = shape + ("not",)
+        return _InstrumentedBuilder(result, self._table, operation, shape)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return self._wrap(attr, name, ())
+
+        def call(*args, **kwargs):
+            return self._wrap(attr(*args, **kwargs), name, args)
+
+        return call
+
+    async def execute(self):
+        entry = QueryRecord(
+            table=self._table,
+            operation=self._operation or "select",
+            shape="[" + ",".join(self._shape) + "]",
+        )
+        token = _current_query.set(entry)
+        start = time.perf_counter()
+        try:
+            response = await self._target.execute()
+        except Exception:
+            entry.error = True
+            raise
+        finally:
+            entry.latency_ms = (time.perf_counter() - start) * 1000
+            _current_query.reset(token)
+            _record(entry)
+        data = getattr(response, "data", None)
+        entry.rows = len(data) if isinstance(data, list) else int(bool(data))
+        return response
+
+
+class InstrumentedClient:
+    """Drop-in wrapper for the PostgREST client that records every query."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str):
+        return _InstrumentedBuilder(self._client.table(name), name)
+
+    from_ = table
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class QueryMetricsMiddleware:
+    """ASGI middleware collecting each HTTP request's queries."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with collect_queries() as log:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                route = scope.get("route")
+                route_path = getattr(route, "path", None) or "unmatched"
+                finish_request(f"{scope.get('method', '')} {route_path}", log)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Rebuild weekly_training_rollups from completed_activities.
+
+Usage:
+    python rebuild_rollups.py --all
+    python rebuild_rollups.py --user <user_id>
+"""
+import argparse
+import asyncio
+
+from services import training_rollup_service
+
+
+async def main(args) -> None:
+    if args.user:
+        rows = await training_rollup_service.rebuild_user(args.user)
+        print(f"Rebuilt {rows} rollup rows for user {args.user}")
+    else:
+        counts = await training_rollup_service.rebuild_all()
+        print(f"Rebuilt rollups: {counts}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--user", help="Rebuild a single user's rollups")
+    group.add_argument("--all", action="store_true", help="Rebuild rollups for every user")
+    asyncio.run(main(parser.parse_args()))
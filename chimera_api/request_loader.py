@@ -0,0 +1,139 @@
+"""
+Request-scoped row loader.
+
+Memoizes and batches by-key reads of per-user rows (user_settings, users) for
+the lifetime of one request or agent run, DataLoader style: every load issued
+in the same event loop tick is served by a single `in_` query, and repeat loads
+of the same key reuse the first result. Writers call invalidate() so later reads
+in the same scope see their change.
+
+Outside a scope (scripts, tests) load() falls through to a direct query.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from db_client import supabase_admin
+from projections import USER_PROFILE, USER_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# table -> (key column, projection)
+LOADABLE_TABLES = {
+    "user_settings": ("user_id", USER_SETTINGS),
+    "users": ("id", USER_PROFILE),
+}
+
+_current_loader: ContextVar["RequestLoader | None"] = ContextVar("request_loader", default=None)
+
+
+async def _fetch_rows(table: str, keys: list[str]) -> dict:
+    """Fetch rows for the given keys in one query. Returns {key: row}."""
+    key_column, columns = LOADABLE_TABLES[table]
+    response = (
+        await supabase_admin.table(table)
+        .select(columns)
+        .in_(key_column, keys)
+        .execute()
+    )
+    return {str(row[key_column]): row for row in (response.data or []) if key_column in row}
+
+
+class RequestLoader:
+    """Per-scope cache of row futures keyed by (table, key)."""
+
+    def __init__(self):
+        self._cache: dict[tuple[str, str], asyncio.Future] = {}
+        self._pending: dict[str, dict[str, asyncio.Future]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, table: str, key: str) -> dict | None:
+        cache_key = (table, key)
+        future = self._cache.get(cache_key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[cache_key] = future
+            pending = self._pending.setdefault(table, {})
+            if not pending:
+                loop.call_soon(self._schedule_dispatch, table)
+            pending[key] = future
+
+        row = await asyncio.shield(future)
+        return dict(row) if row is not None else None
+
+    def invalidate(self, table: str, key: str):
+        """Drop a memoized row so the next load re-reads it."""
+        self._cache.pop((table, key), None)
+
+    def _schedule_dispatch(self, table: str):
+        task = asyncio.ensure_future(self._dispatch(table))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, table: str):
+        batch = self._pending.pop(table, {})
+        if not batch:
+            return
+        try:
+            rows = await _fetch_rows(table, list(batch))
+        except Exception as e:
+            for key, future in batch.items():
+                # Don't memoize failures; the next load retries
+                if self._cache.get((table, key)) is future:
+                    del self._cache[(table, key)]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(rows.get(key))
+
+
+async def load(table: str, key: str) -> dict | None:
+    """Load one row by key through the current scope's loader, if any."""
+    key = str(key)
+    loader = _current_loader.get()
+    if loader is None:
+        return (await _fetch_rows(table, [key])).get(key)
+    return await loader.load(table, key)
+
+
+def invalidate(table: str, key: str):
+    """Forget a memoized row after writing it."""
+    loader = _current_loader.get()
+    if loader is not None:
+        loader.invalidate(table, str(key))
+
+
+@asynccontextmanager
+async def loader_scope():
+    """Open a loader scope. Nested scopes share the outer loader."""
+    if _current_loader.get() is not None:
+        yield _current_loader.get()
+        return
+    loader = RequestLoader()
+    token = _current_loader.set(loader)
+    try:
+        yield loader
+    finally:
+        _current_loader.reset(token)
+
+
+class RequestLoaderMiddleware:
+    """
+    ASGI middleware giving each HTTP request a loader scope. Tasks created while
+    handling the request copy it, so long-running background work must start in
+    a fresh context (see strava_backfill_service._spawn).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        async with loader_scope():
+            await self.app(scope, receive, send)
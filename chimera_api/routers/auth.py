@@ -1,10 +1,11 @@
 import os
+import asyncio
 import logging
 import jwt
+import httpx
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, HTTPException, Depends
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+import request_loader
 from db_client import supabase_admin
 from schemas import ProfileUpdate, GoogleLoginRequest, UserSettingsUpdate, UserSettingsResponse
 from services import user_settings_service
@@ -24,13 +25,17 @@ JWT_SECRET = os.getenv("JWT_SECRET")
 
 # --- LOGIN ---
 @router.post("/auth/google")
-def login_with_google(body: GoogleLoginRequest):
+async def login_with_google(body: GoogleLoginRequest):
+    from google.oauth2 import id_token
+    from google.auth.transport import requests as google_requests
+
     token = body.token
 
     try:
-        # 1. Verify Google Token
-        id_info = id_token.verify_oauth2_token(
-            token, google_requests.Request(), GOOGLE_CLIENT_ID
+        # 1. Verify Google Token (google-auth fetches certs with blocking I/O)
+        id_info = await asyncio.to_thread(
+            id_token.verify_oauth2_token,
+            token, google_requests.Request(), GOOGLE_CLIENT_ID,
         )
         email = id_info.get("email")
         google_sub = id_info.get("sub")
@@ -38,7 +43,7 @@ def login_with_google(body: GoogleLoginRequest):
 
         # 2. Check DB
         response = (
-            supabase_admin.table("users").select("*").eq("email", email).execute()
+            await supabase_admin.table("users").select("*").eq("email", email).execute()
         )
         user = response.data[0] if response.data else None
         is_new_user = False
@@ -54,7 +59,7 @@ def login_with_google(body: GoogleLoginRequest):
         # if not user:
         #     is_new_user = True
         #     new_user_data = {"email": email, "name": name, "google_id": google_sub}
-        #     insert_res = supabase_admin.table("users").insert(new_user_data).execute()
+        #     insert_res = await supabase_admin.table("users").insert(new_user_data).execute()
         #     user = insert_res.data[0]
 
         # 3. Create Session Token (JWT)
@@ -75,7 +80,7 @@ def login_with_google(body: GoogleLoginRequest):
 
 # --- WEB LOGIN (Access Token) ---
 @router.post("/auth/google/web")
-def login_with_google_web(body: dict):
+async def login_with_google_web(body: dict):
     access_token = body.get("access_token")
 
     if not access_token:
@@ -83,18 +88,14 @@ def login_with_google_web(body: dict):
 
     try:
         # 1. Verify Access Token and get user info from Google
-        import urllib.request
-        import json
-
         userinfo_url = "https://www.googleapis.com/oauth2/v2/userinfo"
         headers = {"Authorization": f"Bearer {access_token}"}
 
-        req = urllib.request.Request(userinfo_url, headers=headers)
-
-        with urllib.request.urlopen(req) as response:
-            if response.status != 200:
-                raise ValueError("Invalid access token")
-            user_info = json.loads(response.read().decode())
+        async with httpx.AsyncClient() as client:
+            response = await client.get(userinfo_url, headers=headers)
+        if response.status_code != 200:
+            raise ValueError("Invalid access token")
+        user_info = response.json()
 
         email = user_info.get("email")
         name = user_info.get("name", _persona["defaultUserName"])
@@ -105,7 +106,7 @@ def login_with_google_web(body: dict):
 
         # 2. Check DB
         db_response = (
-            supabase_admin.table("users").select("*").eq("email", email).execute()
+            await supabase_admin.table("users").select("*").eq("email", email).execute()
         )
         user = db_response.data[0] if db_response.data else None
         is_new_user = False
@@ -137,21 +138,23 @@ def login_with_google_web(body: dict):
 
 # --- VERIFY ---
 @router.get("/auth/verify")
-def verify_session(user_id: str = Depends(get_current_user)):
+async def verify_session(user_id: str = Depends(get_current_user)):
     return {"status": "valid", "user_id": user_id}
 
 
 # --- USER MANAGEMENT ---
 @router.delete("/users/me")
-def delete_my_account(user_id: str = Depends(get_current_user)):
-    supabase_admin.table("users").delete().eq("id", user_id).execute()
+async def delete_my_account(user_id: str = Depends(get_current_user)):
+    await supabase_admin.table("users").delete().eq("id", user_id).execute()
+    request_loader.invalidate("users", user_id)
     return {"status": "deleted"}
 
 
 @router.put("/users/profile")
-def update_profile(data: ProfileUpdate, user_id: str = Depends(get_current_user)):
+async def update_profile(data: ProfileUpdate, user_id: str = Depends(get_current_user)):
     update_dict = data.model_dump(exclude_unset=True)
-    supabase_admin.table("users").update(update_dict).eq("id", user_id).execute()
+    await supabase_admin.table("users").update(update_dict).eq("id", user_id).execute()
+    request_loader.invalidate("users", user_id)
     return {"status": "updated"}
 
 
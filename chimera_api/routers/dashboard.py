@@ -1,5 +1,5 @@
 import logging
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from dependencies import get_current_user
 from services import dashboard_service
 
@@ -9,5 +9,8 @@ router = APIRouter(prefix="/v1", tags=["Dashboard"])
 
 
 @router.get("/dashboard")
-async def get_dashboard(user_id: str = Depends(get_current_user)):
-    return await dashboard_service.get_dashboard(user_id)
+async def get_dashboard(
+    weeks: int = Query(dashboard_service.DEFAULT_HISTORY_WEEKS, ge=1, le=520),
+    user_id: str = Depends(get_current_user),
+):
+    return await dashboard_service.get_dashboard(user_id, weeks=weeks)
@@ -0,0 +1,44 @@
+import logging
+from fastapi import APIRouter, Depends
+from dependencies import get_current_user
+import query_metrics
+from services.user_settings_service import settings_cache
+from services import webhook_queue_service
+from strava_client import strava_client
+from services.strava_token_service import token_cache as strava_tokens
+from services.strava_service import athlete_directory
+from services.strava_reconcile_service import reconciler as strava_reconciler
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/v1", tags=["Metrics"])
+
+
+@router.get("/metrics/queries")
+async def get_query_metrics(user_id: str = Depends(get_current_user)):
+    """Per-table latency histograms, per-route query counts and recent N+1 suspects."""
+    metrics = query_metrics.snapshot()
+    metrics["settings_cache"] = settings_cache.stats()
+    return metrics
+
+
+@router.get("/metrics/webhooks")
+async def get_webhook_metrics(user_id: str = Depends(get_current_user)):
+    """Webhook worker counters for this process."""
+    pool = webhook_queue_service.worker_pool
+    return {
+        "worker_id": pool.worker_id,
+        "workers": pool.workers,
+        "max_attempts": webhook_queue_service.WEBHOOK_MAX_ATTEMPTS,
+        **pool.stats,
+    }
+
+
+@router.get("/metrics/strava")
+async def get_strava_metrics(user_id: str = Depends(get_current_user)):
+    """Strava quota usage as seen by this process, per-lane grants and queueing, caches and reconciliation."""
+    metrics = strava_client.limiter.stats()
+    metrics["tokens"] = strava_tokens.stats()
+    metrics["athletes"] = athlete_directory.stats()
+    metrics["reconcile"] = strava_reconciler.stats()
+    return metrics
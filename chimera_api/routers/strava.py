@@ -1,15 +1,27 @@
 import os
+import json
+import math
+import time
+import asyncio
 import logging
-import requests
-from fastapi import APIRouter, HTTPException, Depends, Query
-from fastapi.responses import HTMLResponse
+from uuid import UUID
+import tempfile
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 from db_client import supabase_admin
+from strava_client import strava_client, wait_budget, RateLimited, STRAVA_AUTH_URL
 from urllib.parse import urlencode, urlparse
 from html import escape
 
 # Import services if you need to use the webhook handler,
 # or you can move that logic here later.
 from services import strava_service
+from services import user_settings_service
+from services import webhook_queue_service
+from services import strava_backfill_service
+from services import activity_stream_service
+from services import plan_link_service
+from services import strava_import_service
 from services.analytics_service import track as analytics_track
 from schemas import StravaWebhookEvent, StravaChallengeResponse, StravaAuthCode
 from dependencies import get_current_user
@@ -20,11 +32,17 @@ router = APIRouter(prefix="/v1", tags=["Integrations"])
 STRAVA_CLIENT_ID = os.getenv("STRAVA_CLIENT_ID")
 STRAVA_CLIENT_SECRET = os.getenv("STRAVA_CLIENT_SECRET")
 STRAVA_VERIFY_TOKEN = os.getenv("STRAVA_VERIFY_TOKEN")
+SYNC_EVENTS_POLL_SECONDS = 1.0
+EXPORT_SPOOL_BYTES = 8 * 1024 * 1024
+# Exports include every track and photo; activities.csv itself is small
+EXPORT_MAX_BYTES = int(os.getenv("STRAVA_EXPORT_MAX_BYTES", str(512 * 1024 * 1024)))
+# Longest an OAuth exchange queues for the rate limit before answering 503
+EXCHANGE_MAX_WAIT_SECONDS = float(os.getenv("STRAVA_EXCHANGE_MAX_WAIT_SECONDS", "5"))
 
 
 # --- 1. TOKEN EXCHANGE (THE FIX) ---
 @router.post("/integrations/strava/exchange")
-def exchange_strava_token(
+async def exchange_strava_token(
     payload: StravaAuthCode,
     user_id: str = Depends(get_current_user),
 ):
@@ -34,17 +52,26 @@ def exchange_strava_token(
     """
 
     # B. Exchange with Strava
-    response = requests.post(
-        "https://www.strava.com/oauth/token",
-        data={
-            "client_id": STRAVA_CLIENT_ID,
-            "client_secret": STRAVA_CLIENT_SECRET,
-            "code": payload.code,
-            "grant_type": "authorization_code",
-        },
-    )
+    try:
+        with wait_budget(EXCHANGE_MAX_WAIT_SECONDS):
+            response = await strava_client.post(
+                STRAVA_AUTH_URL,
+                data={
+                    "client_id": STRAVA_CLIENT_ID,
+                    "client_secret": STRAVA_CLIENT_SECRET,
+                    "code": payload.code,
+                    "grant_type": "authorization_code",
+                },
+            )
+    except RateLimited as e:
+        retry_after = max(1, math.ceil(e.resets_at - time.time()))
+        raise HTTPException(
+            status_code=503,
+            detail="Strava rate limit reached; try connecting again shortly",
+            headers={"Retry-After": str(retry_after)},
+        )
 
-    if not response.ok:
+    if not response.is_success:
         raise HTTPException(status_code=400, detail="Strava exchange failed")
 
     strava_data = response.json()
@@ -62,11 +89,17 @@ def exchange_strava_token(
         # We strictly UPDATE. If the user_settings row is missing, this returns error or 0 rows.
         # This enforces that users must be properly initialized by the Auth system first.
         result = (
-            supabase_admin.table("user_settings")
+            await supabase_admin.table("user_settings")
             .update(data_to_update)
             .eq("user_id", user_id)
             .execute()
         )
+        user_settings_service.invalidate_user_settings(user_id)
+        athlete_id = strava_data.get("athlete", {}).get("id")
+        if result.data and athlete_id:
+            # Other workers drop any old mapping or negative entry; this one learns it now
+            strava_service.athlete_directory.invalidate(user_id, athlete_id)
+            strava_service.athlete_directory.connect(athlete_id, user_id)
 
         # Optional: Check if update actually happened
         if not result.data:
@@ -154,9 +187,9 @@ async def webhook_strava_event(payload: StravaWebhookEvent):
         "update",
         "delete",
     ):
-        await strava_service.handle_webhook_event(
-            payload.object_id, payload.owner_id, payload.aspect_type
-        )
+        # Persist and acknowledge within Strava's 2s window; workers do the rest.
+        # A DB error surfaces as a 500 so Strava redelivers the event.
+        await webhook_queue_service.enqueue(payload.model_dump())
     return {"status": "event received"}
 
 
@@ -164,7 +197,7 @@ async def webhook_strava_event(payload: StravaWebhookEvent):
 
 
 @router.get("/integrations/strava/auth-url")
-def get_strava_auth_url(return_url: str):
+async def get_strava_auth_url(return_url: str):
     """
     Generates the Strava OAuth URL on the server side.
     """
@@ -192,17 +225,108 @@ def get_strava_auth_url(return_url: str):
 
 
 # --- 5. HISTORICAL SYNC ---
-@router.post("/integrations/strava/sync")
+@router.post("/integrations/strava/sync", status_code=202)
 async def sync_strava_activities(
     days: int = Query(default=30, ge=1, le=365),
     user_id: str = Depends(get_current_user),
 ):
-    """Backfill recent Strava activities into the database."""
-    result = await strava_service.sync_recent_activities(user_id, days=days)
+    """Start (or resume) a background backfill of recent Strava activities."""
+    job = await strava_backfill_service.start_backfill(user_id, days=days)
+    return strava_backfill_service.progress(job)
+
+
+@router.get("/integrations/strava/sync")
+async def get_sync_progress(user_id: str = Depends(get_current_user)):
+    """Progress of the user's latest backfill (poll this, or stream /events)."""
+    job = await strava_backfill_service.get_latest_job(user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No Strava sync found")
+    return strava_backfill_service.progress(job)
+
+
+@router.get("/integrations/strava/sync/{job_id}/events")
+async def stream_sync_progress(job_id: UUID, user_id: str = Depends(get_current_user)):
+    """Server-sent events: one `progress` event per change until the job finishes."""
+    job = await strava_backfill_service.get_job(user_id, str(job_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+
+    async def events():
+        last = None
+        current = job
+        while True:
+            snapshot = strava_backfill_service.progress(current)
+            if snapshot != last:
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+                last = snapshot
+            if snapshot["status"] in ("done", "failed"):
+                return
+            await asyncio.sleep(SYNC_EVENTS_POLL_SECONDS)
+            current = await strava_backfill_service.get_job(user_id, str(job_id)) or current
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/integrations/strava/import")
+async def import_strava_export(request: Request, user_id: str = Depends(get_current_user)):
+    """
+    Import a Strava bulk-export ZIP sent as the raw request body
+    (Content-Type: application/zip). No Strava API calls are made.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Export exceeds {EXPORT_MAX_BYTES // (1024 * 1024)} MB")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > EXPORT_MAX_BYTES:
+        raise too_large
+
+    # Spooled to disk past a few MB: zipfile needs a seekable file, not the whole body in memory
+    with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as upload:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            # Content-Length may be absent (chunked) or wrong: count what actually arrives
+            if received > EXPORT_MAX_BYTES:
+                raise too_large
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            return await strava_import_service.import_archive(user_id, upload)
+        except strava_import_service.InvalidExport as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/integrations/strava/relink")
+async def relink_strava_activities(user_id: str = Depends(get_current_user)):
+    """Recompute links between all of the user's Strava activities and planned workouts."""
+    return await plan_link_service.relink_history(user_id)
+
+
+# --- 6. ACTIVITY STREAMS ---
+@router.get("/activities/{activity_id}/streams")
+async def get_activity_streams(
+    activity_id: UUID,
+    points: int = Query(default=activity_stream_service.DEFAULT_CHART_POINTS, ge=3, le=5000),
+    channels: str | None = Query(default=None, description="Comma-separated, e.g. heartrate,altitude"),
+    x: str = Query(default="time", pattern="^(time|distance)$"),
+    user_id: str = Depends(get_current_user),
+):
+    """Chart-ready, downsampled stream series; fetched from Strava on first request."""
+    wanted = [c.strip() for c in channels.split(",") if c.strip()] if channels else None
+    try:
+        result = await activity_stream_service.chart(
+            user_id, str(activity_id), points=points, channels=wanted, x=x
+        )
+    except activity_stream_service.StreamsUnavailable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Activity not found")
     return result
 
 
-# --- 6. DISCONNECT ---
+# --- 7. DISCONNECT ---
 @router.delete("/integrations/strava")
 async def disconnect_strava(user_id: str = Depends(get_current_user)):
     """Clear Strava tokens and disconnect the integration."""
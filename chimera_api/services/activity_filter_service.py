@@ -1,26 +1,27 @@
 import logging
+from services.user_settings_service import load_user_settings, invalidate_user_settings
 from db_client import supabase_admin
+from projections import ACTIVITY_SUMMARY
 
 logger = logging.getLogger(__name__)
 
 
+async def get_tracked_types(user_id: str) -> list[str]:
+    """Tracked activity types from the user's cached settings row."""
+    settings = await load_user_settings(user_id) or {}
+    return settings.get("tracked_activity_types") or []
+
+
 async def initialize_tracked_types(user_id: str) -> list[str]:
     """Query distinct original_activity_type from completed_activities,
     set all as tracked in user_settings. Only runs if tracked_activity_types is empty."""
-    settings_resp = (
-        supabase_admin.table("user_settings")
-        .select("tracked_activity_types")
-        .eq("user_id", user_id)
-        .limit(1)
-        .execute()
-    )
-    existing = (settings_resp.data or [{}])[0].get("tracked_activity_types") or []
+    existing = await get_tracked_types(user_id)
     if existing:
         return existing
 
     # Get distinct types from completed activities
     activities_resp = (
-        supabase_admin.table("completed_activities")
+        await supabase_admin.table("completed_activities")
         .select("original_activity_type")
         .eq("user_id", user_id)
         .not_.is_("original_activity_type", "null")
@@ -33,9 +34,10 @@ async def initialize_tracked_types(user_id: str) -> list[str]:
     ))
 
     if types:
-        supabase_admin.table("user_settings").update(
+        await supabase_admin.table("user_settings").update(
             {"tracked_activity_types": types}
         ).eq("user_id", user_id).execute()
+        invalidate_user_settings(user_id)
 
     return types
 
@@ -60,20 +62,12 @@ async def get_activities_for_stats(
     user_id: str, start_date: str, end_date: str
 ) -> list[dict]:
     """Fetch completed activities filtered by tracked types and overrides."""
-    # Get tracked types
-    settings_resp = (
-        supabase_admin.table("user_settings")
-        .select("tracked_activity_types")
-        .eq("user_id", user_id)
-        .limit(1)
-        .execute()
-    )
-    tracked_types = (settings_resp.data or [{}])[0].get("tracked_activity_types") or []
+    tracked_types = await get_tracked_types(user_id)
 
     # Fetch all activities in range
     activities_resp = (
-        supabase_admin.table("completed_activities")
-        .select("*")
+        await supabase_admin.table("completed_activities")
+        .select(ACTIVITY_SUMMARY)
         .eq("user_id", user_id)
         .gte("start_time", start_date)
         .lte("start_time", end_date)
@@ -91,8 +85,8 @@ async def toggle_activity_stats(
     """Set per-activity stats override. Clears override when matching global default."""
     # Fetch the activity
     activity_resp = (
-        supabase_admin.table("completed_activities")
-        .select("original_activity_type")
+        await supabase_admin.table("completed_activities")
+        .select("original_activity_type, start_time")
         .eq("id", activity_id)
         .eq("user_id", user_id)
         .limit(1)
@@ -103,15 +97,7 @@ async def toggle_activity_stats(
 
     activity = activity_resp.data[0]
 
-    # Fetch tracked types
-    settings_resp = (
-        supabase_admin.table("user_settings")
-        .select("tracked_activity_types")
-        .eq("user_id", user_id)
-        .limit(1)
-        .execute()
-    )
-    tracked_types = (settings_resp.data or [{}])[0].get("tracked_activity_types") or []
+    tracked_types = await get_tracked_types(user_id)
 
     # Determine if the override matches the global default
     globally_included = activity.get("original_activity_type") in tracked_types
@@ -123,10 +109,14 @@ async def toggle_activity_stats(
         # Set override
         update = {"stats_override": True, "stats_excluded": not include}
 
-    supabase_admin.table("completed_activities").update(
+    await supabase_admin.table("completed_activities").update(
         update
     ).eq("id", activity_id).eq("user_id", user_id).execute()
 
+    # Override moves the activity between rollup stats modes
+    from services import training_rollup_service
+    await training_rollup_service.refresh_weeks(user_id, [activity.get("start_time")])
+
     return {"status": "updated", "stats_included": include}
 
 
@@ -136,20 +126,14 @@ async def auto_add_new_type(user_id: str, activity_type: str):
         return
 
     try:
-        settings_resp = (
-            supabase_admin.table("user_settings")
-            .select("tracked_activity_types")
-            .eq("user_id", user_id)
-            .limit(1)
-            .execute()
-        )
-        tracked = (settings_resp.data or [{}])[0].get("tracked_activity_types") or []
+        tracked = await get_tracked_types(user_id)
 
         if activity_type not in tracked:
             updated = sorted(tracked + [activity_type])
-            supabase_admin.table("user_settings").update(
+            await supabase_admin.table("user_settings").update(
                 {"tracked_activity_types": updated}
             ).eq("user_id", user_id).execute()
+            invalidate_user_settings(user_id)
             logger.info(f"Auto-added activity type '{activity_type}' for user {user_id}")
     except Exception as e:
         logger.warning(f"Failed to auto-add activity type: {e}")
@@ -0,0 +1,161 @@
+"""
+Cold store for raw Strava activity payloads.
+
+completed_activities used to carry the full Strava detail JSON in
+activity_data_blob, so every scan of the hot table (dashboards, compliance,
+agent context) paid for it in heap, TOAST and select("*") traffic. Raw payloads
+now live in activity_payloads, zlib-compressed and keyed by the SHA-256 of their
+canonical JSON; activities reference them through payload_hash.
+
+Payloads are immutable per hash, so writes are insert-if-absent (identical
+re-fetches cost nothing) and reads are cached in process. Only callers that
+need the raw blob (webhook patches, exports) load it, via load_raw().
+
+migrate_batch() moves legacy activity_data_blob values into the store; see
+migrate_payloads.py.
+"""
+import json
+import zlib
+import base64
+import hashlib
+import logging
+from collections import OrderedDict
+
+from db_client import supabase_admin
+
+logger = logging.getLogger(__name__)
+
+ENCODING = "zlib+json"
+CACHE_SIZE = 256
+MIGRATE_BATCH_SIZE = 200
+
+
+def _canonical(data: dict) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+
+
+def payload_hash(data: dict) -> str:
+    """Content address of a payload: SHA-256 of its canonical JSON."""
+    return hashlib.sha256(_canonical(data)).hexdigest()
+
+
+def _encode(data: dict) -> dict:
+    raw = _canonical(data)
+    blob = zlib.compress(raw, 6)
+    return {
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "encoding": ENCODING,
+        "data": base64.b64encode(blob).decode(),
+        "raw_bytes": len(raw),
+        "stored_bytes": len(blob),
+    }
+
+
+def _decode(row: dict) -> dict:
+    return json.loads(zlib.decompress(base64.b64decode(row["data"])))
+
+
+_cache: OrderedDict[str, dict] = OrderedDict()
+
+
+def _remember(key: str, data: dict):
+    _cache[key] = data
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+async def put_many(payloads: list[dict]) -> list[str]:
+    """Store payloads (one round trip) and return their hashes, in order."""
+    rows = {}
+    hashes = []
+    for data in payloads:
+        row = _encode(data)
+        rows[row["hash"]] = row
+        hashes.append(row["hash"])
+    if rows:
+        await supabase_admin.table("activity_payloads").upsert(
+            list(rows.values()), on_conflict="hash", ignore_duplicates=True
+        ).execute()
+    return hashes
+
+
+async def put(data: dict) -> str:
+    [key] = await put_many([data])
+    return key
+
+
+async def get_many(hashes: list[str]) -> dict[str, dict]:
+    """Payloads by hash; cached ones skip the database."""
+    found = {h: _cache[h] for h in hashes if h in _cache}
+    missing = sorted({h for h in hashes if h and h not in found})
+    if missing:
+        response = (
+            await supabase_admin.table("activity_payloads")
+            .select("hash, data")
+            .in_("hash", missing)
+            .execute()
+        )
+        for row in response.data or []:
+            found[row["hash"]] = _decode(row)
+            _remember(row["hash"], found[row["hash"]])
+    return found
+
+
+async def get(key: str) -> dict | None:
+    return (await get_many([key])).get(key)
+
+
+async def load_raw(activity: dict) -> dict | None:
+    """
+    Raw Strava payload of a completed_activities row selected with
+    payload_hash and activity_data_blob (legacy rows not migrated yet).
+    """
+    if activity.get("activity_data_blob"):
+        return activity["activity_data_blob"]
+    if activity.get("payload_hash"):
+        return await get(activity["payload_hash"])
+    return None
+
+
+# --- Migration ---
+
+
+async def migrate_batch(batch_size: int = MIGRATE_BATCH_SIZE) -> int:
+    """Move one batch of legacy activity_data_blob values to the store. Returns rows moved."""
+    response = (
+        await supabase_admin.table("completed_activities")
+        .select("id, activity_data_blob")
+        .is_("payload_hash", "null")
+        .not_.is_("activity_data_blob", "null")
+        .limit(batch_size)
+        .execute()
+    )
+    rows = response.data or []
+    if not rows:
+        return 0
+
+    blobs = [
+        json.loads(r["activity_data_blob"]) if isinstance(r["activity_data_blob"], str) else r["activity_data_blob"]
+        for r in rows
+    ]
+    hashes = await put_many(blobs)
+    # Stored before any row points at it; per-row values, so one update per row
+    for row, key in zip(rows, hashes):
+        await supabase_admin.table("completed_activities").update(
+            {"payload_hash": key, "activity_data_blob": None}
+        ).eq("id", row["id"]).execute()
+    return len(rows)
+
+
+async def migrate_all(batch_size: int = MIGRATE_BATCH_SIZE, max_batches: int | None = None) -> int:
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count = await migrate_batch(batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        logger.info(f"Moved {moved} activity payloads to the cold store")
+    return moved
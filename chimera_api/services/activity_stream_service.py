@@ -0,0 +1,275 @@
+"""
+Strava activity streams (per-second time, HR, pace, power, cadence, altitude...).
+
+Streams are fetched from Strava only when an activity is first charted, then
+kept in activity_streams in a compact columnar encoding instead of JSON:
+
+    b"CHS1" + zlib(header + columns)
+    header  = u32 channel count, then per channel: u8 name length, name,
+              f64 scale, u32 sample count
+    columns = per channel, round(value * scale) delta-encoded as int32 LE
+
+Quantized deltas of smooth signals are tiny integers, so zlib squeezes a
+typical stream to a few percent of Strava's JSON. Decoding reads each column
+straight out of the decompressed buffer through a memoryview.
+
+Charts never ship the raw series: chart() downsamples each channel with
+Largest-Triangle-Three-Buckets (LTTB), which keeps peaks and troughs that plain
+stride sampling drops.
+"""
+import sys
+import zlib
+import base64
+import struct
+import logging
+from array import array
+from itertools import accumulate
+
+from db_client import supabase_admin
+from strava_client import strava_client, STRAVA_API_URL
+
+logger = logging.getLogger(__name__)
+
+ENCODING = "chs1"
+MAGIC = b"CHS1"
+
+# Channel -> quantization scale (stored integer = round(value * scale))
+CHANNEL_SCALES = {
+    "time": 1,
+    "distance": 10,            # 0.1 m
+    "lat": 1_000_000,          # ~0.1 m
+    "lng": 1_000_000,
+    "altitude": 10,            # 0.1 m
+    "velocity_smooth": 1000,   # mm/s
+    "heartrate": 1,
+    "cadence": 1,
+    "watts": 1,
+    "temp": 1,
+    "moving": 1,
+    "grade_smooth": 10,        # 0.1 %
+}
+STREAM_KEYS = [
+    "time", "distance", "latlng", "altitude", "velocity_smooth", "heartrate",
+    "cadence", "watts", "temp", "moving", "grade_smooth",
+]
+DEFAULT_CHART_POINTS = 300
+
+
+class StreamsUnavailable(Exception):
+    """The activity has no streams (not a Strava activity, or Strava has none)."""
+
+
+# --- Encoding ---
+
+
+def _columns(streams: dict) -> dict[str, list]:
+    """Flatten Strava's key_by_type response into one numeric list per channel."""
+    columns = {}
+    for key, stream in streams.items():
+        data = stream.get("data") if isinstance(stream, dict) else stream
+        if not data:
+            continue
+        if key == "latlng":
+            columns["lat"] = [p[0] if p else None for p in data]
+            columns["lng"] = [p[1] if p else None for p in data]
+        elif key in CHANNEL_SCALES:
+            columns[key] = data
+    return columns
+
+
+def encode_streams(streams: dict) -> bytes:
+    """Encode a Strava streams response (key_by_type=true) into the CHS1 format."""
+    header = bytearray()
+    body = bytearray()
+    columns = _columns(streams)
+    header += struct.pack("<I", len(columns))
+    for name, values in columns.items():
+        scale = CHANNEL_SCALES[name]
+        encoded = name.encode()
+        header += struct.pack("<B", len(encoded)) + encoded + struct.pack("<dI", scale, len(values))
+
+        deltas = array("i")
+        previous = 0
+        for value in values:
+            # Gaps repeat the previous sample (delta 0)
+            current = previous if value is None else round(float(value) * scale)
+            deltas.append(current - previous)
+            previous = current
+        if sys.byteorder == "big":
+            deltas.byteswap()
+        body += deltas.tobytes()
+    return MAGIC + zlib.compress(bytes(header + body), 9)
+
+
+def decode_streams(blob: bytes, channels: list[str] | None = None) -> dict[str, list[float]]:
+    """Decode CHS1 bytes into {channel: values}; only `channels` when given."""
+    if blob[:4] != MAGIC:
+        raise ValueError("Not an encoded activity stream")
+    buffer = memoryview(zlib.decompress(blob[4:]))
+    (count,) = struct.unpack_from("<I", buffer, 0)
+    offset = 4
+    layout = []
+    for _ in range(count):
+        name_len = buffer[offset]
+        name = bytes(buffer[offset + 1:offset + 1 + name_len]).decode()
+        offset += 1 + name_len
+        scale, samples = struct.unpack_from("<dI", buffer, offset)
+        offset += 12
+        layout.append((name, scale, samples))
+
+    result = {}
+    for name, scale, samples in layout:
+        size = samples * 4
+        if channels is None or name in channels:
+            deltas = array("i")
+            deltas.frombytes(buffer[offset:offset + size])
+            if sys.byteorder == "big":
+                deltas.byteswap()
+            if scale == 1:
+                result[name] = list(accumulate(deltas))
+            else:
+                result[name] = [v / scale for v in accumulate(deltas)]
+        offset += size
+    return result
+
+
+# --- Downsampling ---
+
+
+def lttb(xs: list[float], ys: list[float], threshold: int) -> list[list[float]]:
+    """Largest-Triangle-Three-Buckets: reduce (x, y) to `threshold` visually faithful points."""
+    n = min(len(xs), len(ys))
+    if threshold >= n or threshold < 3:
+        return [[xs[i], ys[i]] for i in range(n)]
+
+    sampled = [[xs[0], ys[0]]]
+    bucket = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        # Average of the next bucket (the last point, at the end) is the third corner
+        next_end = min(int((i + 2) * bucket) + 1, n)
+        span = next_end - end
+        avg_x = sum(xs[end:next_end]) / span
+        avg_y = sum(ys[end:next_end]) / span
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append([xs[best], ys[best]])
+        a = best
+    sampled.append([xs[n - 1], ys[n - 1]])
+    return sampled
+
+
+# --- Storage ---
+
+
+async def _get_activity(user_id: str, activity_id: str) -> dict | None:
+    response = (
+        await supabase_admin.table("completed_activities")
+        .select("id, source_type, source_id")
+        .eq("user_id", user_id)
+        .eq("id", activity_id)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def fetch_and_store(user_id: str, activity: dict) -> dict:
+    """Fetch an activity's streams from Strava and store them encoded."""
+    from services.strava_service import _get_access_token
+
+    if activity.get("source_type") != "strava":
+        raise StreamsUnavailable("Only Strava activities have streams")
+
+    token = await _get_access_token(user_id)
+    r = await strava_client.get(
+        f"{STRAVA_API_URL}/activities/{activity['source_id']}/streams",
+        headers={"Authorization": f"Bearer {token}"},
+        params={"keys": ",".join(STREAM_KEYS), "key_by_type": "true"},
+    )
+    if r.status_code == 404:
+        raise StreamsUnavailable("Strava has no streams for this activity")
+    r.raise_for_status()
+    streams = r.json()
+
+    blob = encode_streams(streams)
+    columns = _columns(streams)
+    row = {
+        "completed_activity_id": activity["id"],
+        "user_id": user_id,
+        "encoding": ENCODING,
+        "sample_count": max((len(v) for v in columns.values()), default=0),
+        "channels": list(columns),
+        "data": base64.b64encode(blob).decode(),
+        "raw_bytes": len(r.content),
+        "stored_bytes": len(blob),
+    }
+    await supabase_admin.table("activity_streams").upsert(
+        row, on_conflict="completed_activity_id"
+    ).execute()
+    logger.info(
+        f"Stored {row['sample_count']} stream samples for activity {activity['id']}: "
+        f"{row['raw_bytes']} -> {row['stored_bytes']} bytes"
+    )
+    return row
+
+
+async def get_streams(
+    user_id: str, activity_id: str, channels: list[str] | None = None
+) -> tuple[dict, dict[str, list[float]]] | None:
+    """
+    Stored (or, on first use, freshly fetched) streams of one of the user's
+    activities as (row, {channel: values}). None if the activity isn't theirs.
+    """
+    response = (
+        await supabase_admin.table("activity_streams")
+        .select("*")
+        .eq("completed_activity_id", activity_id)
+        .eq("user_id", user_id)
+        .execute()
+    )
+    if response.data:
+        row = response.data[0]
+    else:
+        activity = await _get_activity(user_id, activity_id)
+        if not activity:
+            return None
+        row = await fetch_and_store(user_id, activity)
+    return row, decode_streams(base64.b64decode(row["data"]), channels)
+
+
+async def chart(
+    user_id: str,
+    activity_id: str,
+    points: int = DEFAULT_CHART_POINTS,
+    channels: list[str] | None = None,
+    x: str = "time",
+) -> dict | None:
+    """LTTB-downsampled [x, y] series per channel, for rendering charts."""
+    wanted = None if channels is None else list({*channels, x})
+    loaded = await get_streams(user_id, activity_id, wanted)
+    if loaded is None:
+        return None
+    row, columns = loaded
+
+    xs = columns.get(x)
+    if xs is None:
+        raise StreamsUnavailable(f"Activity has no '{x}' stream")
+    series = {
+        name: lttb(xs, values, points)
+        for name, values in columns.items()
+        if name != x
+    }
+    return {
+        "activity_id": activity_id,
+        "x": x,
+        "sample_count": row["sample_count"],
+        "points": points,
+        "series": series,
+    }
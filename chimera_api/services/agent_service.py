@@ -1,20 +1,54 @@
 import os
 import time
 import logging
-import google.generativeai as genai
+from collections.abc import AsyncIterator
+
+import request_loader
 from db_client import supabase_admin
-from ai_tools import tools_schema, execute_tool_call
+from ai_tools import tools_schema, execute_tool_calls
 from services.context_service import build_agent_context, format_context_for_prompt
 from services.analytics_service import track as analytics_track
+from services.plan_working_set import working_set_scope
 from package_loader import get_persona, get_system_prompt
 
 logger = logging.getLogger(__name__)
 
 MAX_ITERATIONS = 6
+MODEL_NAME = "gemini-2.5-flash"
 
 _persona = get_persona()
 _prompt_template = get_system_prompt()
 
+_genai = None
+_model = None
+
+
+def _get_genai():
+    """Import and configure the Gemini SDK on first use (keeps it out of cold start)."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+
+        api_key = os.getenv("GEMINI_API_KEY")
+        if api_key:
+            genai.configure(api_key=api_key.strip())
+        _genai = genai
+    return _genai
+
+
+def _get_model():
+    """The configured Gemini model, built once: per-user state lives in the chat history."""
+    global _model
+    if _model is None:
+        _model = _get_genai().GenerativeModel(model_name=MODEL_NAME, tools=tools_schema)
+    return _model
+
+
+def _text_parts(response) -> list[str]:
+    if not response.candidates:
+        return []
+    return [p.text for p in response.candidates[0].content.parts if hasattr(p, "text") and p.text]
+
 
 def _build_system_prompt(context_text: str) -> str:
     """Build the full system prompt with training context injected."""
@@ -28,7 +62,7 @@ async def _load_chat_history(user_id: str, limit: int = 10) -> list:
     """Load recent chat history for conversation context."""
     try:
         response = (
-            supabase_admin.table("chat_logs")
+            await supabase_admin.table("chat_logs")
             .select("user_message, ai_response")
             .eq("user_id", user_id)
             .order("created_at", desc=True)
@@ -57,10 +91,40 @@ async def run_agent(user_id: str, user_message: str) -> dict:
     """
     Main agent entry point implementing Plan-Act-Reflect loop.
 
+    Runs stream_agent() to completion for callers that want the whole reply.
+
     Returns: {"reply": str, "tools_used": list, "iterations": int}
     """
+    result = {}
+    async for event in stream_agent(user_id, user_message):
+        if event["type"] == "done":
+            result = event
+    return {key: result[key] for key in ("reply", "tools_used", "iterations")}
+
+
+async def stream_agent(user_id: str, user_message: str) -> AsyncIterator[dict]:
+    """
+    Run the agent loop, yielding events as they happen:
+
+        {"type": "token", "text": str}         model output, as Gemini streams it
+        {"type": "tool_call", "name": str}     a tool is about to run
+        {"type": "tool_result", "name": str, "status": "ok" | "error"}
+        {"type": "done", "reply": str, "tools_used": list, "iterations": int}
+
+    Tokens of a turn that ends in tool calls are interim; "done" carries the
+    final reply. Context building and every tool call share one loader scope,
+    so the settings/profile rows are read once per run, and one plan working
+    set, so the plan around today is read once and tools look days up in memory.
+    """
+    async with request_loader.loader_scope(), working_set_scope(user_id):
+        async for event in _stream_agent(user_id, user_message):
+            yield event
+
+
+async def _stream_agent(user_id: str, user_message: str) -> AsyncIterator[dict]:
     tools_used = []
     start_time = time.time()
+    first_token_ms = None
 
     # --- PLAN PHASE ---
     # 1. Build training context
@@ -79,17 +143,25 @@ async def run_agent(user_id: str, user_message: str) -> dict:
     initial_history.extend(chat_history)
 
     # --- ACT PHASE ---
-    model = genai.GenerativeModel(
-        model_name="gemini-2.5-flash",
-        tools=tools_schema,
-    )
-    chat = model.start_chat(history=initial_history)
-    response = chat.send_message(user_message)
+    chat = _get_model().start_chat(history=initial_history)
+    response = await chat.send_message_async(user_message, stream=True)
 
     final_reply = ""
     iteration = 0
 
-    while iteration < MAX_ITERATIONS:
+    while True:
+        # Stream this turn's text; the response aggregates chunks for the checks below
+        async for chunk in response:
+            for text in _text_parts(chunk):
+                if first_token_ms is None:
+                    first_token_ms = int((time.time() - start_time) * 1000)
+                yield {"type": "token", "text": text}
+
+        if iteration >= MAX_ITERATIONS:
+            # Hit max iterations -- graceful fallback
+            text_parts = _text_parts(response)
+            final_reply = "\n".join(text_parts) if text_parts else _persona["agentMaxIterationMessage"]
+            break
         iteration += 1
 
         if not response.candidates:
@@ -103,24 +175,21 @@ async def run_agent(user_id: str, user_message: str) -> dict:
 
         # If no function calls, extract text and we're done
         if not function_calls:
-            text_parts = [p.text for p in parts if hasattr(p, "text") and p.text]
+            text_parts = _text_parts(response)
             final_reply = "\n".join(text_parts) if text_parts else _persona["agentFallbackMessage"]
             break
 
-        # Execute all function calls (parallel within this iteration)
-        function_responses = []
-        for fc_part in function_calls:
-            fname = fc_part.function_call.name
-            fargs = dict(fc_part.function_call.args)
+        # Execute all function calls of this iteration: reads in parallel, writes in order
+        calls = [(p.function_call.name, dict(p.function_call.args)) for p in function_calls]
+        for fname, _ in calls:
+            yield {"type": "tool_call", "name": fname}
 
-            try:
-                tool_result = await execute_tool_call(fname, fargs, user_id)
+        # --- REFLECT: errors are fed back so Gemini can retry or explain ---
+        function_responses = []
+        for (fname, _), (tool_result, ok) in zip(calls, await execute_tool_calls(calls, user_id)):
+            if ok:
                 tools_used.append(fname)
-            except Exception as e:
-                # --- REFLECT: Feed errors back so Gemini can retry or explain ---
-                logger.error(f"Tool execution error ({fname}): {e}")
-                tool_result = {"status": "error", "message": str(e)}
-
+            yield {"type": "tool_result", "name": fname, "status": "ok" if ok else "error"}
             function_responses.append({
                 "function_response": {
                     "name": fname,
@@ -129,17 +198,12 @@ async def run_agent(user_id: str, user_message: str) -> dict:
             })
 
         # Send all tool results back to Gemini for next iteration
-        response = chat.send_message(function_responses)
-
-    else:
-        # Hit max iterations -- graceful fallback
-        text_parts = [p.text for p in response.candidates[0].content.parts if hasattr(p, "text") and p.text] if response.candidates else []
-        final_reply = "\n".join(text_parts) if text_parts else _persona["agentMaxIterationMessage"]
+        response = await chat.send_message_async(function_responses, stream=True)
 
     # --- LOG PHASE ---
     if supabase_admin:
         try:
-            supabase_admin.table("chat_logs").insert(
+            await supabase_admin.table("chat_logs").insert(
                 {
                     "user_id": user_id,
                     "user_message": user_message,
@@ -151,13 +215,15 @@ async def run_agent(user_id: str, user_message: str) -> dict:
 
     response_time_ms = int((time.time() - start_time) * 1000)
     analytics_track(user_id, "coach_response_generated", {
-        "model": "gemini-2.5-flash",
+        "model": MODEL_NAME,
         "tools_used": tools_used,
         "iterations": iteration,
         "response_time_ms": response_time_ms,
+        "first_token_ms": first_token_ms,
     })
 
-    return {
+    yield {
+        "type": "done",
         "reply": final_reply,
         "tools_used": tools_used,
         "iterations": iteration,
@@ -8,6 +8,7 @@ from services.user_settings_service import (
     get_local_now,
 )
 from services.activity_filter_service import is_activity_included
+from services.plan_working_set import current_working_set
 
 logger = logging.getLogger(__name__)
 
@@ -44,16 +45,26 @@ async def build_agent_context(user_id: str) -> dict:
     try:
         start = now.strftime("%Y-%m-%dT00:00:00")
         end = (now + timedelta(days=7)).strftime("%Y-%m-%dT23:59:59")
-        resp = (
-            supabase_admin.table("planned_workouts")
-            .select("title, activity_type, start_time, status, description")
-            .eq("user_id", user_id)
-            .gte("start_time", start)
-            .lte("start_time", end)
-            .order("start_time", desc=False)
-            .execute()
-        )
-        context["upcoming_workouts"] = resp.data or []
+        working_set = current_working_set(user_id)
+        if working_set:
+            # One load covers this list and the agent's tool lookups around today
+            await working_set.load_window(now.date())
+            workouts = await working_set.between(start, end)
+            context["upcoming_workouts"] = [
+                {k: w.get(k) for k in ("title", "activity_type", "start_time", "status", "description")}
+                for w in workouts
+            ]
+        else:
+            resp = (
+                await supabase_admin.table("planned_workouts")
+                .select("title, activity_type, start_time, status, description")
+                .eq("user_id", user_id)
+                .gte("start_time", start)
+                .lte("start_time", end)
+                .order("start_time", desc=False)
+                .execute()
+            )
+            context["upcoming_workouts"] = resp.data or []
     except Exception as e:
         logger.warning(f"Failed to fetch upcoming workouts: {e}")
         context["upcoming_workouts"] = []
@@ -63,7 +74,7 @@ async def build_agent_context(user_id: str) -> dict:
         log_start = (now - timedelta(days=7)).strftime("%Y-%m-%d")
         log_end = now.strftime("%Y-%m-%d")
         resp = (
-            supabase_admin.table("daily_checkin")
+            await supabase_admin.table("daily_checkin")
             .select("date, entry_type, readiness, soreness, energy, mood, note, session_rpe, body_weight, body_weight_unit")
             .eq("user_id", user_id)
             .gte("date", log_start)
@@ -81,7 +92,7 @@ async def build_agent_context(user_id: str) -> dict:
         act_start = (now - timedelta(days=7)).strftime("%Y-%m-%dT00:00:00")
         act_end = now.strftime("%Y-%m-%dT23:59:59")
         resp = (
-            supabase_admin.table("completed_activities")
+            await supabase_admin.table("completed_activities")
             .select("start_time, distance_meters, moving_time_seconds, average_heartrate, total_elevation_gain, original_activity_type, stats_override, stats_excluded")
             .eq("user_id", user_id)
             .gte("start_time", act_start)
@@ -4,12 +4,15 @@ from db_client import supabase_admin
 
 logger = logging.getLogger(__name__)
 
+# Streaks are counted over at most this many days (a day can hold several entries)
+STREAK_LOOKBACK_DAYS = 90
+
 
 async def get_today_status(user_id: str, date: str) -> dict:
     """Return morning checkin, workout updates, and pending workouts for a date."""
     # Get all checkin entries for this date
     response = (
-        supabase_admin.table("daily_checkin")
+        await supabase_admin.table("daily_checkin")
         .select("*")
         .eq("user_id", user_id)
         .eq("date", date)
@@ -34,7 +37,7 @@ async def get_today_status(user_id: str, date: str) -> dict:
     pending_workouts = []
     try:
         activities_resp = (
-            supabase_admin.table("completed_activities")
+            await supabase_admin.table("completed_activities")
             .select("id, source_id, activity_type, start_time, distance_meters, moving_time_seconds")
             .eq("user_id", user_id)
             .eq("source_type", "strava")
@@ -76,7 +79,7 @@ async def upsert_morning_checkin(user_id: str, date: str, data: dict) -> dict:
     }
 
     response = (
-        supabase_admin.table("daily_checkin")
+        await supabase_admin.table("daily_checkin")
         .upsert(record, on_conflict="user_id,date,entry_type")
         .execute()
     )
@@ -91,7 +94,7 @@ async def upsert_workout_update(user_id: str, strava_activity_id: str, data: dic
     """Upsert workout RPE for a given strava activity."""
     # Get the activity date from completed_activities
     activity_resp = (
-        supabase_admin.table("completed_activities")
+        await supabase_admin.table("completed_activities")
         .select("start_time")
         .eq("user_id", user_id)
         .eq("source_id", strava_activity_id)
@@ -112,7 +115,7 @@ async def upsert_workout_update(user_id: str, strava_activity_id: str, data: dic
     }
 
     response = (
-        supabase_admin.table("daily_checkin")
+        await supabase_admin.table("daily_checkin")
         .upsert(record, on_conflict="user_id,strava_activity_id")
         .execute()
     )
@@ -126,46 +129,52 @@ async def upsert_workout_update(user_id: str, strava_activity_id: str, data: dic
 async def get_streak(user_id: str, date: str) -> int:
     """Count consecutive days with any checkin entry, ending at given date."""
     try:
-        # Get distinct dates with entries, ordered descending
+        window_start = datetime.strptime(date, "%Y-%m-%d").date() - timedelta(days=STREAK_LOOKBACK_DAYS)
+        # Entry dates in the lookback window, ordered descending
         response = (
-            supabase_admin.table("daily_checkin")
+            await supabase_admin.table("daily_checkin")
             .select("date")
             .eq("user_id", user_id)
+            .gte("date", window_start.isoformat())
             .lte("date", date)
             .order("date", desc=True)
-            .limit(90)
             .execute()
         )
 
-        if not response.data:
-            return 0
+        return compute_streak([row["date"] for row in (response.data or [])], date)
+
+    except Exception as e:
+        logger.warning(f"Failed to calculate streak: {e}")
+        return 0
+
 
-        # Get unique dates
-        dates = sorted(set(row["date"] for row in response.data), reverse=True)
+def compute_streak(entry_dates: list[str], date: str) -> int:
+    """Count consecutive days ending at date from already-fetched entry dates."""
+    if not entry_dates:
+        return 0
 
-        streak = 0
-        current = datetime.strptime(date, "%Y-%m-%d").date()
+    # Get unique dates
+    dates = sorted(set(entry_dates), reverse=True)
 
-        for d_str in dates:
-            d = datetime.strptime(d_str, "%Y-%m-%d").date()
-            if d == current:
-                streak += 1
-                current -= timedelta(days=1)
-            elif d < current:
-                break
+    streak = 0
+    current = datetime.strptime(date, "%Y-%m-%d").date()
 
-        return streak
+    for d_str in dates:
+        d = datetime.strptime(d_str, "%Y-%m-%d").date()
+        if d == current:
+            streak += 1
+            current -= timedelta(days=1)
+        elif d < current:
+            break
 
-    except Exception as e:
-        logger.warning(f"Failed to calculate streak: {e}")
-        return 0
+    return streak
 
 
 async def get_checkins_range(user_id: str, start_date: str, end_date: str) -> list:
     """Get all checkin entries for a date range (for AI context)."""
     try:
         response = (
-            supabase_admin.table("daily_checkin")
+            await supabase_admin.table("daily_checkin")
             .select("*")
             .eq("user_id", user_id)
             .gte("date", start_date)
@@ -1,85 +1,131 @@
+import asyncio
 import logging
 import json
+import time
 from datetime import datetime, timedelta, date
 from db_client import supabase_admin
+from projections import ACTIVITY_SUMMARY
 from services.activity_filter_service import is_activity_included
+from services.daily_checkin_service import compute_streak, STREAK_LOOKBACK_DAYS
+from services.user_settings_service import load_user_settings
+from services.training_rollup_service import get_weekly_rollups, is_rollup_included
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_HISTORY_WEEKS = 12
+RECENT_ACTIVITY_LIMIT = 8
 
-async def get_dashboard(user_id: str) -> dict:
-    """Single aggregated dashboard response — one API call, no waterfall."""
-    today = date.today()
-    twelve_weeks_ago = today - timedelta(weeks=12)
-
-    # --- Parallel-safe queries (all independent) ---
-
-    # 1. Completed activities — last 12 weeks
-    activities_resp = (
-        supabase_admin.table("completed_activities")
-        .select("*")
-        .eq("user_id", user_id)
-        .gte("start_time", twelve_weeks_ago.isoformat())
-        .order("start_time", desc=True)
-        .execute()
-    )
-    all_activities = activities_resp.data or []
 
-    # 2. Today's morning checkin
-    today_checkin_resp = (
-        supabase_admin.table("daily_checkin")
-        .select("readiness, soreness, energy, mood")
-        .eq("user_id", user_id)
-        .eq("date", today.isoformat())
-        .eq("entry_type", "morning_checkin")
-        .limit(1)
-        .execute()
-    )
+async def get_dashboard(user_id: str, weeks: int = DEFAULT_HISTORY_WEEKS) -> dict:
+    """Single aggregated dashboard response — one API call, no waterfall.
 
-    # 3. Checkin streak
-    from services.daily_checkin_service import get_streak
-    streak = await get_streak(user_id, today.isoformat())
-
-    # 4. Body weight entries — last 12 weeks
-    weight_resp = (
-        supabase_admin.table("daily_checkin")
-        .select("date, body_weight")
-        .eq("user_id", user_id)
-        .eq("entry_type", "morning_checkin")
-        .gte("date", twelve_weeks_ago.isoformat())
-        .not_.is_("body_weight", "null")
-        .order("date", desc=True)
-        .execute()
+    Weekly metrics come from weekly_training_rollups, so `weeks` can span
+    years of history at the cost of a few small rows per week.
+    """
+    today = date.today()
+    history_start = today - timedelta(weeks=weeks)
+    four_weeks_ago = today - timedelta(weeks=4)
+    streak_window_start = today - timedelta(days=STREAK_LOOKBACK_DAYS)
+    today_start = datetime.combine(today, datetime.min.time()).isoformat()
+    timings = {}
+
+    # --- Wave 1: independent queries, dispatched concurrently ---
+    (
+        activities_resp,
+        recent_resp,
+        rollups,
+        checkin_resp,
+        upcoming_resp,
+        settings_row,
+        planned_resp,
+    ) = await asyncio.gather(
+        # 1. Completed activities — last 4 weeks (compliance, paced deltas, week summary)
+        _timed(timings, "activities", (
+            supabase_admin.table("completed_activities")
+            .select(ACTIVITY_SUMMARY)
+            .eq("user_id", user_id)
+            .gte("start_time", four_weeks_ago.isoformat())
+            .order("start_time", desc=True)
+            .execute()
+        )),
+        # 2. Most recent activities for display, however old
+        _timed(timings, "recent_activities", (
+            supabase_admin.table("completed_activities")
+            .select(ACTIVITY_SUMMARY)
+            .eq("user_id", user_id)
+            .order("start_time", desc=True)
+            .limit(RECENT_ACTIVITY_LIMIT)
+            .execute()
+        )),
+        # 3. Weekly rollups for the history window
+        _timed(timings, "weekly_rollups", get_weekly_rollups(user_id, history_start, today)),
+        # 4. Daily check-ins — feeds today's checkin, streak and body weight
+        _timed(timings, "checkins", (
+            supabase_admin.table("daily_checkin")
+            .select("date, entry_type, readiness, soreness, energy, mood, body_weight")
+            .eq("user_id", user_id)
+            .gte("date", min(streak_window_start, history_start).isoformat())
+            .lte("date", today.isoformat())
+            .order("date", desc=True)
+            .execute()
+        )),
+        # 5. Upcoming planned workouts (include today's workouts)
+        _timed(timings, "upcoming_workouts", (
+            supabase_admin.table("planned_workouts")
+            .select("id, title, activity_type, start_time, description, status")
+            .eq("user_id", user_id)
+            .gte("start_time", today_start)
+            .order("start_time", desc=False)
+            .limit(7)
+            .execute()
+        )),
+        # 6. User settings
+        _timed(timings, "settings", load_user_settings(user_id)),
+        # 7. Planned workouts for compliance — last 4 weeks
+        _timed(timings, "compliance_plan", (
+            supabase_admin.table("planned_workouts")
+            .select("start_time, activity_type, status")
+            .eq("user_id", user_id)
+            .gte("start_time", four_weeks_ago.isoformat())
+            .lte("start_time", today.isoformat() + "T23:59:59")
+            .order("start_time", desc=False)
+            .execute()
+        )),
     )
+    all_activities = activities_resp.data or []
+    latest_activities = recent_resp.data or []
 
-    # 5. Workout RPE entries — for recent activities
-    recent_source_ids = [a["source_id"] for a in all_activities[:20] if a.get("source_id")]
+    # --- Wave 2: workout RPE entries — for recent activities ---
+    recent_source_ids = [a["source_id"] for a in latest_activities if a.get("source_id")]
     rpe_map = {}
     if recent_source_ids:
-        rpe_resp = (
+        rpe_resp = await _timed(timings, "rpe", (
             supabase_admin.table("daily_checkin")
             .select("strava_activity_id, session_rpe")
             .eq("user_id", user_id)
             .eq("entry_type", "workout_update")
             .in_("strava_activity_id", recent_source_ids)
             .execute()
-        )
+        ))
         rpe_map = {
             r["strava_activity_id"]: r["session_rpe"]
             for r in (rpe_resp.data or [])
         }
 
-    # 6. Upcoming planned workouts (include today's workouts)
-    today_start = datetime.combine(today, datetime.min.time()).isoformat()
-    upcoming_resp = (
-        supabase_admin.table("planned_workouts")
-        .select("id, title, activity_type, start_time, description, status")
-        .eq("user_id", user_id)
-        .gte("start_time", today_start)
-        .order("start_time", desc=False)
-        .limit(7)
-        .execute()
+    # --- Check-in derived sections ---
+    checkins = checkin_resp.data or []
+    streak = compute_streak(
+        [c["date"] for c in checkins if c["date"] >= streak_window_start.isoformat()],
+        today.isoformat(),
     )
+    weight_entries = [
+        {"date": c["date"], "body_weight": c["body_weight"]}
+        for c in checkins
+        if c.get("entry_type") == "morning_checkin"
+        and c.get("body_weight") is not None
+        and c["date"] >= history_start.isoformat()
+    ]
+
     # Tag today's workouts
     upcoming_workouts = []
     for w in (upcoming_resp.data or []):
@@ -87,28 +133,20 @@ async def get_dashboard(user_id: str) -> dict:
         w["is_today"] = w_date == today.isoformat()
         upcoming_workouts.append(w)
 
-    # 7. User settings
-    settings_resp = (
-        supabase_admin.table("user_settings")
-        .select("*")
-        .eq("user_id", user_id)
-        .limit(1)
-        .execute()
-    )
-
     # --- Activity filtering ---
-    settings_data_raw = (settings_resp.data or [{}])[0] if settings_resp.data else {}
+    settings_data_raw = settings_row or {}
     tracked_types = settings_data_raw.get("tracked_activity_types") or []
 
-    # Split: stats_activities for metrics, all_activities for display
+    # Split: stats_activities for metrics, latest_activities for display
     stats_activities = [a for a in all_activities if is_activity_included(a, tracked_types)]
+    stats_rollups = [r for r in rollups if is_rollup_included(r, tracked_types)]
 
     # --- Aggregate weekly metrics (stats-included only) ---
-    weekly_metrics = _aggregate_weekly(stats_activities, weight_resp.data or [], twelve_weeks_ago, today)
+    weekly_metrics = _aggregate_weekly(stats_rollups, weight_entries, history_start, today)
 
     # --- Recent activities (up to 8, all activities with stats_included flag) ---
     recent_activities = []
-    for a in all_activities[:8]:
+    for a in latest_activities:
         name = _extract_activity_name(a)
         recent_activities.append({
             "id": a["id"],
@@ -126,8 +164,10 @@ async def get_dashboard(user_id: str) -> dict:
 
     # --- Today's checkin ---
     today_checkin = None
-    if today_checkin_resp.data:
-        today_checkin = today_checkin_resp.data[0]
+    for c in checkins:
+        if c["date"] == today.isoformat() and c.get("entry_type") == "morning_checkin":
+            today_checkin = {k: c.get(k) for k in ("readiness", "soreness", "energy", "mood")}
+            break
 
     # --- Week summary (current week Mon-Sun, stats-included only) ---
     week_start = today - timedelta(days=today.weekday())
@@ -150,8 +190,10 @@ async def get_dashboard(user_id: str) -> dict:
     # --- Paced deltas (week-to-date vs same point last week, stats-included only) ---
     paced_deltas = _compute_paced_deltas(stats_activities, today)
 
-    # --- Compliance score ---
-    compliance = await _compute_compliance(user_id, today)
+    # --- Compliance score (reuses the rows fetched above) ---
+    compliance = _compute_compliance(planned_resp.data or [], all_activities, tracked_types, today)
+
+    logger.info(f"Dashboard timings for user {user_id}: {timings}")
 
     return {
         "weekly_metrics": weekly_metrics,
@@ -172,11 +214,21 @@ async def get_dashboard(user_id: str) -> dict:
         "settings": {
             "distance_unit": settings_data.get("distance_unit", "mi"),
         },
+        "timings_ms": timings,
     }
 
 
-def _aggregate_weekly(activities: list, weight_entries: list, start: date, end: date) -> list:
-    """Aggregate activities into weekly buckets."""
+async def _timed(timings: dict, section: str, query):
+    """Await a query and record its latency (ms) under the section name."""
+    start = time.perf_counter()
+    try:
+        return await query
+    finally:
+        timings[section] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def _aggregate_weekly(rollups: list, weight_entries: list, start: date, end: date) -> list:
+    """Combine per-type weekly rollup rows into weekly buckets."""
     # Build weight lookup: latest weight per ISO week
     weight_by_week = {}
     for w in weight_entries:
@@ -185,7 +237,7 @@ def _aggregate_weekly(activities: list, weight_entries: list, start: date, end:
         if week_key not in weight_by_week:
             weight_by_week[week_key] = w["body_weight"]
 
-    # Bucket activities by week
+    # Empty bucket for every week in range
     weeks = {}
     current = _week_start(start)
     while current <= end:
@@ -201,24 +253,17 @@ def _aggregate_weekly(activities: list, weight_entries: list, start: date, end:
         }
         current += timedelta(weeks=1)
 
-    for a in activities:
-        if not a.get("start_time"):
+    for r in rollups:
+        w = weeks.get(r["week_start"])
+        if w is None:
             continue
-        d = datetime.fromisoformat(a["start_time"].replace("Z", "+00:00")).date()
-        wk = _week_start(d).isoformat()
-        if wk not in weeks:
-            continue
-        w = weeks[wk]
-        dist = a.get("distance_meters") or 0
-        w["volume_m"] += dist
-        w["vert_m"] += a.get("total_elevation_gain") or 0
-        w["duration_s"] += a.get("moving_time_seconds") or 0
-        hr = a.get("average_heartrate")
-        if hr:
-            w["hr_sum"] += hr * (a.get("moving_time_seconds") or 1)
-            w["hr_count"] += a.get("moving_time_seconds") or 1
-        if dist > w["long_run_m"]:
-            w["long_run_m"] = dist
+        w["volume_m"] += r.get("volume_m") or 0
+        w["vert_m"] += r.get("vert_m") or 0
+        w["duration_s"] += r.get("duration_s") or 0
+        w["hr_sum"] += r.get("hr_weighted_sum") or 0
+        w["hr_count"] += r.get("hr_weight_s") or 0
+        if (r.get("long_run_m") or 0) > w["long_run_m"]:
+            w["long_run_m"] = r["long_run_m"]
 
     # Finalize
     result = []
@@ -283,47 +328,22 @@ def _compute_paced_deltas(all_activities: list, today: date) -> dict:
     return result
 
 
-async def _compute_compliance(user_id: str, today: date) -> dict | None:
-    """Compute plan compliance over the past 4 weeks."""
-    four_weeks_ago = today - timedelta(weeks=4)
-
-    planned_resp = (
-        supabase_admin.table("planned_workouts")
-        .select("start_time, activity_type, status")
-        .eq("user_id", user_id)
-        .gte("start_time", four_weeks_ago.isoformat())
-        .lte("start_time", today.isoformat() + "T23:59:59")
-        .order("start_time", desc=False)
-        .execute()
-    )
-    planned = planned_resp.data or []
+def _compute_compliance(planned: list, activities: list, tracked_types: list, today: date) -> dict | None:
+    """Compute plan compliance over the past 4 weeks from already-fetched rows."""
     if not planned:
         return None
 
-    # Get completed activities for the same period (filtered by tracked types)
-    completed_resp = (
-        supabase_admin.table("completed_activities")
-        .select("start_time, original_activity_type, stats_override, stats_excluded")
-        .eq("user_id", user_id)
-        .gte("start_time", four_weeks_ago.isoformat())
-        .lte("start_time", today.isoformat() + "T23:59:59")
-        .execute()
-    )
-
-    # Get tracked types for filtering
-    settings_resp = (
-        supabase_admin.table("user_settings")
-        .select("tracked_activity_types")
-        .eq("user_id", user_id)
-        .limit(1)
-        .execute()
-    )
-    tracked_types = (settings_resp.data or [{}])[0].get("tracked_activity_types") or []
+    four_weeks_ago = today - timedelta(weeks=4)
+    window_start = four_weeks_ago.isoformat()
+    window_end = today.isoformat() + "T23:59:59"
 
     completed_dates = set()
-    for a in (completed_resp.data or []):
-        if a.get("start_time") and is_activity_included(a, tracked_types):
-            completed_dates.add(a["start_time"][:10])
+    for a in activities:
+        start_time = a.get("start_time")
+        if not start_time or not (window_start <= start_time <= window_end):
+            continue
+        if is_activity_included(a, tracked_types):
+            completed_dates.add(start_time[:10])
 
     # Evaluate compliance per planned day
     compliant_days = 0
@@ -374,7 +394,9 @@ async def _compute_compliance(user_id: str, today: date) -> dict | None:
 
 
 def _extract_activity_name(activity: dict) -> str:
-    """Extract activity name from activity_data_blob JSON or fallback."""
+    """Activity name from the denormalized column, then activity_data_blob JSON, then type."""
+    if activity.get("name"):
+        return activity["name"]
     blob = activity.get("activity_data_blob")
     if blob:
         try:
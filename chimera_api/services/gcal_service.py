@@ -1,9 +1,8 @@
 import os
 import json
+import asyncio
 import base64
 import logging
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
 from db_client import supabase_admin
 from package_loader import get_config
@@ -25,6 +24,10 @@ def _get_calendar_service():
         return None
 
     try:
+        # Imported lazily: googleapiclient.discovery is slow to import
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+
         creds_json = base64.b64decode(b64_creds).decode("utf-8")
         creds_dict = json.loads(creds_json)
         creds = service_account.Credentials.from_service_account_info(
@@ -36,11 +39,12 @@ def _get_calendar_service():
         return None
 
 
-def sync_workout_to_calendar(workout_data: dict, is_new=False):
+async def sync_workout_to_calendar(workout_data: dict, is_new=False):
     """
     Creates or Updates a Google Calendar Event from a Workout.
+    Google API calls are blocking, so they run in a worker thread.
     """
-    service = _get_calendar_service()
+    service = await asyncio.to_thread(_get_calendar_service)
     if not service:
         return
 
@@ -74,14 +78,14 @@ def sync_workout_to_calendar(workout_data: dict, is_new=False):
         if is_new or not workout_data.get("google_event_id"):
             # CREATE
             logger.info(f"Creating GCal Event: {workout_data['title']}")
-            event = (
+            event = await asyncio.to_thread(
                 service.events()
                 .insert(calendarId=calendar_id, body=event_body)
-                .execute()
+                .execute
             )
 
             # Save ID back to DB
-            supabase_admin.table("planned_workouts").update(
+            await supabase_admin.table("planned_workouts").update(
                 {
                     "google_event_id": event["id"],
                     "last_synced_at": datetime.now().isoformat(),
@@ -91,25 +95,29 @@ def sync_workout_to_calendar(workout_data: dict, is_new=False):
         else:
             # UPDATE
             logger.info(f"Updating GCal Event: {workout_data['title']}")
-            service.events().update(
-                calendarId=calendar_id,
-                eventId=workout_data["google_event_id"],
-                body=event_body,
-            ).execute()
+            await asyncio.to_thread(
+                service.events().update(
+                    calendarId=calendar_id,
+                    eventId=workout_data["google_event_id"],
+                    body=event_body,
+                ).execute
+            )
 
     except Exception as e:
         logger.error(f"Calendar Sync Error: {e}")
 
 
-def delete_calendar_event(google_event_id: str):
+async def delete_calendar_event(google_event_id: str):
     """Deletes event from GCal"""
-    service = _get_calendar_service()
+    service = await asyncio.to_thread(_get_calendar_service)
     if not service:
         return
     calendar_id = os.getenv("GOOGLE_CALENDAR_ID")
     try:
-        service.events().delete(
-            calendarId=calendar_id, eventId=google_event_id
-        ).execute()
+        await asyncio.to_thread(
+            service.events().delete(
+                calendarId=calendar_id, eventId=google_event_id
+            ).execute
+        )
     except Exception as e:
         logger.error(f"Delete Error: {e}")
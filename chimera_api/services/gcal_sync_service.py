@@ -1,4 +1,4 @@
-import time
+import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
 from db_client import supabase_admin
@@ -18,7 +18,7 @@ async def resync_all(user_id: str) -> dict:
     cutoff = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
 
     result = (
-        supabase_admin.table("planned_workouts")
+        await supabase_admin.table("planned_workouts")
         .select("*")
         .eq("user_id", user_id)
         .gte("start_time", cutoff)
@@ -35,7 +35,7 @@ async def resync_all(user_id: str) -> dict:
         for workout in batch:
             try:
                 is_new = not workout.get("google_event_id")
-                sync_workout_to_calendar(workout, is_new=is_new)
+                await sync_workout_to_calendar(workout, is_new=is_new)
                 if is_new:
                     counts["created"] += 1
                 else:
@@ -46,7 +46,7 @@ async def resync_all(user_id: str) -> dict:
 
         # Rate-limit between batches
         if i + BATCH_SIZE < len(workouts):
-            time.sleep(BATCH_DELAY)
+            await asyncio.sleep(BATCH_DELAY)
 
     logger.info(f"GCal resync complete for user {user_id}: {counts}")
     return counts
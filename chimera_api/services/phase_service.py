@@ -15,7 +15,7 @@ async def create_phase(data: dict, user_id: str) -> dict:
     if "parent_phase_id" in row and row["parent_phase_id"]:
         row["parent_phase_id"] = str(row["parent_phase_id"])
 
-    response = supabase_admin.table("training_phases").insert(row).execute()
+    response = await supabase_admin.table("training_phases").insert(row).execute()
     return response.data[0]
 
 
@@ -30,13 +30,13 @@ async def get_phases(
     if end_date:
         query = query.lte("start_date", end_date)
     query = query.order("start_date", desc=False)
-    response = query.execute()
+    response = await query.execute()
     return response.data or []
 
 
 async def get_phase(phase_id: str, user_id: str) -> dict:
     response = (
-        supabase_admin.table("training_phases")
+        await supabase_admin.table("training_phases")
         .select("*")
         .eq("id", phase_id)
         .eq("user_id", user_id)
@@ -56,7 +56,7 @@ async def update_phase(phase_id: str, updates: dict, user_id: str) -> dict:
         updates["parent_phase_id"] = str(updates["parent_phase_id"])
 
     response = (
-        supabase_admin.table("training_phases")
+        await supabase_admin.table("training_phases")
         .update(updates)
         .eq("id", phase_id)
         .eq("user_id", user_id)
@@ -68,6 +68,6 @@ async def update_phase(phase_id: str, updates: dict, user_id: str) -> dict:
 
 
 async def delete_phase(phase_id: str, user_id: str):
-    supabase_admin.table("training_phases").delete().eq(
+    await supabase_admin.table("training_phases").delete().eq(
         "id", phase_id
     ).eq("user_id", user_id).execute()
@@ -33,7 +33,7 @@ async def _log_agent_action(
         "affected_ids": [str(i) for i in (affected_ids or [])],
     }
     try:
-        supabase_admin.table("agent_actions").insert(row).execute()
+        await supabase_admin.table("agent_actions").insert(row).execute()
     except Exception as e:
         logger.error(f"⚠️ Failed to log agent action: {e}")
 
@@ -360,7 +360,7 @@ async def apply_template(
             )
             result = await workout_service.create_workout(workout_data, user_id)
             # Link back to template source
-            supabase_admin.table("planned_workouts").update(
+            await supabase_admin.table("planned_workouts").update(
                 {"template_source_id": template_id}
             ).eq("id", result["id"]).execute()
             created_ids.append(result["id"])
@@ -382,7 +382,7 @@ async def apply_template(
             status="planned",
         )
         result = await workout_service.create_workout(workout_data, user_id)
-        supabase_admin.table("planned_workouts").update(
+        await supabase_admin.table("planned_workouts").update(
             {"template_source_id": template_id}
         ).eq("id", result["id"]).execute()
         created_ids.append(result["id"])
@@ -403,7 +403,7 @@ async def apply_template(
 
 async def get_agent_actions(user_id: str, limit: int = 20) -> list:
     response = (
-        supabase_admin.table("agent_actions")
+        await supabase_admin.table("agent_actions")
         .select("*")
         .eq("user_id", user_id)
         .order("created_at", desc=True)
@@ -415,7 +415,7 @@ async def get_agent_actions(user_id: str, limit: int = 20) -> list:
 
 async def revert_agent_action(action_id: str, user_id: str) -> dict:
     response = (
-        supabase_admin.table("agent_actions")
+        await supabase_admin.table("agent_actions")
         .select("*")
         .eq("id", action_id)
         .eq("user_id", user_id)
@@ -440,22 +440,22 @@ async def revert_agent_action(action_id: str, user_id: str) -> dict:
     if action["action_type"] in ("move_workout", "update_workout"):
         if isinstance(snapshot, dict) and "id" in snapshot:
             restore = {k: v for k, v in snapshot.items() if k not in ("id", "user_id", "created_at")}
-            supabase_admin.table(table).update(restore).eq("id", snapshot["id"]).eq("user_id", user_id).execute()
+            await supabase_admin.table(table).update(restore).eq("id", snapshot["id"]).eq("user_id", user_id).execute()
 
     elif action["action_type"] in ("delete_workout", "clear_week", "delete_phase"):
         # Re-insert deleted records
         if isinstance(snapshot, list):
             for record in snapshot:
                 record.pop("id", None)  # Let DB generate new ID
-                supabase_admin.table(table).insert(record).execute()
+                await supabase_admin.table(table).insert(record).execute()
         elif isinstance(snapshot, dict):
             snapshot.pop("id", None)
-            supabase_admin.table(table).insert(snapshot).execute()
+            await supabase_admin.table(table).insert(snapshot).execute()
 
     elif action["action_type"] in ("duplicate_workout", "duplicate_week", "create_phase", "apply_template"):
         # Delete the created records
         for aid in affected_ids:
-            supabase_admin.table(table).delete().eq("id", aid).eq("user_id", user_id).execute()
+            await supabase_admin.table(table).delete().eq("id", aid).eq("user_id", user_id).execute()
 
     elif action["action_type"] in ("move_week",):
         # Restore all workouts to their original state
@@ -464,15 +464,15 @@ async def revert_agent_action(action_id: str, user_id: str) -> dict:
                 wid = record.get("id")
                 if wid:
                     restore = {k: v for k, v in record.items() if k not in ("id", "user_id", "created_at")}
-                    supabase_admin.table(table).update(restore).eq("id", wid).eq("user_id", user_id).execute()
+                    await supabase_admin.table(table).update(restore).eq("id", wid).eq("user_id", user_id).execute()
 
     elif action["action_type"] == "update_phase":
         if isinstance(snapshot, dict) and "id" in snapshot:
             restore = {k: v for k, v in snapshot.items() if k not in ("id", "user_id", "created_at")}
-            supabase_admin.table(table).update(restore).eq("id", snapshot["id"]).eq("user_id", user_id).execute()
+            await supabase_admin.table(table).update(restore).eq("id", snapshot["id"]).eq("user_id", user_id).execute()
 
     # Mark as reverted
-    supabase_admin.table("agent_actions").update(
+    await supabase_admin.table("agent_actions").update(
         {"reverted": True, "reverted_at": datetime.now().isoformat()}
     ).eq("id", action_id).execute()
 
@@ -491,14 +491,14 @@ async def get_calendar_data(
     start_str = f"{start.isoformat()}T00:00:00"
     end_str = f"{end.isoformat()}T23:59:59"
 
-    # Fetch all three in sequence (Supabase client is sync)
+    # Fetch workouts and phases
     workouts = await workout_service.get_workouts(user_id, start_str, end_str)
     phases = await phase_service.get_phases(user_id, start.isoformat(), end.isoformat())
 
     # Fetch completed activities in range
     try:
         activities_resp = (
-            supabase_admin.table("completed_activities")
+            await supabase_admin.table("completed_activities")
             .select("id, start_time, original_activity_type, distance_meters, moving_time_seconds, planned_workout_id, source_type, total_elevation_gain")
             .eq("user_id", user_id)
             .gte("start_time", start_str)
@@ -203,7 +203,7 @@ async def _check_duplicate(user_id: str, entry_date: date, title: str) -> bool:
     end_of_day = f"{date_str}T23:59:59"
 
     resp = (
-        supabase_admin.table("planned_workouts")
+        await supabase_admin.table("planned_workouts")
         .select("id")
         .eq("user_id", user_id)
         .gte("start_time", start_of_day)
@@ -334,11 +334,11 @@ async def import_plan(user_id: str, raw_input: Any) -> dict:
 
         row = await _create_workout_row(user_id, entry, default_hour=default_hour, default_minute=default_minute)
         try:
-            resp = supabase_admin.table("planned_workouts").insert(row).execute()
+            resp = await supabase_admin.table("planned_workouts").insert(row).execute()
             if resp.data:
                 created.append(resp.data[0])
                 try:
-                    gcal_service.sync_workout_to_calendar(resp.data[0], is_new=True)
+                    await gcal_service.sync_workout_to_calendar(resp.data[0], is_new=True)
                 except Exception as e:
                     logger.warning(f"GCal sync failed for '{title}': {e}")
         except Exception as e:
@@ -403,7 +403,7 @@ async def import_system_format(user_id: str, data: dict) -> dict:
 
             # Check if workout exists
             existing = (
-                supabase_admin.table("planned_workouts")
+                await supabase_admin.table("planned_workouts")
                 .select("id")
                 .eq("id", clean_id)
                 .eq("user_id", user_id)
@@ -416,7 +416,7 @@ async def import_system_format(user_id: str, data: dict) -> dict:
                 # Update existing
                 try:
                     resp = (
-                        supabase_admin.table("planned_workouts")
+                        await supabase_admin.table("planned_workouts")
                         .update(row)
                         .eq("id", clean_id)
                         .eq("user_id", user_id)
@@ -425,7 +425,7 @@ async def import_system_format(user_id: str, data: dict) -> dict:
                     if resp.data:
                         updated.append(resp.data[0])
                         try:
-                            gcal_service.sync_workout_to_calendar(resp.data[0], is_new=False)
+                            await gcal_service.sync_workout_to_calendar(resp.data[0], is_new=False)
                         except Exception as e:
                             logger.warning(f"GCal sync failed for updated workout {clean_id}: {e}")
                 except Exception as e:
@@ -434,11 +434,11 @@ async def import_system_format(user_id: str, data: dict) -> dict:
             else:
                 # Create new
                 try:
-                    resp = supabase_admin.table("planned_workouts").insert(row).execute()
+                    resp = await supabase_admin.table("planned_workouts").insert(row).execute()
                     if resp.data:
                         created.append(resp.data[0])
                         try:
-                            gcal_service.sync_workout_to_calendar(resp.data[0], is_new=True)
+                            await gcal_service.sync_workout_to_calendar(resp.data[0], is_new=True)
                         except Exception as e:
                             logger.warning(f"GCal sync failed for new workout: {e}")
                 except Exception as e:
@@ -454,11 +454,11 @@ async def import_system_format(user_id: str, data: dict) -> dict:
 
             row = await _create_workout_row(user_id, entry, source="reimport", default_hour=default_hour, default_minute=default_minute)
             try:
-                resp = supabase_admin.table("planned_workouts").insert(row).execute()
+                resp = await supabase_admin.table("planned_workouts").insert(row).execute()
                 if resp.data:
                     created.append(resp.data[0])
                     try:
-                        gcal_service.sync_workout_to_calendar(resp.data[0], is_new=True)
+                        await gcal_service.sync_workout_to_calendar(resp.data[0], is_new=True)
                     except Exception as e:
                         logger.warning(f"GCal sync failed for new workout: {e}")
             except Exception as e:
@@ -481,7 +481,7 @@ async def export_plan(user_id: str, start_date: date, end_date: date) -> dict:
 
     # Fetch workouts
     workouts_resp = (
-        supabase_admin.table("planned_workouts")
+        await supabase_admin.table("planned_workouts")
         .select("*")
         .eq("user_id", user_id)
         .gte("start_time", start_str)
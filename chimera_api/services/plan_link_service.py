@@ -0,0 +1,265 @@
+"""
+Links completed activities to planned workouts.
+
+Every (activity, plan) pair on the same local date is scored on activity type,
+time of day, duration and distance (the plan's distance is read from its title
+or description, e.g. "10K tempo", "5 mi easy"). Assignment is one-to-one and
+resolved for a whole date range in one pass. Both lists are prepared once,
+sorted by local date and swept together. Within a day, the best-scoring pairs
+are taken first, so two runs on one day land on the right two plans.
+
+link_activities() links new, unlinked activities against open plans (webhooks,
+backfill). relink_history() recomputes every link of an athlete from scratch.
+"""
+import re
+import math
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from db_client import supabase_admin
+from services.user_settings_service import get_user_settings, get_user_timezone
+from services.strava_service import _map_activity_type
+
+logger = logging.getLogger(__name__)
+
+TYPE_WEIGHT = 3.0
+TIME_OF_DAY_WEIGHT = 1.0
+DURATION_WEIGHT = 1.5
+DISTANCE_WEIGHT = 1.5
+TIME_OF_DAY_SCALE_MINUTES = 360  # plans this far from the activity's start score 0
+PAGE_SIZE = 1000
+# Ids per in_() filter (kept well under URL length limits) and links per RPC call
+ID_CHUNK = 200
+LINK_CHUNK = 500
+
+_DISTANCE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(km|k|mi|miles?)\b", re.IGNORECASE)
+_UNIT_METERS = {"km": 1000.0, "k": 1000.0, "mi": 1609.344, "mile": 1609.344, "miles": 1609.344}
+
+ACTIVITY_FIELDS = (
+    "id, start_date_local, original_activity_type, moving_time_seconds, "
+    "elapsed_time_seconds, distance_meters, planned_workout_id"
+)
+PLAN_FIELDS = "id, title, description, activity_type, start_time, end_time, status"
+
+
+@dataclass(slots=True)
+class _Activity:
+    id: str
+    day: str
+    minute: int
+    type: str
+    duration_min: float | None
+    distance_m: float | None
+
+
+@dataclass(slots=True)
+class _Plan:
+    id: str
+    day: str
+    minute: int
+    type: str | None
+    duration_min: float | None
+    distance_m: float | None
+
+
+def _parse_utc(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def planned_distance_m(plan: dict) -> float | None:
+    """Distance stated in a plan's title or description ("10K", "5 mi"), in meters."""
+    for text in (plan.get("title"), plan.get("description")):
+        match = _DISTANCE_RE.search(text or "")
+        if match:
+            return float(match.group(1)) * _UNIT_METERS[match.group(2).lower()]
+    return None
+
+
+def _prepare_activity(activity: dict) -> _Activity | None:
+    local = activity.get("start_date_local")
+    if not local:
+        return None
+    # start_date_local is wall-clock time (Strava suffixes it with Z regardless)
+    local_dt = datetime.fromisoformat(str(local)[:19])
+    seconds = activity.get("moving_time_seconds") or activity.get("elapsed_time_seconds")
+    return _Activity(
+        id=activity["id"],
+        day=local_dt.strftime("%Y-%m-%d"),
+        minute=local_dt.hour * 60 + local_dt.minute,
+        type=_map_activity_type(activity.get("original_activity_type") or ""),
+        duration_min=seconds / 60 if seconds else None,
+        distance_m=activity.get("distance_meters") or None,
+    )
+
+
+def _prepare_plan(plan: dict, user_tz) -> _Plan:
+    start = _parse_utc(plan["start_time"])
+    local = start.astimezone(user_tz)
+    duration = None
+    if plan.get("end_time"):
+        duration = (_parse_utc(plan["end_time"]) - start).total_seconds() / 60 or None
+    return _Plan(
+        id=plan["id"],
+        day=local.strftime("%Y-%m-%d"),
+        minute=local.hour * 60 + local.minute,
+        type=plan.get("activity_type"),
+        duration_min=duration,
+        distance_m=planned_distance_m(plan),
+    )
+
+
+def _closeness(actual: float | None, target: float | None) -> float:
+    """1.0 when equal, falling to 0 at a factor of e apart; 0 when either is unknown."""
+    if not actual or not target:
+        return 0.0
+    return max(0.0, 1.0 - abs(math.log(actual / target)))
+
+
+def score(activity: _Activity, plan: _Plan) -> float:
+    """Match quality of a same-day pair; any same-day pair scores above zero."""
+    total = 1.0
+    if plan.type == activity.type:
+        total += TYPE_WEIGHT
+    gap = abs(plan.minute - activity.minute)
+    total += TIME_OF_DAY_WEIGHT * max(0.0, 1.0 - gap / TIME_OF_DAY_SCALE_MINUTES)
+    total += DURATION_WEIGHT * _closeness(activity.duration_min, plan.duration_min)
+    total += DISTANCE_WEIGHT * _closeness(activity.distance_m, plan.distance_m)
+    return total
+
+
+def assign(activities: list[dict], plans: list[dict], user_tz) -> dict[str, str]:
+    """
+    One-to-one activity -> plan assignment over any date range: {activity_id: plan_id}.
+    Activities and plans are only paired on the same local date.
+    """
+    prepared_activities = sorted(
+        (a for a in map(_prepare_activity, activities) if a), key=lambda a: (a.day, a.minute)
+    )
+    prepared_plans = sorted((_prepare_plan(p, user_tz) for p in plans), key=lambda p: (p.day, p.minute))
+
+    result = {}
+    i = j = 0
+    while i < len(prepared_activities) and j < len(prepared_plans):
+        day = prepared_activities[i].day
+        if prepared_plans[j].day < day:
+            j += 1
+            continue
+        if prepared_plans[j].day > day:
+            i += 1
+            continue
+        # Gather this day on both sides
+        day_end_i = i
+        while day_end_i < len(prepared_activities) and prepared_activities[day_end_i].day == day:
+            day_end_i += 1
+        day_end_j = j
+        while day_end_j < len(prepared_plans) and prepared_plans[day_end_j].day == day:
+            day_end_j += 1
+
+        pairs = sorted(
+            (-score(a, p), ai, pj)
+            for ai, a in enumerate(prepared_activities[i:day_end_i])
+            for pj, p in enumerate(prepared_plans[j:day_end_j])
+        )
+        used_a, used_p = set(), set()
+        for _, ai, pj in pairs:
+            if ai in used_a or pj in used_p:
+                continue
+            used_a.add(ai)
+            used_p.add(pj)
+            result[prepared_activities[i + ai].id] = prepared_plans[j + pj].id
+        i, j = day_end_i, day_end_j
+    return result
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _set_plan_status(plan_ids, status: str):
+    for chunk in _chunks(sorted(plan_ids), ID_CHUNK):
+        await supabase_admin.table("planned_workouts").update({"status": status}).in_("id", chunk).execute()
+
+
+async def _write_links(links: dict[str, str | None]):
+    """Set planned_workout_id (None unlinks) in batches; linked plans are marked completed."""
+    pairs = [{"id": a_id, "planned_workout_id": p_id} for a_id, p_id in links.items()]
+    for chunk in _chunks(pairs, LINK_CHUNK):
+        # One UPDATE per chunk (migration 015): PostgREST can't PATCH per-row values
+        await supabase_admin.rpc("set_activity_plan_links", {"links": chunk}).execute()
+    await _set_plan_status({p_id for p_id in links.values() if p_id}, "completed")
+
+
+async def link_activities(user_id: str, activities: list[dict]) -> int:
+    """
+    Link unlinked activities (ACTIVITY_FIELDS; start_date_local is required) to
+    open planned workouts with a single candidate query. Returns links made.
+    """
+    days = sorted(str(a["start_date_local"])[:10] for a in activities if a.get("start_date_local"))
+    if not days:
+        return 0
+
+    first = datetime.fromisoformat(days[0])
+    last = datetime.fromisoformat(days[-1])
+    response = (
+        await supabase_admin.table("planned_workouts")
+        .select(PLAN_FIELDS)
+        .eq("user_id", user_id)
+        .eq("status", "planned")
+        .gte("start_time", (first - timedelta(days=1)).isoformat())
+        .lte("start_time", (last + timedelta(days=2)).isoformat())
+        .execute()
+    )
+    if not response.data:
+        return 0
+
+    user_tz = get_user_timezone(await get_user_settings(user_id))
+    links = assign(activities, response.data, user_tz)
+    await _write_links(links)
+    if links:
+        logger.info(f"Linked {len(links)} activities to planned workouts for user {user_id}")
+    return len(links)
+
+
+async def _read_all(table: str, fields: str, user_id: str, **filters) -> list[dict]:
+    rows, offset = [], 0
+    while True:
+        query = supabase_admin.table(table).select(fields).eq("user_id", user_id)
+        for column, values in filters.items():
+            query = query.in_(column, values)
+        response = await query.order("id").range(offset, offset + PAGE_SIZE - 1).execute()
+        rows.extend(response.data or [])
+        if len(response.data or []) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+
+async def relink_history(user_id: str) -> dict:
+    """
+    Recompute every activity/plan link of a user from scratch: one read of each
+    table, one assignment pass, and writes only for links that changed.
+    """
+    activities = await _read_all("completed_activities", ACTIVITY_FIELDS, user_id, source_type=["strava"])
+    plans = await _read_all("planned_workouts", PLAN_FIELDS, user_id, status=["planned", "completed"])
+
+    user_tz = get_user_timezone(await get_user_settings(user_id))
+    links = assign(activities, plans, user_tz)
+
+    current = {a["id"]: a.get("planned_workout_id") for a in activities}
+    changed = {a_id: p_id for a_id, p_id in links.items() if current.get(a_id) != p_id}
+    unlinked = [a_id for a_id, p_id in current.items() if p_id and a_id not in links]
+    released = {p_id for p_id in current.values() if p_id} - set(links.values())
+
+    await _set_plan_status(released, "planned")
+    await _write_links({**changed, **{a_id: None for a_id in unlinked}})
+
+    summary = {
+        "activities": len(activities),
+        "plans": len(plans),
+        "linked": len(links),
+        "changed": len(changed) + len(unlinked),
+    }
+    logger.info(f"Relinked history for user {user_id}: {summary}")
+    return summary
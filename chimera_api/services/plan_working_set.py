@@ -0,0 +1,160 @@
+"""
+Run-scoped working set of an athlete's planned workouts.
+
+An agent turn often touches the same few days several times: the context lists
+the coming week, get_upcoming_workouts lists it again, and every update, move,
+delete or duplicate first looks up "the workout on <date>". Inside a
+working_set_scope() those reads are served from memory. Plan rows are loaded
+per UTC day (the same day boundaries the tools query with), indexed by day and
+id, and each missing span is fetched with one query. Tool mutations write
+through: single-row changes are applied in place, and bulk changes (week
+copies, clears, templates) invalidate the days they touch, so those days
+reload on next use.
+
+Outside a scope (API routes, scripts) current_working_set() returns None and
+callers query directly.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone
+
+from db_client import supabase_admin
+
+logger = logging.getLogger(__name__)
+
+# Window loaded with the agent's context; tools outside it load on demand
+WINDOW_PAST_DAYS = 14
+WINDOW_FUTURE_DAYS = 28
+
+_current_set: ContextVar["PlanWorkingSet | None"] = ContextVar("plan_working_set", default=None)
+
+
+def _instant(value: str) -> datetime:
+    """Timestamp string as an aware UTC datetime (naive bounds count as UTC, as in Postgres)."""
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _day_of(row: dict) -> date:
+    return _instant(row["start_time"]).date()
+
+
+class PlanWorkingSet:
+    """One athlete's planned_workouts, loaded by day and kept current by the tools."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self._by_id: dict[str, dict] = {}
+        self._by_day: dict[date, list[dict]] = {}
+        self._loaded: set[date] = set()
+        self._lock = asyncio.Lock()
+        self.queries = 0
+
+    async def ensure(self, first: date, last: date):
+        """Load every day in [first, last] not already held, with one query."""
+        async with self._lock:
+            missing = [
+                first + timedelta(days=i)
+                for i in range((last - first).days + 1)
+                if first + timedelta(days=i) not in self._loaded
+            ]
+            if not missing:
+                return
+            start, end = missing[0], missing[-1]
+            response = (
+                await supabase_admin.table("planned_workouts")
+                .select("*")
+                .eq("user_id", self.user_id)
+                .gte("start_time", f"{start.isoformat()}T00:00:00")
+                .lte("start_time", f"{end.isoformat()}T23:59:59")
+                .order("start_time", desc=False)
+                .execute()
+            )
+            self.queries += 1
+            # The span is reloaded whole: drop held rows in it first
+            for day in range((end - start).days + 1):
+                for row in self._by_day.pop(start + timedelta(days=day), []):
+                    self._by_id.pop(str(row["id"]), None)
+            for row in response.data or []:
+                self._index(row)
+            self._loaded.update(start + timedelta(days=i) for i in range((end - start).days + 1))
+
+    async def load_window(self, today: date):
+        await self.ensure(today - timedelta(days=WINDOW_PAST_DAYS), today + timedelta(days=WINDOW_FUTURE_DAYS))
+
+    async def between(self, start: str, end: str) -> list[dict]:
+        """Workouts with start_time in [start, end], ordered by start_time."""
+        lower, upper = _instant(start), _instant(end)
+        await self.ensure(lower.date(), upper.date())
+        rows = [
+            row
+            for day in range((upper.date() - lower.date()).days + 1)
+            for row in self._by_day.get(lower.date() + timedelta(days=day), [])
+            if lower <= _instant(row["start_time"]) <= upper
+        ]
+        return [dict(row) for row in rows]
+
+    async def find_on_day(self, day: date, activity_type: str | None = None) -> dict | None:
+        """First workout of the day, preferring the given activity type."""
+        await self.ensure(day, day)
+        workouts = self._by_day.get(day, [])
+        if activity_type:
+            for row in workouts:
+                if row["activity_type"] == activity_type:
+                    return dict(row)
+        return dict(workouts[0]) if workouts else None
+
+    def put(self, row: dict):
+        """Write-through of a created or updated row."""
+        if not row or "id" not in row:
+            return
+        self.remove(row["id"])
+        if _day_of(row) in self._loaded:
+            self._index(row)
+
+    def remove(self, workout_id):
+        row = self._by_id.pop(str(workout_id), None)
+        if row is not None:
+            self._by_day[_day_of(row)].remove(row)
+
+    def invalidate(self, first: date | None = None, last: date | None = None):
+        """Forget [first, last] (everything when no range), so it reloads on next use."""
+        if first is None:
+            self._by_id.clear()
+            self._by_day.clear()
+            self._loaded.clear()
+            return
+        for i in range(((last or first) - first).days + 1):
+            day = first + timedelta(days=i)
+            self._loaded.discard(day)
+            for row in self._by_day.pop(day, []):
+                self._by_id.pop(str(row["id"]), None)
+
+    def _index(self, row: dict):
+        row = dict(row)
+        self._by_id[str(row["id"])] = row
+        day = self._by_day.setdefault(_day_of(row), [])
+        day.append(row)
+        day.sort(key=lambda r: _instant(r["start_time"]))
+
+
+def current_working_set(user_id: str) -> PlanWorkingSet | None:
+    working_set = _current_set.get()
+    return working_set if working_set is not None and working_set.user_id == user_id else None
+
+
+@asynccontextmanager
+async def working_set_scope(user_id: str):
+    """Open a working set for one agent run. Nested scopes share the outer set."""
+    if current_working_set(user_id) is not None:
+        yield current_working_set(user_id)
+        return
+    working_set = PlanWorkingSet(user_id)
+    token = _current_set.set(working_set)
+    try:
+        yield working_set
+    finally:
+        _current_set.reset(token)
+        logger.debug(f"Plan working set for {user_id}: {working_set.queries} queries")
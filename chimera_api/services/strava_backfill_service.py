@@ -0,0 +1,325 @@
+"""
+Resumable Strava backfill.
+
+start_backfill() records a strava_backfill_jobs row and runs it in the
+background. The athlete's activity list is read oldest-first from the job's
+cursor (`after` = epoch of the newest activity stored so far); each page's
+details are fetched with bounded concurrency, written with one multi-row upsert,
+and the cursor is checkpointed. A crash, redeploy or Strava outage loses at most
+one page: the next start_backfill() (or startup, for jobs whose heartbeat went
+stale) resumes from the cursor. If a detail fetch fails transiently (429, 5xx,
+network), the cursor stops just before that activity and the job ends as
+failed, so a resume fetches it again. Activities Strava will never serve
+(deleted, private, other 4xx) are skipped; all but deleted ones count as errors.
+
+Each page also refreshes its rollup weeks and tracks new activity types; when
+the list is exhausted, unlinked activities in the window are bulk-linked to the plan.
+All Strava calls run in the BACKFILL lane so webhooks keep their share of the quota.
+"""
+import os
+import socket
+import asyncio
+import logging
+import contextvars
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+import request_loader
+from db_client import supabase_admin
+from services import strava_service
+from services import activity_payload_service
+from services import plan_link_service
+from services import training_rollup_service
+from services.activity_filter_service import auto_add_new_type
+from services.analytics_service import track as analytics_track
+from strava_client import strava_client, lane, Lane, STRAVA_API_URL
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CONCURRENCY = int(os.getenv("STRAVA_BACKFILL_CONCURRENCY", "4"))
+# A running job whose row has not been touched for this long is presumed orphaned
+BACKFILL_LEASE_SECONDS = float(os.getenv("STRAVA_BACKFILL_LEASE_SECONDS", "300"))
+LIST_PAGE_SIZE = 100
+# Detail fetch statuses worth retrying on resume; other 4xx skip the activity.
+# 401 is the token, not the activity (it may expire mid-page)
+_RETRYABLE_STATUS = {401, 408, 409, 425, 429}
+LINK_PAGE_SIZE = 1000
+
+_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+_running: set[asyncio.Task] = set()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _is_stale(job: dict) -> bool:
+    updated = datetime.fromisoformat(job["updated_at"].replace("Z", "+00:00"))
+    return updated < _now() - timedelta(seconds=BACKFILL_LEASE_SECONDS)
+
+
+def _epoch(iso: str) -> int:
+    return int(datetime.fromisoformat(iso.replace("Z", "+00:00")).timestamp())
+
+
+async def get_latest_job(user_id: str) -> dict | None:
+    response = (
+        await supabase_admin.table("strava_backfill_jobs")
+        .select("*")
+        .eq("user_id", user_id)
+        .order("created_at", desc=True)
+        .limit(1)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def get_job(user_id: str, job_id: str) -> dict | None:
+    response = (
+        await supabase_admin.table("strava_backfill_jobs")
+        .select("*")
+        .eq("id", job_id)
+        .eq("user_id", user_id)
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def start_backfill(user_id: str, days: int = 30) -> dict:
+    """
+    Start (or resume) a backfill of the last `days` days and return its job row.
+    An active job is returned as is; a failed or orphaned job covering at least
+    the same window resumes from its cursor.
+    """
+    job = await get_latest_job(user_id)
+    if job and job["status"] in ("pending", "running") and not _is_stale(job):
+        return job
+
+    resumable = job and job["status"] != "done" and job["days"] >= days
+    if not resumable:
+        after = int((_now() - timedelta(days=days)).timestamp())
+        response = (
+            await supabase_admin.table("strava_backfill_jobs")
+            .insert({"user_id": user_id, "days": days, "cursor_after": after})
+            .execute()
+        )
+        job = response.data[0]
+
+    _spawn(job)
+    return job
+
+
+def _spawn(job: dict):
+    # Fresh context: a task started inside a request would otherwise keep that
+    # request's loader (memoized settings) and query log for the whole run
+    task = contextvars.Context().run(
+        asyncio.create_task, run_backfill(job), name=f"strava-backfill-{job['id']}"
+    )
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+
+async def resume_orphaned_backfills():
+    """Startup hook: pick up running/pending jobs whose worker went away."""
+    try:
+        response = (
+            await supabase_admin.table("strava_backfill_jobs")
+            .select("*")
+            .in_("status", ["pending", "running"])
+            .execute()
+        )
+    except Exception as e:
+        logger.warning(f"Could not look for orphaned backfills: {e}")
+        return
+    for job in response.data or []:
+        if _is_stale(job):
+            logger.info(f"Resuming orphaned Strava backfill {job['id']} from cursor {job['cursor_after']}")
+            _spawn(job)
+
+
+async def _update(job: dict, values: dict) -> dict:
+    values["updated_at"] = _now().isoformat()
+    await supabase_admin.table("strava_backfill_jobs").update(values).eq("id", job["id"]).execute()
+    job.update(values)
+    return job
+
+
+async def _claim(job: dict) -> dict | None:
+    """Take the job unless another worker touched it since we read it."""
+    now = _now().isoformat()
+    response = (
+        await supabase_admin.table("strava_backfill_jobs")
+        .update({"status": "running", "locked_by": _WORKER_ID, "last_error": None, "updated_at": now})
+        .eq("id", job["id"])
+        .eq("updated_at", job["updated_at"])
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def run_backfill(job: dict):
+    with lane(Lane.BACKFILL):
+        claimed = await _claim(job)
+        if not claimed:
+            logger.info(f"Strava backfill {job['id']} already taken by another worker")
+            return
+        try:
+            await _run(claimed)
+        except Exception as e:
+            logger.error(f"Strava backfill {job['id']} failed at cursor {claimed['cursor_after']}: {e}")
+            analytics_track(claimed["user_id"], "strava_sync_failed", {"backfill_job": job["id"], "error": str(e)})
+            try:
+                await _update(claimed, {"status": "failed", "last_error": str(e), "locked_by": None})
+            except Exception as update_error:
+                logger.error(f"Failed to record backfill {job['id']} failure: {update_error}")
+
+
+async def _fetch_details(token: str, summaries: list[dict]) -> tuple[list[dict], list[dict], list[dict]]:
+    """
+    Fetch activity details with at most BACKFILL_CONCURRENCY calls in flight.
+    Returns (details, summaries whose fetch should be retried, summaries skipped
+    as unavailable). Activities deleted since they were listed (404) are in none.
+    """
+    semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+    failed, skipped = [], []
+
+    async def fetch(summary):
+        async with semaphore:
+            try:
+                return await strava_service._fetch_strava_activity(token, summary["id"])
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status == 404:
+                    return None
+                if 400 <= status < 500 and status not in _RETRYABLE_STATUS:
+                    # Retrying would fail the same way and pin the cursor here forever
+                    logger.warning(f"Skipping unavailable Strava activity {summary.get('id')}: {e}")
+                    skipped.append(summary)
+                    return None
+                logger.error(f"Failed to fetch Strava activity {summary.get('id')}: {e}")
+            except Exception as e:
+                logger.error(f"Failed to fetch Strava activity {summary.get('id')}: {e}")
+            failed.append(summary)
+            return None
+
+    details = await asyncio.gather(*(fetch(s) for s in summaries))
+    return [d for d in details if d], failed, skipped
+
+
+async def _sync_page(job: dict) -> bool:
+    """List, fetch and store the page after the job's cursor. Returns False once the list is exhausted."""
+    user_id = job["user_id"]
+    token = await strava_service._get_access_token(user_id)
+    r = await strava_client.get(
+        f"{STRAVA_API_URL}/athlete/activities",
+        headers={"Authorization": f"Bearer {token}"},
+        params={"after": job["cursor_after"], "per_page": LIST_PAGE_SIZE},
+    )
+    r.raise_for_status()
+    page = r.json()
+    if not page:
+        return False
+
+    details, failed, skipped = await _fetch_details(token, page)
+    if failed:
+        # Checkpoint just before the oldest failure: everything after it is re-listed on resume
+        cursor = min(_epoch(s["start_date"]) for s in failed) - 1
+        page = [s for s in page if _epoch(s["start_date"]) <= cursor]
+        details = [d for d in details if _epoch(d["start_date"]) <= cursor]
+        skipped = [s for s in skipped if _epoch(s["start_date"]) <= cursor]
+    else:
+        cursor = max(_epoch(s["start_date"]) for s in page)
+    records = [strava_service._build_activity_record(user_id, d) for d in details]
+    if records:
+        await activity_payload_service.put_many(details)
+        await supabase_admin.table("completed_activities").upsert(
+            records, on_conflict="user_id,source_type,source_id"
+        ).execute()
+        # Per page, so a resumed job never leaves earlier pages out of the rollups
+        await training_rollup_service.refresh_weeks(user_id, [r["start_time"] for r in records])
+        for activity_type in sorted({r["original_activity_type"] for r in records}):
+            await auto_add_new_type(user_id, activity_type)
+
+    await _update(job, {
+        "cursor_after": max(cursor, job["cursor_after"]),
+        "pages": job["pages"] + 1,
+        "listed": job["listed"] + len(page),
+        "synced": job["synced"] + len(records),
+        # Only skips behind the new cursor: a resume never lists those again
+        "errors": job["errors"] + len(failed) + len(skipped),
+    })
+    if failed:
+        raise RuntimeError(f"{len(failed)} activity detail fetches failed; resume retries them")
+    return len(page) == LIST_PAGE_SIZE
+
+
+async def _run(job: dict):
+    user_id = job["user_id"]
+
+    more = True
+    while more:
+        # One short loader scope per page: settings reads are shared within the
+        # page but never outlive it
+        async with request_loader.loader_scope():
+            more = await _sync_page(job)
+
+    window_start = datetime.fromtimestamp(_epoch(job["created_at"]) - job["days"] * 86400, timezone.utc)
+    linked = await _link_unlinked(user_id, window_start)
+
+    await _update(job, {
+        "status": "done",
+        "linked": linked,
+        "locked_by": None,
+        "finished_at": _now().isoformat(),
+    })
+    analytics_track(user_id, "strava_backfill_completed", {
+        "days": job["days"],
+        "synced": job["synced"],
+        "errors": job["errors"],
+        "linked": linked,
+    })
+    logger.info(
+        f"Strava backfill {job['id']} done for user {user_id}: "
+        f"{job['synced']} synced, {job['errors']} errors, {linked} linked"
+    )
+
+
+async def _link_unlinked(user_id: str, window_start: datetime) -> int:
+    """Bulk-link every unlinked Strava activity in the backfill window."""
+    activities = []
+    offset = 0
+    while True:
+        response = (
+            await supabase_admin.table("completed_activities")
+            .select(plan_link_service.ACTIVITY_FIELDS)
+            .eq("user_id", user_id)
+            .eq("source_type", "strava")
+            .is_("planned_workout_id", "null")
+            .gte("start_time", window_start.isoformat())
+            .order("start_time")
+            .range(offset, offset + LINK_PAGE_SIZE - 1)
+            .execute()
+        )
+        activities.extend(response.data or [])
+        if len(response.data or []) < LINK_PAGE_SIZE:
+            break
+        offset += LINK_PAGE_SIZE
+    return await plan_link_service.link_activities(user_id, activities)
+
+
+def progress(job: dict) -> dict:
+    """Public view of a job row for the progress endpoints."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "days": job["days"],
+        "pages": job["pages"],
+        "listed": job["listed"],
+        "synced": job["synced"],
+        "errors": job["errors"],
+        "linked": job["linked"],
+        "synced_through": datetime.fromtimestamp(job["cursor_after"], timezone.utc).isoformat(),
+        "last_error": job.get("last_error"),
+        "finished_at": job.get("finished_at"),
+    }
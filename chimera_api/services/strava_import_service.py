@@ -0,0 +1,190 @@
+"""
+Strava bulk-export importer.
+
+A Strava account export ("Download or delete your account" -> export.zip) has
+activities.csv with one row per activity, plus GPX/TCX/FIT track files. The
+importer streams activities.csv straight out of the archive (zipfile reads
+only the central directory; the CSV is decoded row by row). It writes
+completed_activities in batches, with zero Strava API calls, so years of
+history import without touching the rate budget.
+
+Rows are keyed exactly like API-synced activities (user_id, source_type
+'strava', source_id = Strava activity id). Activity types are normalized to the
+API's names ("Weight Training" -> "WeightTraining"). Existing rows are left
+alone, because an API-synced row is richer than its CSV row. Imported rows
+carry no raw payload (payload_hash is null): a CSV row is not a Strava API
+response, so the first webhook for an imported activity fetches its full
+details instead of patching a synthetic payload. New rows are linked
+to open plans per batch (plan_link_service maps types via stravaTypeMap).
+Track files are not parsed: per-second data comes from the streams endpoint
+on demand.
+"""
+import io
+import csv
+import asyncio
+import logging
+import zipfile
+from collections.abc import Iterator
+from itertools import islice
+from datetime import datetime, timezone
+
+from db_client import supabase_admin
+from services import training_rollup_service
+from services import plan_link_service
+from services.activity_filter_service import auto_add_new_type
+from services.analytics_service import track as analytics_track
+from services.strava_service import _build_activity_record, _safe_int
+from services.user_settings_service import get_user_settings, get_user_timezone
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH = 500
+ACTIVITIES_CSV = "activities.csv"
+DATE_FORMATS = ("%b %d, %Y, %I:%M:%S %p", "%Y-%m-%d %H:%M:%S")
+
+
+class InvalidExport(Exception):
+    """The upload is not a Strava export archive."""
+
+
+def _float(value: str | None) -> float | None:
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _parse_date(value: str) -> datetime | None:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def api_type(csv_type: str) -> str:
+    """Strava's API name for a display type: 'Weight Training' -> 'WeightTraining'."""
+    return "".join(ch for ch in csv_type if ch.isalnum()) or "Workout"
+
+
+class _Row:
+    """Column access for activities.csv, whose export repeats some headers
+    (the first Distance is in the athlete's units, the second in meters)."""
+
+    def __init__(self, header: list[str]):
+        self.positions: dict[str, list[int]] = {}
+        for i, name in enumerate(header):
+            self.positions.setdefault(name.strip(), []).append(i)
+
+    def get(self, row: list[str], name: str) -> str | None:
+        """Last column of that name: repeated ones are the metric detail section."""
+        positions = self.positions.get(name)
+        if not positions:
+            return None
+        i = positions[-1]
+        return row[i] if i < len(row) else None
+
+    def distance_m(self, row: list[str]) -> float | None:
+        distance = _float(self.get(row, "Distance"))
+        if distance is None or len(self.positions.get("Distance", [])) > 1:
+            return distance
+        return distance * 1000  # older exports: a single Distance column, in km
+
+
+def parse_activities(lines, user_tz) -> Iterator[dict | None]:
+    """
+    Yield Strava-shaped summaries (id, name, type, start_date, distance, ...)
+    from activities.csv lines; rows without an id or date are yielded as None.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header or "Activity ID" not in [h.strip() for h in header]:
+        raise InvalidExport(f"{ACTIVITIES_CSV} has no 'Activity ID' column")
+    cols = _Row(header)
+
+    for row in reader:
+        activity_id = (cols.get(row, "Activity ID") or "").strip()
+        started = _parse_date(cols.get(row, "Activity Date") or "")
+        if not activity_id.isdigit() or not started:
+            yield None
+            continue
+        local = started.astimezone(user_tz)
+        yield {
+            "id": int(activity_id),
+            "name": cols.get(row, "Activity Name"),
+            "type": api_type(cols.get(row, "Activity Type") or ""),
+            "start_date": started.isoformat().replace("+00:00", "Z"),
+            # Strava's convention: wall-clock time with a Z suffix
+            "start_date_local": local.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "timezone": str(user_tz),
+            "distance": cols.distance_m(row),
+            "moving_time": _safe_int(cols.get(row, "Moving Time")),
+            "elapsed_time": _safe_int(cols.get(row, "Elapsed Time")),
+            "total_elevation_gain": _float(cols.get(row, "Elevation Gain")),
+            "average_heartrate": _float(cols.get(row, "Average Heart Rate")),
+            "max_heartrate": _float(cols.get(row, "Max Heart Rate")),
+            "average_speed": _float(cols.get(row, "Average Speed")),
+            "max_speed": _float(cols.get(row, "Max Speed")),
+            "average_cadence": _float(cols.get(row, "Average Cadence")),
+            "average_watts": _float(cols.get(row, "Average Watts")),
+            "calories": _float(cols.get(row, "Calories")),
+            "suffer_score": _float(cols.get(row, "Relative Effort")),
+            "source": "bulk_export",
+        }
+
+
+def _open_activities_csv(archive: zipfile.ZipFile):
+    names = [n for n in archive.namelist() if n.rsplit("/", 1)[-1] == ACTIVITIES_CSV]
+    if not names:
+        raise InvalidExport(f"Archive has no {ACTIVITIES_CSV}")
+    return io.TextIOWrapper(archive.open(min(names, key=len)), encoding="utf-8-sig", newline="")
+
+
+async def _write_batch(user_id: str, summaries: list[dict], summary: dict):
+    # No payload: the summary is derived from the CSV, not fetched from Strava
+    records = [{**_build_activity_record(user_id, s), "payload_hash": None} for s in summaries]
+    # ignore_duplicates: rows already synced from the API keep their full details
+    response = await supabase_admin.table("completed_activities").upsert(
+        records, on_conflict="user_id,source_type,source_id", ignore_duplicates=True
+    ).execute()
+    inserted = response.data or []
+    summary["imported"] += len(inserted)
+    summary["existing"] += len(records) - len(inserted)
+    summary["types"].update(r["original_activity_type"] for r in inserted)
+    if inserted:
+        summary["linked"] += await plan_link_service.link_activities(user_id, inserted)
+
+
+async def import_archive(user_id: str, file) -> dict:
+    """Import a Strava export ZIP (path or seekable binary file). Returns counts."""
+    # Unzipping and CSV parsing are CPU and disk work: run them in a thread, a
+    # batch at a time, so the event loop keeps serving other requests
+    try:
+        archive = await asyncio.to_thread(zipfile.ZipFile, file)
+    except zipfile.BadZipFile:
+        raise InvalidExport("Upload is not a ZIP archive")
+
+    user_tz = get_user_timezone(await get_user_settings(user_id))
+    summary = {"rows": 0, "imported": 0, "existing": 0, "skipped": 0, "linked": 0, "types": set()}
+    with archive, _open_activities_csv(archive) as lines:
+        activities = parse_activities(lines, user_tz)
+        while True:
+            parsed = await asyncio.to_thread(lambda: list(islice(activities, IMPORT_BATCH)))
+            if not parsed:
+                break
+            summary["rows"] += len(parsed)
+            batch = [activity for activity in parsed if activity is not None]
+            summary["skipped"] += len(parsed) - len(batch)
+            if batch:
+                await _write_batch(user_id, batch, summary)
+
+    types = sorted(summary.pop("types"))
+    for activity_type in types:
+        await auto_add_new_type(user_id, activity_type)
+    if summary["imported"]:
+        await training_rollup_service.rebuild_user(user_id)
+
+    analytics_track(user_id, "strava_export_imported", {**summary, "types": len(types)})
+    logger.info(f"Imported Strava export for user {user_id}: {summary}")
+    return summary
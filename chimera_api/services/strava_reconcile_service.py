@@ -0,0 +1,237 @@
+"""
+Nightly Strava reconciliation.
+
+Webhooks are the only way activities arrive after the initial sync, so a
+webhook lost to downtime or a timeout would be lost for good. Once a night, the
+reconciler compares every connected athlete's recent activities on Strava with
+completed_activities and repairs the difference through the webhook queue.
+
+Per athlete it reads the last STRAVA_RECONCILE_DAYS of the activity list
+(summary pages only, usually one call), fingerprints each summary, and
+compares it with the same fields of the stored row. Only missing activities
+(enqueued as 'create') and changed ones ('update', which re-fetches) cost a
+detail call. Those go through the webhook workers, queued with source
+'reconcile' so the workers fetch them in the BACKFILL lane. List calls run in
+the BACKFILL lane too, so live traffic keeps its share of the rate budget.
+
+The loop runs in every process (started in main's lifespan). Whoever first
+inserts the day's strava_reconcile_runs row does that night's run. Queued
+events carry the run's timestamp, so a rerun the same night adds nothing.
+"""
+import os
+import json
+import socket
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+
+from db_client import supabase_admin
+from services import strava_service
+from services import webhook_queue_service
+from strava_client import strava_client, lane, Lane, STRAVA_API_URL
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_DAYS = int(os.getenv("STRAVA_RECONCILE_DAYS", "7"))
+# Earliest UTC hour of the nightly run, and how often the loop checks for it
+RECONCILE_HOUR_UTC = int(os.getenv("STRAVA_RECONCILE_HOUR_UTC", "3"))
+RECONCILE_CHECK_SECONDS = float(os.getenv("STRAVA_RECONCILE_CHECK_SECONDS", "900"))
+LIST_PAGE_SIZE = 200
+MAX_PAGES = 5
+ATHLETE_PAGE_SIZE = 1000
+
+STORED_FIELDS = (
+    "source_id, name, original_activity_type, start_time, distance_meters, "
+    "moving_time_seconds, elapsed_time_seconds, total_elevation_gain"
+)
+
+_WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _fingerprint(name, activity_type, start, distance, moving, elapsed, elevation) -> str:
+    """Hash of the summary fields Strava lists and we store, normalized alike."""
+    started = datetime.fromisoformat(str(start).replace("Z", "+00:00"))
+    if not started.tzinfo:
+        started = started.replace(tzinfo=timezone.utc)
+    values = [
+        name or "",
+        activity_type or "",
+        int(started.timestamp()),
+        round(float(distance or 0)),
+        int(moving or 0),
+        int(elapsed or 0),
+        round(float(elevation or 0)),
+    ]
+    return hashlib.sha1(json.dumps(values).encode()).hexdigest()
+
+
+def listed_fingerprint(summary: dict) -> str:
+    return _fingerprint(
+        summary.get("name"), summary.get("type"), summary["start_date"], summary.get("distance"),
+        summary.get("moving_time"), summary.get("elapsed_time"), summary.get("total_elevation_gain"),
+    )
+
+
+def stored_fingerprint(row: dict) -> str:
+    return _fingerprint(
+        row.get("name"), row.get("original_activity_type"), row["start_time"], row.get("distance_meters"),
+        row.get("moving_time_seconds"), row.get("elapsed_time_seconds"), row.get("total_elevation_gain"),
+    )
+
+
+async def _list_recent(user_id: str, since: datetime) -> list[dict]:
+    token = await strava_service._get_access_token(user_id)
+    summaries = []
+    for page in range(1, MAX_PAGES + 1):
+        r = await strava_client.get(
+            f"{STRAVA_API_URL}/athlete/activities",
+            headers={"Authorization": f"Bearer {token}"},
+            params={"after": int(since.timestamp()), "per_page": LIST_PAGE_SIZE, "page": page},
+        )
+        r.raise_for_status()
+        batch = r.json()
+        summaries.extend(batch)
+        if len(batch) < LIST_PAGE_SIZE:
+            break
+    return summaries
+
+
+async def reconcile_athlete(user_id: str, athlete_id, since: datetime, event_time: int) -> dict:
+    """Diff one athlete's recent Strava list with storage and queue the repairs."""
+    listed = await _list_recent(user_id, since)
+    response = (
+        await supabase_admin.table("completed_activities")
+        .select(STORED_FIELDS)
+        .eq("user_id", user_id)
+        .eq("source_type", "strava")
+        .gte("start_time", (since - timedelta(days=1)).isoformat())
+        .execute()
+    )
+    stored = {row["source_id"]: stored_fingerprint(row) for row in response.data or []}
+
+    counts = {"listed": len(listed), "missing": 0, "changed": 0}
+    for summary in listed:
+        known = stored.get(str(summary["id"]))
+        if known is None:
+            aspect = "create"
+        elif known != listed_fingerprint(summary):
+            aspect = "update"
+        else:
+            continue
+        await webhook_queue_service.enqueue({
+            "object_id": summary["id"],
+            "owner_id": int(athlete_id),
+            "object_type": "activity",
+            "aspect_type": aspect,
+            "event_time": event_time,
+            "source": "reconcile",
+        })
+        counts["missing" if aspect == "create" else "changed"] += 1
+    return counts
+
+
+async def _connected_athletes() -> list[dict]:
+    athletes, offset = [], 0
+    while True:
+        response = (
+            await supabase_admin.table("user_settings")
+            .select("user_id, strava_athlete_id")
+            .not_.is_("strava_athlete_id", "null")
+            .order("user_id")
+            .range(offset, offset + ATHLETE_PAGE_SIZE - 1)
+            .execute()
+        )
+        athletes.extend(response.data or [])
+        if len(response.data or []) < ATHLETE_PAGE_SIZE:
+            return athletes
+        offset += ATHLETE_PAGE_SIZE
+
+
+async def _claim_run(run_date: str) -> bool:
+    response = await supabase_admin.table("strava_reconcile_runs").upsert(
+        {"run_date": run_date, "locked_by": _WORKER_ID},
+        on_conflict="run_date",
+        ignore_duplicates=True,
+    ).execute()
+    return bool(response.data)
+
+
+async def run_once(now: datetime | None = None) -> dict | None:
+    """Reconcile every connected athlete, unless today's run was already claimed."""
+    now = now or _now()
+    run_date = now.date().isoformat()
+    if not await _claim_run(run_date):
+        return None
+
+    since = now - timedelta(days=RECONCILE_DAYS)
+    totals = {"athletes": 0, "listed": 0, "missing": 0, "changed": 0, "errors": 0}
+    status, last_error = "done", None
+    try:
+        with lane(Lane.BACKFILL):
+            for athlete in await _connected_athletes():
+                try:
+                    counts = await reconcile_athlete(
+                        athlete["user_id"], athlete["strava_athlete_id"], since, int(now.timestamp())
+                    )
+                except Exception as e:
+                    totals["errors"] += 1
+                    last_error = f"{athlete['user_id']}: {e}"
+                    logger.warning(f"Strava reconciliation failed for user {athlete['user_id']}: {e}")
+                    continue
+                totals["athletes"] += 1
+                for key, value in counts.items():
+                    totals[key] += value
+    except Exception as e:
+        # Tonight's run is spent; the next one's window still covers these days
+        status, last_error = "failed", str(e)
+        logger.error(f"Strava reconciliation {run_date} aborted: {e}")
+
+    await supabase_admin.table("strava_reconcile_runs").update({
+        **totals,
+        "status": status,
+        "last_error": last_error,
+        "finished_at": _now().isoformat(),
+    }).eq("run_date", run_date).execute()
+    logger.info(f"Strava reconciliation {run_date}: {totals}")
+    return totals
+
+
+class Reconciler:
+    """Background loop that triggers run_once() each night after RECONCILE_HOUR_UTC."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self.last_run: dict | None = None
+
+    async def _loop(self):
+        while True:
+            now = _now()
+            if now.hour >= RECONCILE_HOUR_UTC:
+                try:
+                    totals = await run_once(now)
+                    if totals is not None:
+                        self.last_run = {"run_date": now.date().isoformat(), **totals}
+                except Exception as e:
+                    logger.error(f"Strava reconciliation run failed: {e}")
+            await asyncio.sleep(RECONCILE_CHECK_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="strava-reconciler")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"running": self._task is not None, "last_run": self.last_run}
+
+
+reconciler = Reconciler()
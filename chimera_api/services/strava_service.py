@@ -1,21 +1,32 @@
 import os
-import logging
 import time
-import httpx
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime
+import request_loader
 from db_client import supabase_admin
-from services.user_settings_service import get_user_settings, get_user_timezone
+from services.user_settings_service import (
+    InvalidationBackend,
+    get_user_settings,
+    invalidate_user_settings,
+)
 from services.analytics_service import track as analytics_track
+from services import training_rollup_service
+from services import strava_token_service
+from services import activity_payload_service
 from package_loader import get_config
+from strava_client import strava_client, STRAVA_API_URL
 
 logger = logging.getLogger(__name__)
 
-STRAVA_AUTH_URL = "https://www.strava.com/oauth/token"
-STRAVA_API_URL = "https://www.strava.com/api/v3"
 
 # Map Strava sport types to internal activity types
 STRAVA_TYPE_MAP = get_config()["stravaTypeMap"]
 
+UNKNOWN_ATHLETE_TTL_SECONDS = float(os.getenv("UNKNOWN_ATHLETE_TTL_SECONDS", "300"))
+# Webhook `updates` keys we can apply to the stored row without a detail fetch
+PATCHABLE_UPDATES = {"title", "type", "private"}
+WARM_PAGE_SIZE = 1000
+
 
 def _safe_int(value):
     if value is None:
@@ -43,74 +54,146 @@ def _map_activity_type(strava_type: str) -> str:
     return "other"
 
 
-def _get_user_by_strava_id(strava_athlete_id: int) -> str:
-    """Find the user_id that owns a given Strava athlete account."""
-    response = (
-        supabase_admin.table("user_settings")
-        .select("user_id")
-        .eq("strava_athlete_id", str(strava_athlete_id))
-        .execute()
-    )
-    if not response.data:
-        raise Exception(f"No user found for Strava Athlete ID: {strava_athlete_id}")
-    return response.data[0]["user_id"]
-
-
-async def _get_access_token(user_id: str) -> str:
-    """Get a valid Strava access token, only refreshing if expired."""
-    response = (
-        supabase_admin.table("user_settings")
-        .select("strava_access_token, strava_refresh_token, strava_expires_at")
-        .eq("user_id", user_id)
-        .execute()
-    )
-    if not response.data:
-        raise Exception(f"No Strava tokens found for user {user_id}")
-
-    settings = response.data[0]
-    expires_at = settings.get("strava_expires_at")
-    access_token = settings.get("strava_access_token")
+class UnknownAthleteError(Exception):
+    """No user is connected to the Strava athlete (deauthorized or never linked)."""
+
+    def __init__(self, message: str, cached: bool = False):
+        super().__init__(message)
+        # True when answered from the negative cache, which may predate a reconnect
+        self.cached = cached
+
+
+class AthleteDirectory:
+    """
+    strava_athlete_id -> user_id for webhook dispatch, without a DB round trip.
+
+    Warmed from user_settings at startup; misses fall back to one indexed query.
+    Unknown athletes are remembered for UNKNOWN_ATHLETE_TTL_SECONDS so floods of
+    events for deauthorized athletes cost nothing. Strava exchange and
+    disconnect call invalidate(), which drops the user's mapping and the
+    athlete's negative entry in every worker sharing the backend. Routine
+    settings writes (token refreshes, notes) leave the directory alone.
+    """
+
+    def __init__(
+        self,
+        unknown_ttl: float = UNKNOWN_ATHLETE_TTL_SECONDS,
+        clock=time.monotonic,
+        backend: InvalidationBackend | None = None,
+    ):
+        self.unknown_ttl = unknown_ttl
+        self.clock = clock
+        self.backend = backend or InvalidationBackend()
+        self.backend.subscribe(self._drop)
+        self._users: dict[str, str] = {}
+        self._athletes: dict[str, str] = {}  # user_id -> athlete id (reverse index)
+        self._unknown: dict[str, float] = {}  # athlete id -> negative entry expiry
+        self.hits = 0
+        self.misses = 0
+        self.unknown_hits = 0
+
+    async def warm(self) -> int:
+        """Load every connected athlete. Returns the number of mappings."""
+        offset = 0
+        while True:
+            response = (
+                await supabase_admin.table("user_settings")
+                .select("user_id, strava_athlete_id")
+                .not_.is_("strava_athlete_id", "null")
+                .range(offset, offset + WARM_PAGE_SIZE - 1)
+                .execute()
+            )
+            for row in response.data or []:
+                self.connect(row["strava_athlete_id"], row["user_id"])
+            if len(response.data or []) < WARM_PAGE_SIZE:
+                return len(self._users)
+            offset += WARM_PAGE_SIZE
+
+    async def resolve(self, strava_athlete_id) -> str:
+        """Return the user_id for an athlete or raise UnknownAthleteError."""
+        key = str(strava_athlete_id)
+        user_id = self._users.get(key)
+        if user_id:
+            self.hits += 1
+            return user_id
+        expires = self._unknown.get(key)
+        if expires is not None and expires > self.clock():
+            self.unknown_hits += 1
+            raise UnknownAthleteError(f"No user found for Strava Athlete ID: {key}", cached=True)
+
+        self.misses += 1
+        response = (
+            await supabase_admin.table("user_settings")
+            .select("user_id")
+            .eq("strava_athlete_id", key)
+            .execute()
+        )
+        if not response.data:
+            self._unknown[key] = self.clock() + self.unknown_ttl
+            raise UnknownAthleteError(f"No user found for Strava Athlete ID: {key}")
+        self.connect(key, response.data[0]["user_id"])
+        return response.data[0]["user_id"]
+
+    def connect(self, strava_athlete_id, user_id: str):
+        key = str(strava_athlete_id)
+        self.forget_user(user_id)
+        previous = self._users.get(key)
+        if previous is not None:
+            self._athletes.pop(previous, None)
+        self._users[key] = user_id
+        self._athletes[user_id] = key
+        self._unknown.pop(key, None)
+
+    def forget_user(self, user_id: str):
+        key = self._athletes.pop(user_id, None)
+        if key is not None:
+            self._users.pop(key, None)
+
+    def invalidate(self, user_id: str, strava_athlete_id=None):
+        """Drop the user's mapping (and the athlete's negative entry) in every worker."""
+        self.backend.publish(user_id)
+        if strava_athlete_id is not None:
+            self.backend.publish(str(strava_athlete_id))
+
+    def _drop(self, key: str):
+        # User ids and athlete ids share the channel; each key only matches its own kind
+        self.forget_user(key)
+        self._unknown.pop(key, None)
+        user_id = self._users.pop(key, None)
+        if user_id is not None:
+            self._athletes.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._users),
+            "unknown": len(self._unknown),
+            "hits": self.hits,
+            "misses": self.misses,
+            "unknown_hits": self.unknown_hits,
+        }
 
-    # Return cached token if it's still valid (with 60s buffer)
-    if access_token and expires_at and int(expires_at) > time.time() + 60:
-        return access_token
 
-    refresh_token = settings.get("strava_refresh_token")
-    if not refresh_token:
-        raise Exception(f"No Strava refresh token for user {user_id}")
+athlete_directory = AthleteDirectory()
 
-    payload = {
-        "client_id": os.getenv("STRAVA_CLIENT_ID"),
-        "client_secret": os.getenv("STRAVA_CLIENT_SECRET"),
-        "refresh_token": refresh_token,
-        "grant_type": "refresh_token",
-    }
 
-    async with httpx.AsyncClient() as client:
-        r = await client.post(STRAVA_AUTH_URL, data=payload)
-        r.raise_for_status()
-        tokens = r.json()
+async def _get_user_by_strava_id(strava_athlete_id: int) -> str:
+    """Find the user_id that owns a given Strava athlete account."""
+    return await athlete_directory.resolve(strava_athlete_id)
 
-    supabase_admin.table("user_settings").update(
-        {
-            "strava_access_token": tokens["access_token"],
-            "strava_refresh_token": tokens["refresh_token"],
-            "strava_expires_at": tokens["expires_at"],
-        }
-    ).eq("user_id", user_id).execute()
 
-    return tokens["access_token"]
+async def _get_access_token(user_id: str) -> str:
+    """Get a valid Strava access token (cached; refreshed single-flight when expired)."""
+    return await strava_token_service.token_cache.get(user_id)
 
 
 async def _fetch_strava_activity(token: str, activity_id: int) -> dict:
     """Fetch a single activity from the Strava API."""
     headers = {"Authorization": f"Bearer {token}"}
-    async with httpx.AsyncClient() as client:
-        r = await client.get(
-            f"{STRAVA_API_URL}/activities/{activity_id}", headers=headers
-        )
-        r.raise_for_status()
-        return r.json()
+    r = await strava_client.get(
+        f"{STRAVA_API_URL}/activities/{activity_id}", headers=headers
+    )
+    r.raise_for_status()
+    return r.json()
 
 
 def _build_activity_record(user_id: str, data: dict) -> dict:
@@ -126,7 +209,21 @@ def _build_activity_record(user_id: str, data: dict) -> dict:
         "elapsed_time_seconds": _safe_int(data.get("elapsed_time")),
         "total_elevation_gain": data.get("total_elevation_gain"),
         "average_heartrate": _safe_int(data.get("average_heartrate")),
-        "activity_data_blob": data,
+        # Denormalized summary fields so reads never need the raw payload
+        "name": data.get("name"),
+        "sport_type": data.get("sport_type"),
+        "start_date_local": data.get("start_date_local"),
+        "timezone": data.get("timezone"),
+        "average_speed": data.get("average_speed"),
+        "max_speed": data.get("max_speed"),
+        "max_heartrate": _safe_int(data.get("max_heartrate")),
+        "average_cadence": data.get("average_cadence"),
+        "average_watts": data.get("average_watts"),
+        "suffer_score": _safe_int(data.get("suffer_score")),
+        "calories": data.get("calories"),
+        # Raw payload lives in activity_payloads; callers store it with put/put_many
+        "payload_hash": activity_payload_service.payload_hash(data),
+        "activity_data_blob": None,
     }
 
 
@@ -134,34 +231,27 @@ def _build_activity_record(user_id: str, data: dict) -> dict:
 
 
 async def handle_webhook_event(
-    object_id: int, owner_id: int, aspect_type: str = "create"
+    object_id: int, owner_id: int, aspect_type: str = "create", updates: dict | None = None
 ):
-    """Dispatch webhook events to the appropriate handler."""
+    """
+    Dispatch a webhook event to the appropriate handler.
+    Runs on a webhook_queue_service worker: errors propagate so the job is retried.
+    """
     logger.info(
         f"Processing Strava event: {aspect_type} activity {object_id} "
         f"for athlete {owner_id}"
     )
-    try:
-        user_id = _get_user_by_strava_id(owner_id)
+    user_id = await _get_user_by_strava_id(owner_id)
 
+    # One settings read serves token, auto-link, tracked types and reminder
+    async with request_loader.loader_scope():
         if aspect_type == "create":
             await _handle_activity_create(user_id, object_id)
         elif aspect_type == "update":
-            await _handle_activity_update(user_id, object_id)
+            await _handle_activity_update(user_id, object_id, updates)
         elif aspect_type == "delete":
             await _handle_activity_delete(user_id, object_id)
 
-    except Exception as e:
-        logger.error(f"Strava webhook error ({aspect_type} {object_id}): {e}")
-        try:
-            analytics_track(user_id, "strava_sync_failed", {
-                "activity_id": object_id,
-                "aspect_type": aspect_type,
-                "error": str(e),
-            })
-        except Exception:
-            pass
-
 
 async def _handle_activity_create(user_id: str, activity_id: int):
     """Fetch new activity from Strava, upsert into DB, and auto-link to plan."""
@@ -169,13 +259,16 @@ async def _handle_activity_create(user_id: str, activity_id: int):
     data = await _fetch_strava_activity(token, activity_id)
 
     activity_record = _build_activity_record(user_id, data)
+    await activity_payload_service.put(data)
 
     result = (
-        supabase_admin.table("completed_activities")
+        await supabase_admin.table("completed_activities")
         .upsert(activity_record, on_conflict="user_id,source_type,source_id")
         .execute()
     )
 
+    await training_rollup_service.refresh_weeks(user_id, [activity_record["start_time"]])
+
     await _auto_link_to_plan(user_id, result.data[0]["id"], data)
 
     # Auto-add new activity type to tracked types
@@ -191,17 +284,110 @@ async def _handle_activity_create(user_id: str, activity_id: int):
     await _check_workout_update_reminder(user_id, data)
 
 
-async def _handle_activity_update(user_id: str, activity_id: int):
-    """Re-fetch updated activity from Strava and upsert into DB."""
+def _activity_patch(blob: dict, updates: dict) -> tuple[dict, dict]:
+    """Column changes and the patched raw payload for a webhook `updates` payload."""
+    blob = dict(blob)
+    patch = {}
+    if "title" in updates:
+        patch["name"] = blob["name"] = updates["title"]
+    if "type" in updates:
+        patch["original_activity_type"] = blob["type"] = updates["type"]
+        # Strava reports the coarse type here; it is also a valid sport_type
+        patch["sport_type"] = blob["sport_type"] = updates["type"]
+    if "private" in updates:
+        blob["private"] = str(updates["private"]).lower() == "true"
+    return patch, blob
+
+
+async def _stored_activity(user_id: str, activity_id: int) -> dict | None:
+    response = (
+        await supabase_admin.table("completed_activities")
+        .select("id, start_time, start_date_local, original_activity_type, planned_workout_id, payload_hash, activity_data_blob")
+        .eq("user_id", user_id)
+        .eq("source_type", "strava")
+        .eq("source_id", str(activity_id))
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def _apply_type_change(user_id: str, row: dict, new_type: str, start_date_local: str | None) -> bool:
+    """Track the new type and re-link the activity if its mapped type changed. Returns True on a change."""
+    old_type = row.get("original_activity_type")
+    if new_type == old_type:
+        return False
+
+    from services.activity_filter_service import auto_add_new_type
+    await auto_add_new_type(user_id, new_type)
+
+    if _map_activity_type(new_type) != _map_activity_type(old_type or ""):
+        await _relink_activity(user_id, row, new_type, start_date_local or row.get("start_date_local"))
+    return True
+
+
+async def _patch_activity_update(user_id: str, row: dict, blob: dict, updates: dict):
+    """Apply title/type/private changes to a stored activity and its raw payload without calling Strava."""
+    patch, blob = _activity_patch(blob, updates)
+    patch["payload_hash"] = await activity_payload_service.put(blob)
+    patch["activity_data_blob"] = None
+    await supabase_admin.table("completed_activities").update(patch).eq("id", row["id"]).execute()
+
+    new_type = patch.get("original_activity_type", row.get("original_activity_type"))
+    if await _apply_type_change(user_id, row, new_type, blob.get("start_date_local")):
+        # Rollups are bucketed by original type; title and privacy don't affect them
+        await training_rollup_service.refresh_weeks(user_id, [row["start_time"]])
+
+    logger.info(f"Patched activity {row['id']} for user {user_id} from webhook updates {sorted(updates)}")
+
+
+async def _relink_activity(user_id: str, row: dict, activity_type: str, start_date_local: str | None):
+    """Release the activity's planned workout (if any) and link it again under its new type."""
+    if row.get("planned_workout_id"):
+        await supabase_admin.table("completed_activities").update(
+            {"planned_workout_id": None}
+        ).eq("id", row["id"]).execute()
+        await supabase_admin.table("planned_workouts").update(
+            {"status": "planned"}
+        ).eq("id", row["planned_workout_id"]).execute()
+
+    await _auto_link_to_plan(
+        user_id, row["id"], {"start_date_local": start_date_local, "type": activity_type}
+    )
+
+
+async def _handle_activity_update(user_id: str, activity_id: int, updates: dict | None = None):
+    """
+    Apply an activity update. Changes fully described by the webhook `updates`
+    are patched in place when the stored row has its raw Strava payload;
+    anything else is re-fetched from Strava and upserted. Either way a type
+    change re-runs tracked-type bookkeeping and plan linking.
+    """
+    row = await _stored_activity(user_id, activity_id)
+    if row and updates and set(updates) <= PATCHABLE_UPDATES:
+        blob = await activity_payload_service.load_raw(row)
+        # Without a real payload (missing, or a legacy JSON string) patching would store a fragment
+        if isinstance(blob, dict):
+            await _patch_activity_update(user_id, row, blob, updates)
+            return
+
     token = await _get_access_token(user_id)
     data = await _fetch_strava_activity(token, activity_id)
 
     activity_record = _build_activity_record(user_id, data)
+    await activity_payload_service.put(data)
 
-    supabase_admin.table("completed_activities").upsert(
+    await supabase_admin.table("completed_activities").upsert(
         activity_record, on_conflict="user_id,source_type,source_id"
     ).execute()
 
+    # Strava updates never move start_date, so only the activity's own week changes
+    await training_rollup_service.refresh_weeks(user_id, [activity_record["start_time"]])
+
+    if row:
+        await _apply_type_change(
+            user_id, row, activity_record["original_activity_type"], activity_record.get("start_date_local")
+        )
+
     logger.info(f"Updated activity {activity_id} for user {user_id}")
 
 
@@ -209,8 +395,8 @@ async def _handle_activity_delete(user_id: str, activity_id: int):
     """Remove a deleted Strava activity and unlink any connected planned workout."""
     # Find the completed_activities row
     response = (
-        supabase_admin.table("completed_activities")
-        .select("id, planned_workout_id")
+        await supabase_admin.table("completed_activities")
+        .select("id, planned_workout_id, start_time")
         .eq("user_id", user_id)
         .eq("source_type", "strava")
         .eq("source_id", str(activity_id))
@@ -225,15 +411,17 @@ async def _handle_activity_delete(user_id: str, activity_id: int):
 
     # Unlink the planned workout back to "planned" status
     if row.get("planned_workout_id"):
-        supabase_admin.table("planned_workouts").update(
+        await supabase_admin.table("planned_workouts").update(
             {"status": "planned"}
         ).eq("id", row["planned_workout_id"]).execute()
 
     # Delete the completed activity
-    supabase_admin.table("completed_activities").delete().eq(
+    await supabase_admin.table("completed_activities").delete().eq(
         "id", row["id"]
     ).execute()
 
+    await training_rollup_service.refresh_weeks(user_id, [row.get("start_time")])
+
     logger.info(f"Deleted activity {activity_id} for user {user_id}")
 
 
@@ -259,7 +447,7 @@ async def _check_workout_update_reminder(user_id: str, strava_data: dict):
 
         # Check if workout_update already exists for this activity
         existing = (
-            supabase_admin.table("daily_checkin")
+            await supabase_admin.table("daily_checkin")
             .select("id")
             .eq("user_id", user_id)
             .eq("strava_activity_id", source_id)
@@ -281,114 +469,17 @@ async def _check_workout_update_reminder(user_id: str, strava_data: dict):
 
 
 async def _auto_link_to_plan(user_id: str, completed_id, strava_data: dict):
-    """Match a completed activity to a planned workout by date and activity type."""
-    local_iso = strava_data.get("start_date_local")
-    if not local_iso:
-        return
-    target_date_str = local_iso.split("T")[0]
-    activity_type = _map_activity_type(strava_data.get("type", ""))
-
-    # Query a UTC window around the target date
-    target_date = datetime.fromisoformat(target_date_str)
-    search_start = (target_date - timedelta(days=1)).isoformat()
-    search_end = (target_date + timedelta(days=2)).isoformat()
-
-    response = (
-        supabase_admin.table("planned_workouts")
-        .select("*")
-        .eq("user_id", user_id)
-        .eq("status", "planned")
-        .gte("start_time", search_start)
-        .lte("start_time", search_end)
-        .execute()
-    )
-
-    candidates = response.data
-    if not candidates:
-        logger.info(f"No planned workouts found near {target_date_str}")
-        return
-
-    settings = await get_user_settings(user_id)
-    user_tz = get_user_timezone(settings)
-
-    # First pass: match on date AND activity type
-    match = None
-    for plan in candidates:
-        plan_utc = datetime.fromisoformat(plan["start_time"].replace("Z", "+00:00"))
-        plan_local = plan_utc.astimezone(user_tz)
-        if plan_local.strftime("%Y-%m-%d") == target_date_str:
-            if plan.get("activity_type") == activity_type:
-                match = plan
-                break
-
-    # Second pass: match on date only (fallback for "other" types or mismatches)
-    if not match:
-        for plan in candidates:
-            plan_utc = datetime.fromisoformat(
-                plan["start_time"].replace("Z", "+00:00")
-            )
-            plan_local = plan_utc.astimezone(user_tz)
-            if plan_local.strftime("%Y-%m-%d") == target_date_str:
-                match = plan
-                break
+    """Link one new activity to its best-scoring open planned workout that day."""
+    from services.plan_link_service import link_activities
 
-    if match:
-        logger.info(f"Linked activity to planned workout: {match['title']}")
-        supabase_admin.table("completed_activities").update(
-            {"planned_workout_id": match["id"]}
-        ).eq("id", completed_id).execute()
-
-        supabase_admin.table("planned_workouts").update(
-            {"status": "completed"}
-        ).eq("id", match["id"]).execute()
-    else:
-        logger.info(f"No matching planned workout for {target_date_str}")
-
-
-# --- Historical Sync ---
-
-
-async def sync_recent_activities(user_id: str, days: int = 30) -> dict:
-    """Fetch and store recent Strava activities for a user (backfill)."""
-    token = await _get_access_token(user_id)
-    after_epoch = int((datetime.utcnow() - timedelta(days=days)).timestamp())
-
-    all_activities = []
-    page = 1
-
-    async with httpx.AsyncClient() as client:
-        while True:
-            r = await client.get(
-                f"{STRAVA_API_URL}/athlete/activities",
-                headers={"Authorization": f"Bearer {token}"},
-                params={"after": after_epoch, "per_page": 100, "page": page},
-            )
-            r.raise_for_status()
-            batch = r.json()
-            if not batch:
-                break
-            all_activities.extend(batch)
-            if len(batch) < 100:
-                break
-            page += 1
-
-    synced = 0
-    errors = 0
-    for summary in all_activities:
-        try:
-            # List endpoint returns summaries; fetch full detail for each
-            detail = await _fetch_strava_activity(token, summary["id"])
-            record = _build_activity_record(user_id, detail)
-            supabase_admin.table("completed_activities").upsert(
-                record, on_conflict="user_id,source_type,source_id"
-            ).execute()
-            synced += 1
-        except Exception as e:
-            logger.error(f"Failed to sync activity {summary.get('id')}: {e}")
-            errors += 1
-
-    logger.info(f"Synced {synced} activities for user {user_id} ({errors} errors)")
-    return {"synced": synced, "errors": errors, "total": len(all_activities)}
+    await link_activities(user_id, [{
+        "id": completed_id,
+        "start_date_local": strava_data.get("start_date_local"),
+        "original_activity_type": strava_data.get("type", ""),
+        "moving_time_seconds": strava_data.get("moving_time"),
+        "elapsed_time_seconds": strava_data.get("elapsed_time"),
+        "distance_meters": strava_data.get("distance"),
+    }])
 
 
 # --- Disconnect ---
@@ -396,7 +487,7 @@ async def sync_recent_activities(user_id: str, days: int = 30) -> dict:
 
 async def disconnect_strava(user_id: str):
     """Clear Strava tokens and athlete ID from user settings."""
-    supabase_admin.table("user_settings").update(
+    await supabase_admin.table("user_settings").update(
         {
             "strava_access_token": None,
             "strava_refresh_token": None,
@@ -404,5 +495,7 @@ async def disconnect_strava(user_id: str):
             "strava_athlete_id": None,
         }
     ).eq("user_id", user_id).execute()
+    invalidate_user_settings(user_id)
+    athlete_directory.invalidate(user_id)
 
     logger.info(f"Disconnected Strava for user {user_id}")
@@ -0,0 +1,191 @@
+"""
+Strava access tokens.
+
+StravaTokenCache keeps each user's access/refresh token pair in process and
+hands out the access token without a settings read. Refreshes are single-flight
+per user: concurrent callers await the same refresh, so a burst of webhooks for
+one athlete makes one OAuth call and never races on the rotated refresh token.
+
+The renewer loop (started in main's lifespan) refreshes tokens of recently
+active users TOKEN_RENEW_AHEAD_SECONDS before they expire, so the webhook path
+rarely waits on the OAuth endpoint. Entries are dropped whenever the user's
+settings are invalidated (token exchange, disconnect), in every worker sharing
+the settings invalidation backend.
+"""
+import os
+import time
+import asyncio
+import logging
+
+from db_client import supabase_admin
+from services.user_settings_service import (
+    load_user_settings,
+    invalidate_user_settings,
+    settings_cache,
+)
+from strava_client import strava_client, STRAVA_AUTH_URL
+
+logger = logging.getLogger(__name__)
+
+TOKEN_EXPIRY_BUFFER_SECONDS = 60
+TOKEN_RENEW_AHEAD_SECONDS = float(os.getenv("STRAVA_TOKEN_RENEW_AHEAD_SECONDS", "900"))
+TOKEN_RENEW_INTERVAL_SECONDS = float(os.getenv("STRAVA_TOKEN_RENEW_INTERVAL_SECONDS", "300"))
+# Only users who needed a token this recently are renewed proactively
+TOKEN_ACTIVE_SECONDS = float(os.getenv("STRAVA_TOKEN_ACTIVE_SECONDS", "86400"))
+
+
+class StravaTokenCache:
+    """Per-user Strava tokens with single-flight refresh."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._entries: dict[str, dict] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._renewer: asyncio.Task | None = None
+        self.hits = 0
+        self.refreshes = 0
+        self.joined = 0
+        self.renewed = 0
+
+    def _remember(self, user_id: str, row: dict) -> dict | None:
+        if not row.get("strava_access_token"):
+            return None
+        entry = {
+            "access_token": row["strava_access_token"],
+            "expires_at": int(row.get("strava_expires_at") or 0),
+            "used_at": self.clock(),
+        }
+        self._entries[user_id] = entry
+        return entry
+
+    def _fresh(self, entry: dict | None, buffer: float = TOKEN_EXPIRY_BUFFER_SECONDS) -> bool:
+        return bool(entry) and entry["expires_at"] > self.clock() + buffer
+
+    async def get(self, user_id: str) -> str:
+        """Return a valid access token, refreshing (once per user at a time) if expired."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            settings = await load_user_settings(user_id)
+            if not settings:
+                raise Exception(f"No Strava tokens found for user {user_id}")
+            entry = self._remember(user_id, settings)
+        if self._fresh(entry):
+            self.hits += 1
+            entry["used_at"] = self.clock()
+            return entry["access_token"]
+        return await self.refresh(user_id)
+
+    async def refresh(self, user_id: str) -> str:
+        """Join the user's in-flight refresh, or start one."""
+        future = self._inflight.get(user_id)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(user_id))
+            self._inflight[user_id] = future
+            future.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        else:
+            self.joined += 1
+        # shield: a cancelled caller must not cancel the refresh others are awaiting
+        return await asyncio.shield(future)
+
+    async def _refresh(self, user_id: str) -> str:
+        # Read the newest pair straight from the table: another worker may have rotated it
+        response = (
+            await supabase_admin.table("user_settings")
+            .select("strava_access_token, strava_refresh_token, strava_expires_at")
+            .eq("user_id", user_id)
+            .execute()
+        )
+        row = response.data[0] if response.data else {}
+        entry = self._remember(user_id, row)
+        if self._fresh(entry, TOKEN_RENEW_AHEAD_SECONDS):
+            return entry["access_token"]
+
+        refresh_token = row.get("strava_refresh_token")
+        if not refresh_token:
+            raise Exception(f"No Strava refresh token for user {user_id}")
+
+        payload = {
+            "client_id": os.getenv("STRAVA_CLIENT_ID"),
+            "client_secret": os.getenv("STRAVA_CLIENT_SECRET"),
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token",
+        }
+        self.refreshes += 1
+        r = await strava_client.post(STRAVA_AUTH_URL, data=payload)
+        r.raise_for_status()
+        tokens = r.json()
+
+        await supabase_admin.table("user_settings").update(
+            {
+                "strava_access_token": tokens["access_token"],
+                "strava_refresh_token": tokens["refresh_token"],
+                "strava_expires_at": tokens["expires_at"],
+            }
+        ).eq("user_id", user_id).execute()
+        invalidate_user_settings(user_id)  # also drops our entry; re-add the new pair
+        self._remember(user_id, {
+            "strava_access_token": tokens["access_token"],
+            "strava_expires_at": tokens["expires_at"],
+        })
+        return tokens["access_token"]
+
+    def forget(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    # --- Proactive renewal ---
+
+    async def renew_expiring(self) -> int:
+        """Refresh tokens of active users that expire within TOKEN_RENEW_AHEAD_SECONDS."""
+        now = self.clock()
+        due = [
+            user_id for user_id, entry in list(self._entries.items())
+            if now - entry["used_at"] < TOKEN_ACTIVE_SECONDS
+            and not self._fresh(entry, TOKEN_RENEW_AHEAD_SECONDS)
+        ]
+        renewed = 0
+        for user_id in due:
+            try:
+                await self.refresh(user_id)
+                renewed += 1
+            except Exception as e:
+                logger.warning(f"Proactive Strava token renewal failed for user {user_id}: {e}")
+        self.renewed += renewed
+        return renewed
+
+    async def _renew_loop(self):
+        while True:
+            await asyncio.sleep(TOKEN_RENEW_INTERVAL_SECONDS)
+            try:
+                renewed = await self.renew_expiring()
+                if renewed:
+                    logger.info(f"Renewed {renewed} Strava tokens ahead of expiry")
+            except Exception as e:
+                logger.error(f"Strava token renewer failed: {e}")
+
+    def start(self):
+        if self._renewer is None:
+            self._renewer = asyncio.create_task(self._renew_loop(), name="strava-token-renewer")
+
+    async def stop(self):
+        if self._renewer is not None:
+            self._renewer.cancel()
+            await asyncio.gather(self._renewer, return_exceptions=True)
+            self._renewer = None
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "joined_refreshes": self.joined,
+            "renewed_ahead": self.renewed,
+            "in_flight": len(self._inflight),
+        }
+
+
+token_cache = StravaTokenCache()
+# Token exchange, disconnect and refreshes all invalidate user_settings
+settings_cache.backend.subscribe(token_cache.forget)
@@ -8,7 +8,7 @@ logger = logging.getLogger(__name__)
 
 async def create_template(data: dict, user_id: str) -> dict:
     row = {**data, "user_id": user_id}
-    response = supabase_admin.table("plan_templates").insert(row).execute()
+    response = await supabase_admin.table("plan_templates").insert(row).execute()
     return response.data[0]
 
 
@@ -17,13 +17,13 @@ async def get_templates(user_id: str, template_type: Optional[str] = None) -> li
     if template_type:
         query = query.eq("template_type", template_type)
     query = query.order("created_at", desc=True)
-    response = query.execute()
+    response = await query.execute()
     return response.data or []
 
 
 async def get_template(template_id: str, user_id: str) -> dict:
     response = (
-        supabase_admin.table("plan_templates")
+        await supabase_admin.table("plan_templates")
         .select("*")
         .eq("id", template_id)
         .eq("user_id", user_id)
@@ -36,6 +36,6 @@ async def get_template(template_id: str, user_id: str) -> dict:
 
 
 async def delete_template(template_id: str, user_id: str):
-    supabase_admin.table("plan_templates").delete().eq(
+    await supabase_admin.table("plan_templates").delete().eq(
         "id", template_id
     ).eq("user_id", user_id).execute()
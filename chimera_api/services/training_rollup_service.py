@@ -0,0 +1,207 @@
+"""
+Weekly training rollups.
+
+Maintains weekly_training_rollups (per user, per ISO week, per original activity
+type and stats override mode) so the dashboard reads a handful of small rows
+instead of re-bucketing raw completed_activities on every open.
+
+Writers call refresh_weeks() after touching an activity; the affected weeks are
+recomputed from their raw rows, which keeps maxima (long run) correct on delete.
+"""
+import logging
+from datetime import datetime, timedelta, date, timezone
+
+from db_client import supabase_admin
+from projections import ACTIVITY_ROLLUP
+from services.activity_filter_service import is_activity_included
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000  # PostgREST default max rows per response
+UPSERT_BATCH = 500
+
+
+def _week_start(d: date) -> date:
+    """Return Monday of the week containing date d."""
+    return d - timedelta(days=d.weekday())
+
+
+def activity_week(start_time: str) -> date | None:
+    """Bucket an activity start_time (UTC ISO string) into its week start."""
+    if not start_time:
+        return None
+    d = datetime.fromisoformat(start_time.replace("Z", "+00:00")).date()
+    return _week_start(d)
+
+
+def stats_mode_for(activity: dict) -> str:
+    """Map per-activity stats overrides to a rollup stats_mode."""
+    if activity.get("stats_override"):
+        return "exclude" if activity.get("stats_excluded") else "include"
+    return "default"
+
+
+def is_rollup_included(row: dict, tracked_types: list[str]) -> bool:
+    """Apply the same inclusion rules as is_activity_included to a rollup row."""
+    mode = row.get("stats_mode", "default")
+    return is_activity_included(
+        {
+            "stats_override": mode != "default",
+            "stats_excluded": mode == "exclude",
+            "original_activity_type": row.get("activity_type") or None,
+        },
+        tracked_types,
+    )
+
+
+def compute_rollups(user_id: str, activities: list) -> dict:
+    """Bucket raw activities into rollup rows keyed by (week_start, activity_type, stats_mode)."""
+    rollups = {}
+    for a in activities:
+        week = activity_week(a.get("start_time"))
+        if not week:
+            continue
+        key = (week.isoformat(), a.get("original_activity_type") or "", stats_mode_for(a))
+        r = rollups.get(key)
+        if r is None:
+            r = rollups[key] = {
+                "user_id": user_id,
+                "week_start": key[0],
+                "activity_type": key[1],
+                "stats_mode": key[2],
+                "volume_m": 0,
+                "vert_m": 0,
+                "duration_s": 0,
+                "hr_weighted_sum": 0,
+                "hr_weight_s": 0,
+                "long_run_m": 0,
+                "activity_count": 0,
+            }
+        dist = a.get("distance_meters") or 0
+        moving = a.get("moving_time_seconds") or 0
+        r["volume_m"] += dist
+        r["vert_m"] += a.get("total_elevation_gain") or 0
+        r["duration_s"] += moving
+        hr = a.get("average_heartrate")
+        if hr:
+            r["hr_weighted_sum"] += hr * (moving or 1)
+            r["hr_weight_s"] += moving or 1
+        if dist > r["long_run_m"]:
+            r["long_run_m"] = dist
+        r["activity_count"] += 1
+    return rollups
+
+
+async def _write_rollups(user_id: str, rows: list, stamp: str, week_starts: list[str] | None = None):
+    """Upsert fresh rows, then drop rows in the refreshed range that were not rewritten."""
+    for row in rows:
+        row["updated_at"] = stamp
+    for i in range(0, len(rows), UPSERT_BATCH):
+        await (
+            supabase_admin.table("weekly_training_rollups")
+            .upsert(rows[i : i + UPSERT_BATCH], on_conflict="user_id,week_start,activity_type,stats_mode")
+            .execute()
+        )
+
+    stale = (
+        supabase_admin.table("weekly_training_rollups")
+        .delete()
+        .eq("user_id", user_id)
+        .lt("updated_at", stamp)
+    )
+    if week_starts is not None:
+        stale = stale.in_("week_start", week_starts)
+    await stale.execute()
+
+
+async def refresh_weeks(user_id: str, start_times: list[str]):
+    """Recompute the rollup weeks containing the given activity start times."""
+    weeks = sorted({w for w in (activity_week(s) for s in start_times) if w})
+    if not weeks:
+        return
+
+    try:
+        range_start = weeks[0].isoformat()
+        range_end = (weeks[-1] + timedelta(days=7)).isoformat()
+        resp = (
+            await supabase_admin.table("completed_activities")
+            .select(ACTIVITY_ROLLUP)
+            .eq("user_id", user_id)
+            .gte("start_time", range_start)
+            .lt("start_time", range_end)
+            .execute()
+        )
+        week_keys = {w.isoformat() for w in weeks}
+        rows = [
+            r for r in compute_rollups(user_id, resp.data or []).values()
+            if r["week_start"] in week_keys
+        ]
+        stamp = datetime.now(timezone.utc).isoformat()
+        await _write_rollups(user_id, rows, stamp, week_starts=sorted(week_keys))
+    except Exception as e:
+        logger.warning(f"Failed to refresh weekly rollups for user {user_id}: {e}")
+
+
+async def rebuild_user(user_id: str) -> int:
+    """Rebuild every rollup row for a user from raw activities. Returns row count."""
+    activities = []
+    offset = 0
+    while True:
+        resp = (
+            await supabase_admin.table("completed_activities")
+            .select(ACTIVITY_ROLLUP)
+            .eq("user_id", user_id)
+            .order("start_time", desc=False)
+            .range(offset, offset + PAGE_SIZE - 1)
+            .execute()
+        )
+        batch = resp.data or []
+        activities.extend(batch)
+        if len(batch) < PAGE_SIZE:
+            break
+        offset += PAGE_SIZE
+
+    rows = list(compute_rollups(user_id, activities).values())
+    stamp = datetime.now(timezone.utc).isoformat()
+    await _write_rollups(user_id, rows, stamp)
+    logger.info(f"Rebuilt {len(rows)} weekly rollups for user {user_id} ({len(activities)} activities)")
+    return len(rows)
+
+
+async def rebuild_all() -> dict:
+    """Rebuild rollups for every user, reading users a page at a time."""
+    counts = {"users": 0, "rows": 0, "errors": 0}
+    offset = 0
+    while True:
+        resp = (
+            await supabase_admin.table("users")
+            .select("id")
+            .order("id")
+            .range(offset, offset + PAGE_SIZE - 1)
+            .execute()
+        )
+        users = resp.data or []
+        for user in users:
+            try:
+                counts["rows"] += await rebuild_user(user["id"])
+                counts["users"] += 1
+            except Exception as e:
+                logger.error(f"Rollup rebuild failed for user {user['id']}: {e}")
+                counts["errors"] += 1
+        if len(users) < PAGE_SIZE:
+            return counts
+        offset += PAGE_SIZE
+
+
+async def get_weekly_rollups(user_id: str, start: date, end: date) -> list:
+    """Fetch rollup rows for weeks overlapping [start, end]."""
+    resp = (
+        await supabase_admin.table("weekly_training_rollups")
+        .select("week_start, activity_type, stats_mode, volume_m, vert_m, duration_s, hr_weighted_sum, hr_weight_s, long_run_m, activity_count")
+        .eq("user_id", user_id)
+        .gte("week_start", _week_start(start).isoformat())
+        .lte("week_start", end.isoformat())
+        .order("week_start", desc=False)
+        .execute()
+    )
+    return resp.data or []
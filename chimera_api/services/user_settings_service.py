@@ -1,6 +1,10 @@
+import os
+import time
 import logging
+from collections import OrderedDict
 from datetime import datetime
 from zoneinfo import ZoneInfo
+import request_loader
 from db_client import supabase_admin
 from package_loader import get_config
 
@@ -8,18 +12,131 @@ logger = logging.getLogger(__name__)
 
 DEFAULT_TIMEZONE = get_config()["defaultTimezone"]
 
+SETTINGS_CACHE_TTL_SECONDS = float(os.getenv("SETTINGS_CACHE_TTL_SECONDS", "60"))
+SETTINGS_CACHE_MAX_ENTRIES = int(os.getenv("SETTINGS_CACHE_MAX_ENTRIES", "1024"))
+
+_MISSING = object()
+
+
+# --- Settings Cache ---
+
+
+class InvalidationBackend:
+    """Fan-out for settings invalidations.
+
+    The default only reaches this process. Multi-worker deployments can plug in
+    a shared transport (Redis pub/sub, Postgres LISTEN/NOTIFY) by overriding
+    publish() and calling every subscriber when a message arrives.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def publish(self, user_id: str):
+        for callback in self._subscribers:
+            callback(user_id)
+
+
+class SettingsCache:
+    """In-process LRU + TTL cache of user_settings rows keyed by user_id."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, backend: InvalidationBackend | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, dict | None]] = OrderedDict()
+        # Bumped by every invalidation, so a read that raced one is not cached
+        self._generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.set_backend(backend or InvalidationBackend())
+
+    def set_backend(self, backend: InvalidationBackend):
+        self.backend = backend
+        backend.subscribe(self._drop)
+
+    def get(self, user_id: str):
+        """Return a copy of the cached row (None for a known-missing row) or _MISSING."""
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return dict(entry[1]) if entry[1] is not None else None
+
+    def generation(self, user_id: str) -> int:
+        """Take before reading the row from the database; pass to set()."""
+        return self._generations.get(user_id, 0)
+
+    def set(self, user_id: str, row: dict | None, generation: int | None = None):
+        """Cache a row, unless it was invalidated since `generation` was taken (the read may be stale)."""
+        if generation is not None and generation != self.generation(user_id):
+            return
+        self._entries[user_id] = (
+            time.monotonic() + self.ttl_seconds,
+            dict(row) if row is not None else None,
+        )
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        """Drop the row here and in every worker sharing the backend."""
+        self.backend.publish(user_id)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _drop(self, user_id: str):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+settings_cache = SettingsCache(SETTINGS_CACHE_MAX_ENTRIES, SETTINGS_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_settings(user_id: str):
+    """Call after every write to a user_settings row."""
+    settings_cache.invalidate(user_id)
+    request_loader.invalidate("user_settings", user_id)
+
+
+async def load_user_settings(user_id: str) -> dict | None:
+    """Fetch the user_settings row through the cache. Raises on DB errors."""
+    row = settings_cache.get(user_id)
+    if row is not _MISSING:
+        return row
+    generation = settings_cache.generation(user_id)
+    row = await request_loader.load("user_settings", user_id)
+    settings_cache.set(user_id, row, generation)
+    return row
+
 
 async def get_user_settings(user_id: str) -> dict:
-    """Fetch user_settings row for a given user."""
+    """Fetch user_settings row for a given user (cached, {} when missing)."""
     try:
-        response = (
-            supabase_admin.table("user_settings")
-            .select("*")
-            .eq("user_id", user_id)
-            .execute()
-        )
-        if response.data:
-            return response.data[0]
+        settings = await load_user_settings(user_id)
+        if settings:
+            return settings
     except Exception as e:
         logger.warning(f"Failed to fetch user settings: {e}")
     return {}
@@ -42,16 +159,11 @@ def get_local_now(tz: ZoneInfo) -> datetime:
 
 
 async def get_user_profile(user_id: str) -> dict:
-    """Fetch user profile from users table."""
+    """Fetch user profile from users table (memoized per request)."""
     try:
-        response = (
-            supabase_admin.table("users")
-            .select("id, name, email")
-            .eq("id", user_id)
-            .execute()
-        )
-        if response.data:
-            return response.data[0]
+        profile = await request_loader.load("users", user_id)
+        if profile:
+            return profile
     except Exception as e:
         logger.warning(f"Failed to fetch user profile: {e}")
     return {}
@@ -62,10 +174,11 @@ async def update_user_settings(user_id: str, updates: dict) -> dict:
     try:
         updates["user_id"] = user_id
         response = (
-            supabase_admin.table("user_settings")
+            await supabase_admin.table("user_settings")
             .upsert(updates, on_conflict="user_id")
             .execute()
         )
+        invalidate_user_settings(user_id)
         if response.data:
             return response.data[0]
     except Exception as e:
@@ -82,11 +195,12 @@ async def update_coach_notes(user_id: str, note: str) -> dict:
 
     try:
         response = (
-            supabase_admin.table("user_settings")
+            await supabase_admin.table("user_settings")
             .update({"coach_notes": updated_notes})
             .eq("user_id", user_id)
             .execute()
         )
+        invalidate_user_settings(user_id)
         if response.data:
             return {"status": "success", "notes": updated_notes}
     except Exception as e:
@@ -0,0 +1,407 @@
+"""
+Durable Strava webhook queue.
+
+POST /v1/webhooks/strava calls enqueue() and answers Strava right away; a pool of
+workers (started in main's lifespan) claims rows from webhook_jobs and runs
+strava_service.handle_webhook_event on them. Failures are retried with
+exponential backoff and jitter; permanent errors, or WEBHOOK_MAX_ATTEMPTS
+failures, dead-letter the job (status 'dead', last_error kept for inspection).
+A job whose Strava calls would have to wait past its timeout for the rate-limit
+window is put back until the reset without spending an attempt.
+
+(object_id, aspect_type, event_time) is unique, so a Strava retry of an event we
+already stored is a no-op. Claims are a conditional update on the attempts
+counter, so any number of workers, in any number of processes, can poll the same
+table without running a job twice; a job left 'running' past its lease (worker
+crashed mid-job) is claimed again.
+
+Strava sends bursts per activity (create, then title/privacy updates seconds
+later). Creates and updates are due WEBHOOK_COALESCE_SECONDS after arrival, and
+the worker that claims one first folds every pending job for the same
+(owner_id, object_id) into it: delete beats create beats update, update payloads
+are merged, and the folded jobs are marked done with coalesced_into set.
+
+Jobs queued by the nightly reconciler (source 'reconcile') run in the BACKFILL
+rate-limit lane; a live event folded into one lifts it to the WEBHOOK lane.
+"""
+import os
+import socket
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from db_client import supabase_admin
+from services.analytics_service import track as analytics_track
+from strava_client import lane, wait_budget, Lane, RateLimited
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "6"))
+WEBHOOK_BACKOFF_BASE_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_BASE_SECONDS", "10"))
+WEBHOOK_BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_MAX_SECONDS", "900"))
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "5"))
+WEBHOOK_JOB_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_JOB_TIMEOUT_SECONDS", "120"))
+WEBHOOK_LEASE_SECONDS = float(os.getenv("WEBHOOK_LEASE_SECONDS", "300"))
+# Creates/updates wait this long so follow-up edits fold into one fetch
+WEBHOOK_COALESCE_SECONDS = float(os.getenv("WEBHOOK_COALESCE_SECONDS", "15"))
+
+CLAIM_BATCH = 10
+IDEMPOTENCY_KEY = "object_id,aspect_type,event_time"
+# Client errors a retry will not fix (deleted/private activity, revoked access)
+_RETRYABLE_STATUS = {408, 409, 425, 429}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retry number `attempts`: exponential, capped, jittered to 50-100%."""
+    delay = min(WEBHOOK_BACKOFF_MAX_SECONDS, WEBHOOK_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def is_permanent(error: Exception) -> bool:
+    """True for failures that should dead-letter immediately instead of retrying."""
+    from services.strava_service import UnknownAthleteError
+
+    if isinstance(error, UnknownAthleteError):
+        # A negative-cache answer may predate a reconnect: retry until the DB confirms it
+        return not error.cached
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return 400 <= status < 500 and status not in _RETRYABLE_STATUS
+    return False
+
+
+# --- Producer ---
+
+
+async def enqueue(event: dict) -> bool:
+    """
+    Persist a webhook event as a pending job.
+    Returns False when the event was already queued (Strava redelivery).
+    Raises on DB errors so the endpoint fails and Strava retries the delivery.
+    """
+    row = {
+        "object_id": event["object_id"],
+        "owner_id": event["owner_id"],
+        "object_type": event.get("object_type", "activity"),
+        "aspect_type": event["aspect_type"],
+        "event_time": event["event_time"],
+        "updates": event.get("updates"),
+        "source": event.get("source", "webhook"),
+    }
+    if row["aspect_type"] != "delete":
+        row["run_after"] = (_now() + timedelta(seconds=WEBHOOK_COALESCE_SECONDS)).isoformat()
+    response = (
+        await supabase_admin.table("webhook_jobs")
+        .upsert(row, on_conflict=IDEMPOTENCY_KEY, ignore_duplicates=True)
+        .execute()
+    )
+    created = bool(response.data)
+    if created:
+        if row["aspect_type"] == "delete":
+            worker_pool.notify()
+    else:
+        worker_pool.stats["duplicates"] += 1
+        logger.info(
+            f"Duplicate Strava event ignored: {row['aspect_type']} {row['object_id']} @ {row['event_time']}"
+        )
+    return created
+
+
+# --- Consumer ---
+
+
+async def _try_claim(job: dict, worker_id: str) -> dict | None:
+    """Take the job if nobody claimed it since we read it (attempts acts as a version)."""
+    now = _now().isoformat()
+    response = (
+        await supabase_admin.table("webhook_jobs")
+        .update({
+            "status": "running",
+            "attempts": job["attempts"] + 1,
+            "locked_by": worker_id,
+            "locked_at": now,
+            "updated_at": now,
+        })
+        .eq("id", job["id"])
+        .eq("status", job["status"])
+        .eq("attempts", job["attempts"])
+        .execute()
+    )
+    return response.data[0] if response.data else None
+
+
+async def claim_job(worker_id: str) -> dict | None:
+    """Claim the oldest due pending job, else a running job whose lease expired."""
+    now = _now()
+    response = (
+        await supabase_admin.table("webhook_jobs")
+        .select("*")
+        .eq("status", "pending")
+        .lte("run_after", now.isoformat())
+        .order("run_after")
+        .limit(CLAIM_BATCH)
+        .execute()
+    )
+    candidates = response.data or []
+    if not candidates:
+        response = (
+            await supabase_admin.table("webhook_jobs")
+            .select("*")
+            .eq("status", "running")
+            .lt("locked_at", (now - timedelta(seconds=WEBHOOK_LEASE_SECONDS)).isoformat())
+            .limit(CLAIM_BATCH)
+            .execute()
+        )
+        candidates = response.data or []
+        for job in candidates:
+            logger.warning(f"Reclaiming webhook job {job['id']} (lease held by {job.get('locked_by')} expired)")
+
+    for job in candidates:
+        claimed = await _try_claim(job, worker_id)
+        if claimed:
+            return claimed
+    return None
+
+
+def coalesce_events(events: list[dict]) -> tuple[str, dict | None]:
+    """
+    Merge queued events for one activity into the single action that reaches the
+    final state: any delete wins, else any create (its fetch sees the final
+    state), else one update carrying every field change, later events winning.
+    """
+    aspects = {e.get("effective_aspect") or e["aspect_type"] for e in events}
+    if "delete" in aspects:
+        return "delete", None
+    if "create" in aspects:
+        return "create", None
+    updates = {}
+    for event in sorted(events, key=lambda e: e["event_time"]):
+        updates.update(event.get("updates") or {})
+    return "update", updates
+
+
+async def _coalesce(job: dict) -> tuple[dict, int]:
+    """Fold pending jobs for the same activity into the claimed job; returns (job, folded)."""
+    response = (
+        await supabase_admin.table("webhook_jobs")
+        .select("*")
+        .eq("owner_id", job["owner_id"])
+        .eq("object_id", job["object_id"])
+        .eq("status", "pending")
+        .neq("id", job["id"])
+        .execute()
+    )
+    siblings = response.data or []
+    if not siblings:
+        return job, 0
+
+    aspect, updates = coalesce_events([job, *siblings])
+    # A live event in the group keeps the merged job in the webhook lane
+    sources = {e.get("source") or "webhook" for e in [job, *siblings]}
+    source = "webhook" if "webhook" in sources else job.get("source")
+    # Record the merged action before retiring the siblings, so a retry of this
+    # job still carries what they asked for
+    await (
+        supabase_admin.table("webhook_jobs")
+        .update({"effective_aspect": aspect, "updates": updates, "source": source})
+        .eq("id", job["id"])
+        .eq("attempts", job["attempts"])
+        .execute()
+    )
+    job = {**job, "effective_aspect": aspect, "updates": updates, "source": source}
+
+    folded = 0
+    for sibling in siblings:
+        taken = (
+            await supabase_admin.table("webhook_jobs")
+            .update({
+                "status": "done",
+                "coalesced_into": job["id"],
+                "updated_at": _now().isoformat(),
+            })
+            .eq("id", sibling["id"])
+            .eq("status", "pending")
+            .eq("attempts", sibling["attempts"])
+            .execute()
+        )
+        folded += bool(taken.data)
+    logger.info(
+        f"Coalesced {folded} Strava event(s) into {aspect} activity {job['object_id']} (job {job['id']})"
+    )
+    return job, folded
+
+
+async def _owner_user_id(job: dict) -> str | None:
+    """App user id of the job's athlete, for analytics; None when no user owns it."""
+    from services import strava_service
+
+    try:
+        return await strava_service.athlete_directory.resolve(job["owner_id"])
+    except Exception:
+        return None
+
+
+async def _finish_job(job: dict, values: dict):
+    values["updated_at"] = _now().isoformat()
+    await (
+        supabase_admin.table("webhook_jobs")
+        .update(values)
+        .eq("id", job["id"])
+        .eq("attempts", job["attempts"])
+        .execute()
+    )
+
+
+class WebhookWorkerPool:
+    """asyncio workers draining webhook_jobs; one pool per API process."""
+
+    def __init__(self, workers: int = WEBHOOK_WORKERS, worker_id: str | None = None):
+        self.workers = workers
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stats = {
+            "processed": 0, "retried": 0, "dead_lettered": 0, "duplicates": 0, "coalesced": 0, "rate_limited": 0,
+        }
+        self._tasks: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+    def start(self):
+        if self._tasks or self.workers <= 0:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()  # bound to the serving loop
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{self.worker_id}/{n}"), name=f"webhook-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info(f"Started {self.workers} webhook workers")
+
+    async def stop(self, timeout: float = 10):
+        """Let running jobs finish (up to timeout); unfinished ones are reclaimed after their lease."""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wake.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers now instead of at their next poll."""
+        self._wake.set()
+
+    async def _worker(self, worker_id: str):
+        while not self._stopping:
+            try:
+                job = await claim_job(worker_id)
+            except Exception as e:
+                logger.error(f"Webhook worker {worker_id} failed to claim a job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), WEBHOOK_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            await self.run_job(job)
+
+    async def run_job(self, job: dict):
+        """Process one claimed job and record success, retry or dead letter."""
+        from services import strava_service
+
+        try:
+            job, folded = await _coalesce(job)
+            self.stats["coalesced"] += folded
+        except Exception as e:
+            logger.warning(f"Could not coalesce webhook job {job['id']}, processing it alone: {e}")
+
+        # Reconciler repairs spend the backfill budget, not the live webhook share
+        job_lane = Lane.BACKFILL if job.get("source") == "reconcile" else Lane.WEBHOOK
+        try:
+            with lane(job_lane), wait_budget(WEBHOOK_JOB_TIMEOUT_SECONDS):
+                await asyncio.wait_for(
+                    strava_service.handle_webhook_event(
+                        job["object_id"],
+                        job["owner_id"],
+                        job.get("effective_aspect") or job["aspect_type"],
+                        job.get("updates"),
+                    ),
+                    WEBHOOK_JOB_TIMEOUT_SECONDS,
+                )
+        except RateLimited as e:
+            await self._defer(job, e)
+            return
+        except Exception as e:
+            error = f"timed out after {WEBHOOK_JOB_TIMEOUT_SECONDS}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            await self._fail(job, e, error)
+            return
+
+        self.stats["processed"] += 1
+        try:
+            await _finish_job(job, {"status": "done", "locked_by": None, "last_error": None})
+        except Exception as e:
+            # Handlers are idempotent upserts: at worst the job reruns after its lease
+            logger.error(f"Webhook job {job['id']} processed but not marked done: {e}")
+
+    async def _defer(self, job: dict, exc: RateLimited):
+        """Put the job back until the rate-limit window resets; the claim's attempt is given back."""
+        self.stats["rate_limited"] += 1
+        run_after = datetime.fromtimestamp(exc.resets_at, timezone.utc)
+        logger.info(f"Strava webhook job {job['id']} rate limited; requeued until {run_after.isoformat()}")
+        try:
+            await _finish_job(job, {
+                "status": "pending",
+                "attempts": job["attempts"] - 1,
+                "locked_by": None,
+                "last_error": str(exc),
+                "run_after": run_after.isoformat(),
+            })
+        except Exception as e:
+            logger.error(f"Failed to requeue rate-limited webhook job {job['id']}: {e}")
+
+    async def _fail(self, job: dict, exc: Exception, error: str):
+        attempts = job["attempts"]
+        # A coalesced job runs (and so fails as) its merged action
+        aspect = job.get("effective_aspect") or job["aspect_type"]
+        label = f"{aspect} {job['object_id']} (attempt {attempts}/{WEBHOOK_MAX_ATTEMPTS})"
+        try:
+            if is_permanent(exc) or attempts >= WEBHOOK_MAX_ATTEMPTS:
+                self.stats["dead_lettered"] += 1
+                logger.error(f"Strava webhook job dead-lettered: {label}: {error}")
+                user_id = await _owner_user_id(job)
+                if user_id:
+                    analytics_track(user_id, "strava_sync_failed", {
+                        "activity_id": job["object_id"],
+                        "aspect_type": aspect,
+                        "attempts": attempts,
+                        "error": error,
+                    })
+                await _finish_job(job, {"status": "dead", "locked_by": None, "last_error": error})
+            else:
+                self.stats["retried"] += 1
+                delay = backoff_seconds(attempts)
+                logger.warning(f"Strava webhook job failed: {label}: {error}; retrying in {delay:.0f}s")
+                await _finish_job(job, {
+                    "status": "pending",
+                    "locked_by": None,
+                    "last_error": error,
+                    "run_after": (_now() + timedelta(seconds=delay)).isoformat(),
+                })
+        except Exception as e:
+            logger.error(f"Failed to record webhook job {job['id']} failure: {e}")
+
+
+worker_pool = WebhookWorkerPool()
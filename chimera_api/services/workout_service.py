@@ -2,6 +2,7 @@ from typing import List, Optional
 from uuid import UUID
 from schemas import WorkoutCreate
 from db_client import supabase_admin
+from projections import ACTIVITY_SUMMARY
 from services import gcal_service
 from fastapi import HTTPException
 
@@ -14,13 +15,11 @@ async def create_workout(workout: WorkoutCreate, user_id: str) -> dict:
     data["start_time"] = data["start_time"].isoformat()
     data["end_time"] = data["end_time"].isoformat()
 
-    response = supabase_admin.table("planned_workouts").insert(data).execute()
+    response = await supabase_admin.table("planned_workouts").insert(data).execute()
     new_workout = response.data[0]
 
     # TRIGGER GCAL SYNC (Create)
-    # We run this in a fire-and-forget manner effectively, or you could await it if you made it async
-    # For now, synchronous call is fine given it's fast enough
-    gcal_service.sync_workout_to_calendar(new_workout, is_new=True)
+    await gcal_service.sync_workout_to_calendar(new_workout, is_new=True)
 
     return new_workout
 
@@ -34,7 +33,7 @@ async def get_workouts(
         query = query.gte("start_time", start_date).lte("start_time", end_date)
 
     # Order by start time
-    response = query.order("start_time", desc=False).execute()
+    response = await query.order("start_time", desc=False).execute()
     return response.data
 
 
@@ -43,7 +42,7 @@ async def get_workout(workout_id: UUID, user_id: str) -> dict:
     Fetches a single workout by its unique ID.
     """
     response = (
-        supabase_admin.table("planned_workouts")
+        await supabase_admin.table("planned_workouts")
         .select("*")
         .eq("id", str(workout_id))
         .eq("user_id", user_id)  # Security: Ensure it belongs to this user
@@ -67,7 +66,7 @@ async def update_workout(workout_id: UUID, updates: dict, user_id: str) -> dict:
         updates["end_time"] = updates["end_time"].isoformat()
 
     response = (
-        supabase_admin.table("planned_workouts")
+        await supabase_admin.table("planned_workouts")
         .update(updates)
         .eq("id", str(workout_id))
         .eq("user_id", user_id)
@@ -77,7 +76,7 @@ async def update_workout(workout_id: UUID, updates: dict, user_id: str) -> dict:
     if response.data:
         updated_workout = response.data[0]
         # TRIGGER GCAL SYNC (Update)
-        gcal_service.sync_workout_to_calendar(updated_workout, is_new=False)
+        await gcal_service.sync_workout_to_calendar(updated_workout, is_new=False)
         return updated_workout
 
     return response.data[0] if response.data else {}
@@ -86,7 +85,7 @@ async def update_workout(workout_id: UUID, updates: dict, user_id: str) -> dict:
 async def delete_workout(workout_id: UUID, user_id: str):
     # Fetch first to get GCal ID before we delete the record
     data = (
-        supabase_admin.table("planned_workouts")
+        await supabase_admin.table("planned_workouts")
         .select("google_event_id")
         .eq("id", str(workout_id))
         .eq("user_id", user_id)
@@ -95,18 +94,18 @@ async def delete_workout(workout_id: UUID, user_id: str):
 
     # Check if we have a google event to delete
     if data.data and data.data[0].get("google_event_id"):
-        gcal_service.delete_calendar_event(data.data[0]["google_event_id"])
+        await gcal_service.delete_calendar_event(data.data[0]["google_event_id"])
 
     # Now delete from DB
-    supabase_admin.table("planned_workouts").delete().eq(
+    await supabase_admin.table("planned_workouts").delete().eq(
         "id", str(workout_id)
     ).eq("user_id", user_id).execute()
 
 
 async def get_linked_activity(workout_id: UUID, user_id: str) -> dict:
     response = (
-        supabase_admin.table("completed_activities")
-        .select("*")
+        await supabase_admin.table("completed_activities")
+        .select(ACTIVITY_SUMMARY)
         .eq("planned_workout_id", str(workout_id))
         .execute()
     )
@@ -0,0 +1,265 @@
+"""
+Shared Strava HTTP client with rate-limit-aware scheduling.
+
+Every Strava call goes through strava_client: one long-lived pooled
+httpx.AsyncClient (no TLS handshake per call) behind a RateLimiter that mirrors
+Strava's app-wide quotas, a 15-minute window (resets at :00/:15/:30/:45 UTC)
+and a daily window (resets at midnight UTC). Each window is a bucket of `limit`
+tokens refilled at its reset; the X-ReadRateLimit-* / X-RateLimit-* headers of
+every response resync the bucket with Strava's count, which also covers calls
+made by other workers.
+
+Callers run in a priority lane (ContextVar, set with `with lane(Lane.BACKFILL)`).
+Lower lanes may only spend part of each window (STRAVA_*_BUDGET), so a big
+backfill stops short of the quota and webhooks keep flowing; when a lane is out
+of budget its calls wait for the window to reset instead of failing, and a 429
+is waited out and retried. A caller with a deadline sets `with wait_budget(s)`:
+a wait longer than its remaining budget raises RateLimited (carrying the reset
+time) instead, so the caller can reschedule rather than time out.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+STRAVA_AUTH_URL = "https://www.strava.com/oauth/token"
+STRAVA_API_URL = "https://www.strava.com/api/v3"
+
+POOL_MAX_CONNECTIONS = int(os.getenv("STRAVA_POOL_MAX_CONNECTIONS", "10"))
+REQUEST_TIMEOUT = float(os.getenv("STRAVA_TIMEOUT_SECONDS", "15"))
+RATE_LIMIT_15MIN = int(os.getenv("STRAVA_RATE_LIMIT_15MIN", "100"))
+RATE_LIMIT_DAILY = int(os.getenv("STRAVA_RATE_LIMIT_DAILY", "1000"))
+MAX_429_RETRIES = 2
+
+
+class Lane(IntEnum):
+    """Priority lanes, highest first."""
+    WEBHOOK = 0
+    INTERACTIVE = 1
+    BACKFILL = 2
+
+
+# Share of each window a lane may use before it queues
+LANE_BUDGET = {
+    Lane.WEBHOOK: 1.0,
+    Lane.INTERACTIVE: float(os.getenv("STRAVA_INTERACTIVE_BUDGET", "0.85")),
+    Lane.BACKFILL: float(os.getenv("STRAVA_BACKFILL_BUDGET", "0.6")),
+}
+
+_current_lane: ContextVar[Lane] = ContextVar("strava_lane", default=Lane.INTERACTIVE)
+# time.monotonic() deadline by which the caller's Strava calls must be granted
+_wait_deadline: ContextVar[float | None] = ContextVar("strava_wait_deadline", default=None)
+
+
+class RateLimited(Exception):
+    """The lane is out of budget until resets_at (epoch seconds), past the caller's wait budget."""
+
+    def __init__(self, resets_at: float):
+        super().__init__(f"Strava rate limit reached; window resets at {resets_at:.0f}")
+        self.resets_at = resets_at
+
+
+@contextmanager
+def lane(priority: Lane):
+    """Run the Strava calls made inside the block in the given lane."""
+    token = _current_lane.set(priority)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+@contextmanager
+def wait_budget(seconds: float):
+    """Raise RateLimited instead of waiting past `seconds` from now for a window reset."""
+    token = _wait_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _wait_deadline.reset(token)
+
+
+class _Window:
+    def __init__(self, name: str, seconds: int, limit: int):
+        self.name = name
+        self.seconds = seconds
+        self.limit = limit
+        self.used = 0
+        self.start = 0.0
+
+    def roll(self, now: float):
+        start = now - now % self.seconds
+        if start != self.start:
+            self.start = start
+            self.used = 0
+
+    @property
+    def resets_at(self) -> float:
+        return self.start + self.seconds
+
+
+def _parse_pair(value: str | None) -> tuple[int, int] | None:
+    try:
+        short, daily = (int(v) for v in value.split(","))
+        return short, daily
+    except (AttributeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token buckets for Strava's 15-minute and daily windows, with priority lanes."""
+
+    def __init__(self, limit_15min: int = RATE_LIMIT_15MIN, limit_daily: int = RATE_LIMIT_DAILY, clock=time.time):
+        self.clock = clock
+        self.windows = [_Window("15min", 900, limit_15min), _Window("daily", 86400, limit_daily)]
+        self.granted = Counter()
+        self.queued = Counter()
+        self.throttled = 0
+        self.deferred = Counter()
+        self._waiting = Counter()
+        self._changed: asyncio.Event | None = None
+
+    def _blocked_until(self, priority: Lane, now: float) -> float | None:
+        """Reset time of the first window this lane has no budget left in, else None."""
+        for window in self.windows:
+            window.roll(now)
+            if window.used >= window.limit * LANE_BUDGET[priority]:
+                return window.resets_at
+        return None
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def acquire(self, priority: Lane):
+        """Take one request token, waiting behind higher lanes and for window resets."""
+        self._waiting[priority] += 1
+        try:
+            counted = False
+            while True:
+                now = self.clock()
+                until = self._blocked_until(priority, now)
+                ahead = any(self._waiting[p] for p in Lane if p < priority)
+                if until is None and not ahead:
+                    for window in self.windows:
+                        window.used += 1
+                    self.granted[priority.name.lower()] += 1
+                    return
+                deadline = _wait_deadline.get()
+                if until is not None and deadline is not None and until - now + 1 > deadline - time.monotonic():
+                    self.deferred[priority.name.lower()] += 1
+                    raise RateLimited(until + 1)
+                if not counted:
+                    self.queued[priority.name.lower()] += 1
+                    counted = True
+                    if until is not None:
+                        logger.info(
+                            f"Strava {priority.name.lower()} lane out of budget; "
+                            f"waiting {until - now:.0f}s for the window to reset"
+                        )
+                if self._changed is None:
+                    self._changed = asyncio.Event()
+                # asyncio.wait, not wait_for: wait_for can swallow a cancel that
+                # races with the event being set
+                waiter = asyncio.ensure_future(self._changed.wait())
+                try:
+                    # +1s: give Strava's own counter time to roll over too
+                    await asyncio.wait({waiter}, timeout=(until - now + 1) if until else None)
+                finally:
+                    waiter.cancel()
+        finally:
+            self._waiting[priority] -= 1
+            self._notify()
+
+    def update_from_headers(self, headers: httpx.Headers):
+        """Resync usage (and limits) with Strava's counters from a response."""
+        limits = _parse_pair(headers.get("x-readratelimit-limit")) or _parse_pair(headers.get("x-ratelimit-limit"))
+        usage = _parse_pair(headers.get("x-readratelimit-usage")) or _parse_pair(headers.get("x-ratelimit-usage"))
+        if not usage:
+            return
+        now = self.clock()
+        for i, window in enumerate(self.windows):
+            window.roll(now)
+            if limits:
+                window.limit = limits[i]
+            # Local count includes our in-flight calls Strava has not seen yet
+            window.used = max(window.used, usage[i])
+        self._notify()
+
+    def exhaust(self):
+        """A 429 means the short window is spent whatever our count says."""
+        self.throttled += 1
+        window = self.windows[0]
+        window.roll(self.clock())
+        window.used = max(window.used, window.limit)
+
+    def stats(self) -> dict:
+        now = self.clock()
+        for window in self.windows:
+            window.roll(now)
+        return {
+            "windows": {
+                w.name: {"limit": w.limit, "used": w.used, "resets_in_s": round(w.resets_at - now)}
+                for w in self.windows
+            },
+            "lane_budget": {p.name.lower(): b for p, b in LANE_BUDGET.items()},
+            "granted": dict(self.granted),
+            "queued": dict(self.queued),
+            "deferred": dict(self.deferred),
+            "waiting": {p.name.lower(): n for p, n in self._waiting.items() if n},
+            "throttled": self.throttled,
+        }
+
+
+class StravaClient:
+    """Pooled httpx client for Strava; every request is scheduled by the RateLimiter."""
+
+    def __init__(self, limiter: RateLimiter | None = None):
+        self.limiter = limiter or RateLimiter()
+        self._client: httpx.AsyncClient | None = None
+
+    def _session(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=POOL_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        priority = _current_lane.get()
+        for attempt in range(MAX_429_RETRIES + 1):
+            await self.limiter.acquire(priority)
+            response = await self._session().request(method, url, **kwargs)
+            self.limiter.update_from_headers(response.headers)
+            if response.status_code != 429 or attempt == MAX_429_RETRIES:
+                return response
+            logger.warning(f"Strava 429 on {method} {url}; queueing until the window resets")
+            self.limiter.exhaust()
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+strava_client = StravaClient()
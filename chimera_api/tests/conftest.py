@@ -1,10 +1,14 @@
 """
 Pytest fixtures for Chimera API tests
 """
+import os
 import pytest
 from unittest.mock import MagicMock, AsyncMock
 from uuid import uuid4
 
+# dependencies.py refuses to import without a signing secret
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
 
 @pytest.fixture
 def test_user_id():
@@ -16,7 +20,7 @@ def test_user_id():
 def mock_supabase_client():
     """
     Returns a mock Supabase client with chained method support.
-    Usage in tests: mock_supabase_client.table().insert().execute()
+    Usage in tests: await mock_supabase_client.table().insert().execute()
     """
     mock = MagicMock()
 
@@ -31,9 +35,12 @@ def mock_supabase_client():
     mock.lte.return_value = mock
     mock.order.return_value = mock
     mock.single.return_value = mock
+    mock.limit.return_value = mock
+    mock.in_.return_value = mock
+    mock.upsert.return_value = mock
 
-    # Configure execute() to return a response-like object
-    mock.execute.return_value = MagicMock(data=[])
+    # Configure execute() to be awaitable and return a response-like object
+    mock.execute = AsyncMock(return_value=MagicMock(data=[]))
 
     return mock
 
@@ -0,0 +1,571 @@
+"""
+In-memory fake of the PostgREST client behind db_client.supabase_admin.
+
+Implements the query-builder surface the services use
+(select/insert/update/upsert/delete, eq/neq/gt/gte/lt/lte/in_/is_/like/ilike,
+not_, order/limit/range, single/maybe_single) over plain dicts, plus the
+migrations' RPC functions (RPC_FUNCTIONS, Python mirrors of the SQL), so services can
+be exercised and benchmarked offline with real filtering, ordering and upsert
+on_conflict semantics.
+
+Table schemas (columns, defaults, primary keys) are read from migrations/*.sql.
+Tables created outside the migrations (users, user_settings, completed_activities,
+planned_workouts, chat_logs) are described in BASE_TABLES and accept any column.
+
+Usage:
+    fake = FakeSupabase()
+    fake.seed("user_settings", [{"user_id": uid, "timezone": "UTC"}])
+    with install_fake(fake):
+        await dashboard_service.get_dashboard(uid)
+"""
+import re
+import json
+import sys
+import copy
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime, date, timezone
+from pathlib import Path
+
+from postgrest.exceptions import APIError
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+# Tables that predate the migrations folder: primary key and unique keys only
+BASE_TABLES = {
+    "users": {"primary_key": ("id",), "unique": [("email",)]},
+    "user_settings": {"primary_key": ("user_id",), "unique": []},
+    "completed_activities": {
+        "primary_key": ("id",),
+        "unique": [("user_id", "source_type", "source_id")],
+    },
+    "planned_workouts": {"primary_key": ("id",), "unique": []},
+    "chat_logs": {"primary_key": ("id",), "unique": []},
+}
+
+
+class TableSchema:
+    def __init__(self, name: str, strict: bool = False):
+        self.name = name
+        self.columns: dict[str, str] = {}  # column -> raw DEFAULT expression ("" when none)
+        self.types: dict[str, str] = {}
+        self.primary_key: tuple = ("id",)
+        self.unique: list[tuple] = []
+        self.strict = strict  # fully described by a CREATE TABLE: reject unknown columns
+
+    def default_row(self) -> dict:
+        row = {}
+        for column, expr in self.columns.items():
+            value = _eval_default(expr, self.types.get(column, ""))
+            if value is not None:
+                row[column] = value
+        return row
+
+
+# --- Migration parsing ---
+
+
+def _split_top_level(body: str) -> list[str]:
+    parts, depth, current = [], 0, []
+    for ch in body:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def _parse_column(schema: TableSchema, definition: str):
+    tokens = definition.split()
+    if not tokens:
+        return
+    column = tokens[0].strip('"')
+    default = re.search(r"\bDEFAULT\s+('(?:[^']*)'|[\w.]+(?:\(\))?)", definition, re.I)
+    schema.columns[column] = default.group(1) if default else ""
+    schema.types[column] = tokens[1].upper() if len(tokens) > 1 else ""
+    if re.search(r"\bPRIMARY\s+KEY\b", definition, re.I):
+        schema.primary_key = (column,)
+    elif re.search(r"\bUNIQUE\b", definition, re.I):
+        schema.unique.append((column,))
+
+
+def _eval_default(expr: str, col_type: str):
+    if not expr:
+        return None
+    lowered = expr.lower()
+    if lowered == "gen_random_uuid()":
+        return str(uuid.uuid4())
+    if lowered == "now()":
+        return datetime.now(timezone.utc).isoformat()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if expr.startswith("'"):
+        literal = expr[1:-1]
+        if literal == "{}":
+            return [] if col_type.endswith("[]") else {}
+        if col_type == "JSONB":
+            return json.loads(literal)
+        return literal
+    try:
+        return int(expr)
+    except ValueError:
+        try:
+            return float(expr)
+        except ValueError:
+            return None
+
+
+def load_schema(migrations_dir: Path = MIGRATIONS_DIR) -> dict[str, TableSchema]:
+    """Build table schemas from CREATE TABLE / ALTER TABLE ADD COLUMN statements."""
+    schemas: dict[str, TableSchema] = {}
+    for name, spec in BASE_TABLES.items():
+        schema = schemas[name] = TableSchema(name)
+        schema.primary_key = spec["primary_key"]
+        schema.unique = list(spec["unique"])
+
+    for path in sorted(migrations_dir.glob("*.sql")):
+        sql = re.sub(r"--[^\n]*", "", path.read_text())
+        for match in re.finditer(
+            r"CREATE TABLE(?: IF NOT EXISTS)?\s+(\w+)\s*\((.*?)\);", sql, re.I | re.S
+        ):
+            schema = schemas[match.group(1)] = TableSchema(match.group(1), strict=True)
+            for definition in _split_top_level(match.group(2)):
+                constraint = re.match(r"(PRIMARY KEY|UNIQUE)\s*\(([^)]*)\)", definition, re.I)
+                if constraint:
+                    cols = tuple(c.strip() for c in constraint.group(2).split(","))
+                    if constraint.group(1).upper() == "UNIQUE":
+                        schema.unique.append(cols)
+                    else:
+                        schema.primary_key = cols
+                elif not re.match(r"(CONSTRAINT|CHECK|FOREIGN KEY)\b", definition, re.I):
+                    _parse_column(schema, definition)
+
+        for match in re.finditer(r"ALTER TABLE\s+(\w+)\s+(ADD COLUMN.*?);", sql, re.I | re.S):
+            schema = schemas.setdefault(match.group(1), TableSchema(match.group(1)))
+            for clause in _split_top_level(match.group(2)):
+                definition = re.sub(r"^ADD COLUMN(?: IF NOT EXISTS)?\s+", "", clause, flags=re.I)
+                _parse_column(schema, definition)
+    return schemas
+
+
+# --- Value comparison ---
+
+
+@lru_cache(maxsize=65536)
+def _parse_timestamp(value: str):
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        if len(value) >= 10 and value[4] == "-" and value[7] == "-":
+            return _parse_timestamp(value)
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+    return None
+
+
+def _coerce(a, b):
+    """Bring a stored value and a filter value to comparable types, like Postgres would."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return str(a).lower(), str(b).lower()
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a, b
+    try:
+        return float(a), float(b)
+    except (TypeError, ValueError):
+        pass
+    da, db = _as_datetime(a), _as_datetime(b)
+    if da is not None and db is not None:
+        return da, db
+    return str(a), str(b)
+
+
+def _compare(value, op: str, operand) -> bool:
+    if op == "is":
+        if operand in (None, "null"):
+            return value is None
+        return str(value).lower() == str(operand).lower()
+    if op == "in":
+        return value is not None and any(_compare(value, "eq", o) for o in operand)
+    if value is None:
+        return False
+    if op in ("like", "ilike"):
+        pattern = "^" + re.escape(str(operand)).replace("%", ".*").replace("\\*", ".*") + "$"
+        return re.match(pattern, str(value), re.I if op == "ilike" else 0) is not None
+    if op == "contains":
+        return all(item in value for item in operand)
+    if op == "eq" and type(value) is type(operand) and isinstance(value, str):
+        # Fast path: only timestamps spelled differently compare equal as non-identical strings
+        if value == operand:
+            return True
+        if value[:4] != operand[:4]:
+            return False
+    a, b = _coerce(value, operand)
+    return {
+        "eq": a == b,
+        "neq": a != b,
+        "gt": a > b,
+        "gte": a >= b,
+        "lt": a < b,
+        "lte": a <= b,
+    }[op]
+
+
+def _sort_key(value):
+    if value is None:
+        return (1, 0)
+    dt = _as_datetime(value)
+    if dt is not None:
+        return (0, dt.timestamp())
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    return (0, str(value))
+
+
+def _key_value(row: dict, key: tuple):
+    """Normalized key tuple, or None when any key column is NULL (NULLs never conflict)."""
+    values = tuple(row.get(c) for c in key)
+    if any(v is None for v in values):
+        return None
+    return tuple(str(v) for v in values)
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+# --- Query builder ---
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str):
+        self._db = db
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._on_conflict = ""
+        self._ignore_duplicates = False
+        self._filters: list[tuple[str, str, object, bool]] = []
+        self._orders: list[tuple[str, bool]] = []
+        self._limit = None
+        self._offset = 0
+        self._single = None  # "single" | "maybe"
+        self._negate = False
+
+    # Operations
+    def select(self, columns: str = "*", count=None, **_):
+        self._columns = columns
+        self._count = count
+        return self
+
+    def insert(self, rows, count=None, upsert=False, **_):
+        self._operation = "upsert" if upsert else "insert"
+        self._payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = "", ignore_duplicates: bool = False, **_):
+        self._operation = "upsert"
+        self._payload = rows
+        self._on_conflict = on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: dict, **_):
+        self._operation = "update"
+        self._payload = values
+        return self
+
+    def delete(self, **_):
+        self._operation = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column: str, op: str, value):
+        self._db._check_column(self._table, column)
+        self._filters.append((column, op, value, self._negate))
+        self._negate = False
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", value)
+
+    def like(self, column, pattern):
+        return self._filter(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self._filter(column, "ilike", pattern)
+
+    def contains(self, column, values):
+        return self._filter(column, "contains", values)
+
+    # Modifiers
+    def order(self, column: str, desc: bool = False, **_):
+        self._orders.append((column, desc))
+        return self
+
+    def limit(self, size: int, **_):
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **_):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self._single = "single"
+        return self
+
+    def maybe_single(self):
+        self._single = "maybe"
+        return self
+
+    # Execution
+    def _matches(self, row: dict, filters: list) -> bool:
+        for column, op, value, negate in filters:
+            stored = row.get(column)
+            # NULL compares as unknown, so even a negated comparison excludes it
+            if stored is None and op != "is":
+                return False
+            if _compare(stored, op, value) == negate:
+                return False
+        return True
+
+    def _project(self, row: dict) -> dict:
+        if self._columns.strip() == "*":
+            return copy.deepcopy(row)
+        columns = [c.strip() for c in self._columns.split(",") if c.strip()]
+        return {c: copy.deepcopy(row.get(c)) for c in columns}
+
+    async def execute(self) -> FakeResponse:
+        self._db.query_count += 1
+        rows = self._db.tables.setdefault(self._table, [])
+        # Cheap equality filters first so range parsing only runs on candidate rows
+        filters = sorted(self._filters, key=lambda f: f[1] not in ("eq", "is", "in"))
+
+        if self._operation == "select":
+            if self._columns.strip() != "*":
+                for column in self._columns.split(","):
+                    self._db._check_column(self._table, column.strip())
+            result = [r for r in rows if self._matches(r, filters)]
+            for column, desc in reversed(self._orders):
+                result.sort(key=lambda r: _sort_key(r.get(column)), reverse=desc)
+            total = len(result)
+            end = None if self._limit is None else self._offset + self._limit
+            result = [self._project(r) for r in result[self._offset:end]]
+        elif self._operation in ("insert", "upsert"):
+            result = self._db._write(
+                self._table,
+                self._payload,
+                upsert=self._operation == "upsert",
+                on_conflict=self._on_conflict,
+                ignore_duplicates=self._ignore_duplicates,
+            )
+            total = len(result)
+        elif self._operation == "update":
+            for column in self._payload:
+                self._db._check_column(self._table, column)
+            result = []
+            for row in rows:
+                if self._matches(row, filters):
+                    row.update(copy.deepcopy(self._payload))
+                    result.append(copy.deepcopy(row))
+            total = len(result)
+        else:  # delete
+            kept, result = [], []
+            for row in rows:
+                (result if self._matches(row, filters) else kept).append(row)
+            self._db.tables[self._table] = kept
+            total = len(result)
+
+        if self._single is not None:
+            if len(result) == 1:
+                return FakeResponse(result[0], total if self._count else None)
+            if self._single == "maybe" and not result:
+                return None
+            raise APIError({
+                "message": "JSON object requested, multiple (or no) rows returned",
+                "code": "PGRST116",
+                "details": f"The result contains {len(result)} rows",
+                "hint": None,
+            })
+        return FakeResponse(result, total if self._count else None)
+
+
+def _set_activity_plan_links(db: "FakeSupabase", links: list[dict]) -> int:
+    """migrations/015_activity_plan_links_rpc.sql"""
+    targets = {str(link["id"]): link["planned_workout_id"] for link in links}
+    updated = 0
+    for row in db.tables.setdefault("completed_activities", []):
+        if str(row.get("id")) in targets:
+            row["planned_workout_id"] = targets[str(row["id"])]
+            updated += 1
+    return updated
+
+
+RPC_FUNCTIONS = {"set_activity_plan_links": _set_activity_plan_links}
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", fn: str, params: dict):
+        self._db = db
+        self._fn = fn
+        self._params = params
+
+    async def execute(self) -> FakeResponse:
+        self._db.query_count += 1
+        if self._fn not in RPC_FUNCTIONS:
+            raise APIError({
+                "message": f"Could not find the function public.{self._fn}",
+                "code": "PGRST202",
+                "details": None,
+                "hint": None,
+            })
+        return FakeResponse(RPC_FUNCTIONS[self._fn](self._db, **copy.deepcopy(self._params)))
+
+
+class FakeSupabase:
+    """Drop-in for db_client.supabase_admin backed by in-memory tables."""
+
+    def __init__(self, migrations_dir: Path = MIGRATIONS_DIR):
+        self.schemas = load_schema(migrations_dir)
+        self.tables: dict[str, list[dict]] = {}
+        self.query_count = 0
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: dict | None = None) -> FakeRpc:
+        return FakeRpc(self, fn, params or {})
+
+    async def aclose(self):
+        pass
+
+    def seed(self, table: str, rows: list[dict]) -> list[dict]:
+        """Insert rows directly (defaults applied, constraints enforced)."""
+        return self._write(table, rows, upsert=False)
+
+    def _schema(self, table: str) -> TableSchema:
+        if table not in self.schemas:
+            self.schemas[table] = TableSchema(table)
+        return self.schemas[table]
+
+    def _check_column(self, table: str, column: str):
+        schema = self._schema(table)
+        if schema.strict and column not in schema.columns:
+            raise APIError({
+                "message": f"column {table}.{column} does not exist",
+                "code": "42703",
+                "details": None,
+                "hint": None,
+            })
+
+    def _write(self, table, payload, upsert, on_conflict="", ignore_duplicates=False) -> list[dict]:
+        schema = self._schema(table)
+        rows = self.tables.setdefault(table, [])
+        incoming = payload if isinstance(payload, list) else [payload]
+        conflict_keys = (
+            tuple(c.strip() for c in on_conflict.split(",")) if on_conflict else schema.primary_key
+        )
+        constraints = [schema.primary_key, *schema.unique]
+        keys = constraints if conflict_keys in constraints else [*constraints, conflict_keys]
+        # One pass to index existing rows by every key, instead of a scan per incoming row
+        index = {key: {_key_value(r, key): r for r in rows if _key_value(r, key)} for key in keys}
+        written = []
+        for values in incoming:
+            for column in values:
+                self._check_column(table, column)
+            existing = None
+            if upsert:
+                existing = index[conflict_keys].get(_key_value(values, conflict_keys))
+            if existing is not None:
+                if not ignore_duplicates:
+                    existing.update(copy.deepcopy(values))
+                    written.append(copy.deepcopy(existing))
+                continue
+
+            row = schema.default_row()
+            row.update(copy.deepcopy(values))
+            if "id" in schema.primary_key and row.get("id") is None:
+                row["id"] = str(uuid.uuid4())
+            for key in constraints:
+                if _key_value(row, key) in index[key]:
+                    raise APIError({
+                        "message": f"duplicate key value violates unique constraint on {table}({', '.join(key)})",
+                        "code": "23505",
+                        "details": None,
+                        "hint": None,
+                    })
+            rows.append(row)
+            for key in keys:
+                value = _key_value(row, key)
+                if value:
+                    index[key][value] = row
+            written.append(copy.deepcopy(row))
+        return written
+
+
+@contextmanager
+def install_fake(fake: FakeSupabase):
+    """Point every loaded module's supabase_admin at the fake for the duration of the block."""
+    patched = []
+    for module in list(sys.modules.values()):
+        if module is None or not hasattr(module, "supabase_admin"):
+            continue
+        if getattr(module, "__name__", "").startswith(("tests.fake_supabase", "unittest")):
+            continue
+        patched.append((module, module.supabase_admin))
+        module.supabase_admin = fake
+    try:
+        yield fake
+    finally:
+        for module, original in patched:
+            module.supabase_admin = original
@@ -0,0 +1,77 @@
+"""
+Unit tests for the raw Strava payload cold store (services/activity_payload_service.py)
+
+These tests verify:
+1. Payloads are content-addressed: identical payloads are stored once, compressed
+2. Reads are lazy and cached per hash
+3. Legacy activity_data_blob rows migrate in batches and stay readable
+"""
+import json
+
+import pytest
+
+from services import activity_payload_service as payloads
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+
+
+def _payload(i: int) -> dict:
+    return {
+        "id": 9000 + i,
+        "name": f"Run {i}",
+        "type": "Run",
+        "map": {"summary_polyline": "a~l~Fjk~uOwHJy@P" * 50},
+        "splits_metric": [{"split": s, "distance": 1000.0, "moving_time": 300 + s} for s in range(20)],
+    }
+
+
+@pytest.fixture
+def fake():
+    payloads._cache.clear()
+    with install_fake(FakeSupabase()) as fake:
+        yield fake
+
+
+@pytest.mark.asyncio
+async def test_identical_payloads_are_stored_once(fake):
+    first = await payloads.put(_payload(1))
+    # Key order doesn't change the address
+    second = await payloads.put(dict(reversed(list(_payload(1).items()))))
+
+    assert first == second == payloads.payload_hash(_payload(1))
+    [row] = fake.tables["activity_payloads"]
+    assert row["stored_bytes"] < row["raw_bytes"] / 3
+
+
+@pytest.mark.asyncio
+async def test_reads_are_lazy_and_cached(fake):
+    keys = await payloads.put_many([_payload(1), _payload(2)])
+    payloads._cache.clear()
+
+    before = fake.query_count
+    found = await payloads.get_many(keys)
+    assert [found[k]["name"] for k in keys] == ["Run 1", "Run 2"]
+    assert fake.query_count == before + 1
+
+    assert await payloads.get(keys[0]) == _payload(1)
+    assert fake.query_count == before + 1
+
+
+@pytest.mark.asyncio
+async def test_legacy_blobs_migrate_in_batches(fake):
+    fake.seed("completed_activities", [
+        {"id": f"act-{i}", "user_id": USER_ID, "source_type": "strava", "source_id": str(9000 + i),
+         # Older rows hold the blob as a JSON string
+         "activity_data_blob": json.dumps(_payload(i)) if i % 2 else _payload(i)}
+        for i in range(5)
+    ])
+
+    assert await payloads.migrate_all(batch_size=2, max_batches=1) == 2
+    assert await payloads.migrate_all(batch_size=2) == 3
+    assert await payloads.migrate_batch() == 0
+
+    rows = fake.tables["completed_activities"]
+    assert all(r["activity_data_blob"] is None for r in rows)
+    payloads._cache.clear()
+    assert [(await payloads.load_raw(r))["name"] for r in rows] == [f"Run {i}" for i in range(5)]
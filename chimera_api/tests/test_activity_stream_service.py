@@ -0,0 +1,96 @@
+"""
+Unit tests for activity streams (services/activity_stream_service.py)
+
+These tests verify:
+1. The columnar encoding round-trips at channel resolution and is a small
+   fraction of the Strava JSON
+2. LTTB keeps the endpoints and extremes while cutting to the requested size
+3. The first chart request fetches and stores streams; later ones read storage
+"""
+import json
+import math
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from services import activity_stream_service as streams
+from services import strava_service
+from strava_client import StravaClient, RateLimiter
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+ACTIVITY_ID = "0b6f0c52-5a2d-4b7e-9a52-111111111111"
+
+
+def _strava_streams(n: int = 3600) -> dict:
+    return {
+        "time": {"data": list(range(n))},
+        "distance": {"data": [round(i * 2.87, 1) for i in range(n)]},
+        "latlng": {"data": [[52.52 + i * 1e-5, 13.405 + i * 2e-5] for i in range(n)]},
+        "altitude": {"data": [round(34 + 8 * math.sin(i / 300), 1) for i in range(n)]},
+        "velocity_smooth": {"data": [round(2.87 + 0.2 * math.sin(i / 40), 3) for i in range(n)]},
+        "heartrate": {"data": [140 + (i // 120) % 15 for i in range(n)]},
+        "moving": {"data": [True] * n},
+    }
+
+
+def test_encoding_round_trips_compactly():
+    raw = _strava_streams()
+    blob = streams.encode_streams(raw)
+    decoded = streams.decode_streams(blob)
+
+    assert decoded["time"] == raw["time"]["data"]
+    assert decoded["heartrate"] == raw["heartrate"]["data"]
+    assert decoded["distance"] == pytest.approx(raw["distance"]["data"], abs=0.05)
+    assert decoded["velocity_smooth"] == pytest.approx(raw["velocity_smooth"]["data"], abs=5e-4)
+    assert decoded["lat"][10] == pytest.approx(raw["latlng"]["data"][10][0], abs=1e-6)
+    assert len(blob) < len(json.dumps(raw)) / 10
+
+    assert set(streams.decode_streams(blob, ["heartrate"])) == {"heartrate"}
+
+
+def test_lttb_keeps_shape():
+    xs = list(range(10_000))
+    ys = [0.0] * 10_000
+    ys[4321] = 200.0  # a single spike that stride sampling would miss
+
+    points = streams.lttb(xs, ys, 100)
+
+    assert len(points) == 100
+    assert points[0] == [0, 0.0] and points[-1] == [9999, 0.0]
+    assert [4321, 200.0] in points
+    assert streams.lttb(xs[:50], ys[:50], 100) == [[x, y] for x, y in zip(xs[:50], ys[:50])]
+
+
+@pytest.mark.asyncio
+async def test_chart_fetches_once_then_reads_storage():
+    fake = FakeSupabase()
+    fake.seed("completed_activities", [
+        {"id": ACTIVITY_ID, "user_id": USER_ID, "source_type": "strava", "source_id": "4242"},
+    ])
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=_strava_streams())
+
+    client = StravaClient(RateLimiter(limit_15min=10**6, limit_daily=10**7))
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with install_fake(fake), \
+         patch.object(streams, "strava_client", client), \
+         patch.object(strava_service, "_get_access_token", AsyncMock(return_value="token")):
+        first = await streams.chart(USER_ID, ACTIVITY_ID, points=200, channels=["heartrate"])
+        second = await streams.chart(USER_ID, ACTIVITY_ID, points=50)
+        assert await streams.chart("someone-else", ACTIVITY_ID) is None
+
+    assert len(calls) == 1
+    assert calls[0].url.path.endswith("/activities/4242/streams")
+    assert list(first["series"]) == ["heartrate"]
+    assert len(first["series"]["heartrate"]) == 200
+    assert len(second["series"]["altitude"]) == 50
+
+    [row] = fake.tables["activity_streams"]
+    assert row["sample_count"] == 3600
+    assert row["stored_bytes"] < row["raw_bytes"] / 10
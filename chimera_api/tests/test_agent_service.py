@@ -0,0 +1,115 @@
+"""
+Unit tests for the coach agent loop (services/agent_service.py)
+
+These tests verify:
+1. Model output is streamed as token events before the run finishes
+2. Tool calls are announced, executed and fed back to the model
+3. run_agent() still returns the whole reply, and the exchange is logged
+"""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+import ai_tools
+from services import agent_service
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+
+
+def _text(text):
+    return SimpleNamespace(text=text, function_call=None)
+
+
+def _call(name, **args):
+    return SimpleNamespace(text="", function_call=SimpleNamespace(name=name, args=args))
+
+
+def _candidates(parts):
+    return [SimpleNamespace(content=SimpleNamespace(parts=parts))]
+
+
+class FakeStream:
+    """Streamed response: yields one chunk per part, then exposes the joined candidate."""
+
+    def __init__(self, *parts):
+        self.parts = list(parts)
+        self.candidates = _candidates(self.parts)
+
+    async def __aiter__(self):
+        for part in self.parts:
+            yield SimpleNamespace(candidates=_candidates([part]))
+
+
+class FakeChat:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    async def send_message_async(self, content, stream=False):
+        assert stream
+        self.sent.append(content)
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def agent():
+    fake = FakeSupabase()
+    tool = AsyncMock(return_value={"status": "success"})
+    chats = []
+
+    def script(*responses):
+        chats.append(FakeChat(responses))
+        return chats[-1]
+
+    model = SimpleNamespace(start_chat=lambda history: chats[-1])
+    with install_fake(fake), \
+         patch.object(agent_service, "_get_model", return_value=model), \
+         patch.object(agent_service, "build_agent_context", AsyncMock(return_value={})), \
+         patch.object(agent_service, "format_context_for_prompt", return_value=""), \
+         patch.object(ai_tools, "execute_tool_call", tool):
+        yield fake, tool, script
+
+
+@pytest.mark.asyncio
+async def test_streams_tokens_and_tool_progress(agent):
+    fake, tool, script = agent
+    chat = script(
+        FakeStream(_call("get_schedule", days=7)),
+        FakeStream(_text("You have "), _text("two runs.")),
+    )
+
+    events = [e async for e in agent_service.stream_agent(USER_ID, "What's on?")]
+
+    assert [e["type"] for e in events] == ["tool_call", "tool_result", "token", "token", "done"]
+    assert [e["text"] for e in events if e["type"] == "token"] == ["You have ", "two runs."]
+    tool.assert_awaited_once_with("get_schedule", {"days": 7}, USER_ID)
+    assert chat.sent[1][0]["function_response"]["name"] == "get_schedule"
+    assert events[-1]["tools_used"] == ["get_schedule"]
+    assert events[-1]["iterations"] == 2
+
+
+@pytest.mark.asyncio
+async def test_run_agent_returns_whole_reply(agent):
+    fake, tool, script = agent
+    script(FakeStream(_text("Rest today.")))
+
+    result = await agent_service.run_agent(USER_ID, "Should I run?")
+
+    assert result == {"reply": "Rest today.", "tools_used": [], "iterations": 1}
+    [log] = fake.tables["chat_logs"]
+    assert log["user_message"] == "Should I run?" and log["ai_response"] == "Rest today."
+
+
+@pytest.mark.asyncio
+async def test_failed_tool_is_reported_and_fed_back(agent):
+    fake, tool, script = agent
+    tool.side_effect = ValueError("bad date")
+    chat = script(FakeStream(_call("create_workout")), FakeStream(_text("Sorry.")))
+
+    events = [e async for e in agent_service.stream_agent(USER_ID, "Add a run")]
+
+    assert {"type": "tool_result", "name": "create_workout", "status": "error"} in events
+    assert chat.sent[1][0]["function_response"]["response"]["result"]["status"] == "error"
+    assert events[-1]["tools_used"] == []
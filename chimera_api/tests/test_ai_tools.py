@@ -0,0 +1,103 @@
+"""
+Unit tests for batched agent tool execution (ai_tools.execute_tool_calls)
+
+These tests verify:
+1. Read-only tools of one turn run concurrently
+2. Mutations run in call order, and one that targets a day an earlier call
+   changed is skipped with an error for the model
+3. A read that exceeds its timeout fails alone, without stalling the turn;
+   mutations are never cancelled part-way
+4. A failed mutation does not block later calls on the same day
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+import ai_tools
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+
+
+@pytest.mark.asyncio
+async def test_reads_run_concurrently():
+    running, peak = 0, 0
+
+    async def tool(name, args, user_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"status": "success", "tool": name}
+
+    calls = [("get_upcoming_workouts", {}), ("get_daily_logs", {"start_date": "2026-03-01"}),
+             ("get_training_summary", {})]
+    with patch.object(ai_tools, "execute_tool_call", tool):
+        results = await ai_tools.execute_tool_calls(calls, USER_ID)
+
+    assert peak == 3
+    assert [r["tool"] for r, ok in results] == [name for name, _ in calls]
+
+
+@pytest.mark.asyncio
+async def test_mutations_are_ordered_and_conflicts_skipped():
+    ran = []
+
+    async def tool(name, args, user_id):
+        ran.append(name)
+        return {"status": "success"}
+
+    calls = [
+        ("move_workout_to_date", {"target_date_iso": "2026-03-02", "new_date_iso": "2026-03-04"}),
+        ("get_upcoming_workouts", {}),
+        ("create_workout", {"title": "Lift", "activity_type": "strength",
+                            "start_time_iso": "2026-03-05T18:00:00"}),
+        ("delete_workout", {"target_date_iso": "2026-03-04"}),
+        ("update_training_phase", {"phase_id": "p1", "title": "Build"}),
+    ]
+    with patch.object(ai_tools, "execute_tool_call", tool):
+        results = await ai_tools.execute_tool_calls(calls, USER_ID)
+
+    assert ran == ["get_upcoming_workouts", "move_workout_to_date", "create_workout",
+                   "update_training_phase"]
+    assert [ok for _, ok in results] == [True, True, True, False, True]
+    assert "move_workout_to_date" in results[3][0]["message"]
+
+
+@pytest.mark.asyncio
+async def test_slow_read_times_out_alone():
+    async def tool(name, args, user_id):
+        if name in ("get_training_summary", "clear_week"):
+            await asyncio.sleep(0.1)
+        return {"status": "success"}
+
+    calls = [("get_training_summary", {}), ("get_upcoming_workouts", {}), ("clear_week", {"week_start": "2026-03-02"})]
+    with patch.object(ai_tools, "execute_tool_call", tool), \
+         patch.object(ai_tools, "READ_TOOL_TIMEOUT_SECONDS", 0.05):
+        results = await ai_tools.execute_tool_calls(calls, USER_ID)
+
+    assert results[0] == ({"status": "error", "message": "get_training_summary timed out after 0.05s"}, False)
+    assert results[1] == ({"status": "success"}, True)
+    assert results[2] == ({"status": "success"}, True)
+
+
+@pytest.mark.asyncio
+async def test_failed_mutation_does_not_block_day():
+    async def tool(name, args, user_id):
+        if name == "create_workout":
+            raise ValueError("bad start time")
+        if name == "update_workout":
+            return {"status": "error", "message": "No workout found on that date to update."}
+        return {"status": "success"}
+
+    calls = [
+        ("create_workout", {"title": "Run", "activity_type": "run", "start_time_iso": "2026-03-04T07:00:00"}),
+        ("update_workout", {"target_date_iso": "2026-03-05", "new_title": "Easy"}),
+        ("delete_workout", {"target_date_iso": "2026-03-04"}),
+        ("delete_workout", {"target_date_iso": "2026-03-05"}),
+    ]
+    with patch.object(ai_tools, "execute_tool_call", tool):
+        results = await ai_tools.execute_tool_calls(calls, USER_ID)
+
+    assert [ok for _, ok in results] == [False, True, True, True]
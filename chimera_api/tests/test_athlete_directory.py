@@ -0,0 +1,101 @@
+"""
+Unit tests for the Strava athlete -> user mapping (strava_service.AthleteDirectory)
+
+These tests verify:
+1. Warmed athletes resolve without a database round trip
+2. Unknown athletes are negatively cached until the TTL expires
+3. Disconnecting drops the user's mapping; routine settings writes do not
+4. Reconnecting clears the athlete's negative entry in every worker
+"""
+from unittest.mock import patch
+
+import pytest
+
+from services import strava_service
+from services.strava_service import AthleteDirectory, UnknownAthleteError, disconnect_strava
+from services.user_settings_service import InvalidationBackend, invalidate_user_settings, settings_cache
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+
+
+class Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake():
+    fake = FakeSupabase()
+    fake.seed("user_settings", [
+        {"user_id": USER_ID, "strava_athlete_id": "777"},
+        {"user_id": "other-user", "strava_athlete_id": None},
+    ])
+    with install_fake(fake):
+        yield fake
+
+
+@pytest.mark.asyncio
+async def test_warmed_athletes_resolve_from_memory(fake):
+    directory = AthleteDirectory()
+    assert await directory.warm() == 1
+
+    before = fake.query_count
+    assert await directory.resolve(777) == USER_ID
+    assert fake.query_count == before
+
+
+@pytest.mark.asyncio
+async def test_unknown_athletes_are_negatively_cached(fake):
+    clock = Clock()
+    directory = AthleteDirectory(unknown_ttl=60, clock=clock)
+
+    with pytest.raises(UnknownAthleteError):
+        await directory.resolve(999)
+    before = fake.query_count
+    for _ in range(10):
+        with pytest.raises(UnknownAthleteError):
+            await directory.resolve(999)
+    assert fake.query_count == before
+
+    # Connected meanwhile: found again once the negative entry expires
+    fake.tables["user_settings"][1]["strava_athlete_id"] = "999"
+    clock.now += 61
+    assert await directory.resolve(999) == "other-user"
+
+
+@pytest.mark.asyncio
+async def test_disconnect_drops_mapping(fake):
+    settings_cache.clear()
+    directory = AthleteDirectory()
+    await directory.warm()
+
+    # A token refresh or coach note keeps the mapping
+    invalidate_user_settings(USER_ID)
+    before = fake.query_count
+    assert await directory.resolve(777) == USER_ID
+    assert fake.query_count == before
+
+    with patch.object(strava_service, "athlete_directory", directory):
+        await disconnect_strava(USER_ID)
+
+    assert directory.stats()["size"] == 0
+    with pytest.raises(UnknownAthleteError):
+        await directory.resolve(777)
+
+
+@pytest.mark.asyncio
+async def test_reconnect_clears_negative_entry_everywhere(fake):
+    backend = InvalidationBackend()
+    exchanging, other = AthleteDirectory(backend=backend), AthleteDirectory(backend=backend)
+    with pytest.raises(UnknownAthleteError):
+        await other.resolve(999)
+
+    fake.tables["user_settings"][1]["strava_athlete_id"] = "999"
+    exchanging.invalidate("other-user", 999)
+    exchanging.connect(999, "other-user")
+
+    assert await other.resolve(999) == "other-user"
+    assert await exchanging.resolve(999) == "other-user"
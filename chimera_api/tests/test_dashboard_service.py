@@ -0,0 +1,85 @@
+"""
+Unit tests for dashboard_service.py
+
+These tests verify:
+1. get_dashboard issues its queries in two waves and reuses rows for compliance/streak
+   (weekly metrics come from weekly_training_rollups)
+2. _compute_compliance works from already-fetched rows
+3. compute_streak counts consecutive days from fetched dates
+"""
+import pytest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from services.daily_checkin_service import compute_streak
+
+
+def test_compute_streak_counts_consecutive_days():
+    dates = ["2025-01-15", "2025-01-15", "2025-01-14", "2025-01-13", "2025-01-11"]
+    assert compute_streak(dates, "2025-01-15") == 3
+    assert compute_streak(dates, "2025-01-16") == 0
+    assert compute_streak([], "2025-01-15") == 0
+
+
+def test_compute_compliance_uses_fetched_rows():
+    from services.dashboard_service import _compute_compliance
+
+    today = date(2025, 1, 15)  # Wednesday
+    planned = [
+        {"start_time": "2025-01-13T06:00:00", "activity_type": "run", "status": "completed"},
+        {"start_time": "2025-01-14T06:00:00", "activity_type": "rest", "status": "planned"},
+        {"start_time": "2025-01-15T06:00:00", "activity_type": "run", "status": "planned"},
+    ]
+    activities = [
+        {"start_time": "2025-01-13T06:05:00+00:00", "original_activity_type": "Run"},
+        # Outside the 4-week window: must be ignored
+        {"start_time": "2024-11-01T06:05:00+00:00", "original_activity_type": "Run"},
+    ]
+
+    result = _compute_compliance(planned, activities, ["Run"], today)
+
+    assert result["total_days"] == 3
+    # Run on the 13th + rest on the 14th are compliant; the 15th has no activity yet
+    assert result["compliant_days"] == 2
+    assert result["current_week"] == {"compliant": 2, "total": 3}
+    assert _compute_compliance([], activities, ["Run"], today) is None
+
+
+@pytest.mark.asyncio
+async def test_get_dashboard_fetches_in_two_waves(mock_supabase_client, test_user_id):
+    """Compliance and streak must not trigger their own queries."""
+    from services.user_settings_service import settings_cache
+    settings_cache.clear()
+    today = date.today()
+    week_start = today - timedelta(days=today.weekday())
+    mock_supabase_client.execute.return_value.data = [{
+        "id": "a1",
+        "source_id": "123",
+        "start_time": today.isoformat() + "T06:00:00+00:00",
+        "date": today.isoformat(),
+        "entry_type": "morning_checkin",
+        "body_weight": None,
+        "activity_type": "run",
+        "distance_meters": 5000,
+        "strava_activity_id": "123",
+        "session_rpe": 3,
+        "week_start": week_start.isoformat(),
+        "stats_mode": "default",
+        "volume_m": 5000,
+    }]
+
+    with patch('services.dashboard_service.supabase_admin', mock_supabase_client), \
+            patch('services.training_rollup_service.supabase_admin', mock_supabase_client), \
+            patch('request_loader.supabase_admin', mock_supabase_client):
+        from services import dashboard_service
+
+        result = await dashboard_service.get_dashboard(test_user_id)
+
+    # 7 independent queries in wave 1 + RPE lookup in wave 2
+    assert mock_supabase_client.execute.await_count == 8
+    assert result["today"]["streak"] == 1
+    assert result["weekly_metrics"][-1]["volume_m"] == 5000
+    assert set(result["timings_ms"]) == {
+        "activities", "recent_activities", "weekly_rollups", "checkins",
+        "upcoming_workouts", "settings", "compliance_plan", "rpe",
+    }
@@ -0,0 +1,93 @@
+"""
+Tests for tests/fake_supabase.py and a service run against it
+
+These tests verify:
+1. Schemas, defaults and keys are loaded from migrations
+2. Filters, ordering, limits, upsert on_conflict and single() behave like PostgREST
+3. Rollups rebuilt through the fake feed the dashboard end to end
+"""
+import pytest
+from datetime import date, timedelta
+from postgrest.exceptions import APIError
+
+from tests.fake_supabase import FakeSupabase, install_fake
+
+
+def test_schema_loaded_from_migrations():
+    fake = FakeSupabase()
+    assert fake.schemas["weekly_training_rollups"].primary_key == (
+        "user_id", "week_start", "activity_type", "stats_mode",
+    )
+    [row] = fake.seed("daily_checkin", [{"user_id": "u1", "date": "2025-01-15", "entry_type": "morning_checkin"}])
+    assert row["body_weight_unit"] == "lbs"
+    assert row["id"]
+
+
+@pytest.mark.asyncio
+async def test_query_builder_semantics():
+    fake = FakeSupabase()
+    fake.seed("planned_workouts", [
+        {"user_id": "u1", "title": "A", "start_time": "2025-01-13T06:00:00", "status": "planned"},
+        {"user_id": "u1", "title": "B", "start_time": "2025-01-14T06:00:00+00:00", "status": "completed"},
+        {"user_id": "u1", "title": "C", "start_time": "2025-01-20T06:00:00", "status": None},
+        {"user_id": "u2", "title": "D", "start_time": "2025-01-14T06:00:00", "status": "planned"},
+    ])
+
+    resp = await (
+        fake.table("planned_workouts").select("title")
+        .eq("user_id", "u1").gte("start_time", "2025-01-13").lte("start_time", "2025-01-14T23:59:59")
+        .order("start_time", desc=True).limit(5).execute()
+    )
+    assert resp.data == [{"title": "B"}, {"title": "A"}]
+
+    resp = await fake.table("planned_workouts").select("title").not_.is_("status", "null").in_("user_id", ["u1"]).execute()
+    assert sorted(r["title"] for r in resp.data) == ["A", "B"]
+
+    with pytest.raises(APIError):
+        await fake.table("planned_workouts").select("*").eq("user_id", "u1").single().execute()
+    with pytest.raises(APIError):
+        await fake.table("weekly_training_rollups").select("no_such_column").execute()
+
+
+@pytest.mark.asyncio
+async def test_upsert_on_conflict_merges():
+    fake = FakeSupabase()
+    record = {"user_id": "u1", "source_type": "strava", "source_id": "9", "distance_meters": 1000}
+    first = await fake.table("completed_activities").upsert(record, on_conflict="user_id,source_type,source_id").execute()
+    second = await fake.table("completed_activities").upsert(
+        {**record, "distance_meters": 2000}, on_conflict="user_id,source_type,source_id"
+    ).execute()
+
+    assert second.data[0]["id"] == first.data[0]["id"]
+    assert len(fake.tables["completed_activities"]) == 1
+    assert fake.tables["completed_activities"][0]["distance_meters"] == 2000
+    with pytest.raises(APIError):
+        fake.seed("completed_activities", [record])
+
+
+@pytest.mark.asyncio
+async def test_dashboard_against_fake(test_user_id):
+    from services import dashboard_service, training_rollup_service
+    from services.user_settings_service import settings_cache
+
+    settings_cache.clear()
+    today = date.today()
+    fake = FakeSupabase()
+    fake.seed("user_settings", [{"user_id": test_user_id, "tracked_activity_types": ["Run"]}])
+    fake.seed("completed_activities", [
+        {
+            "user_id": test_user_id, "source_type": "strava", "source_id": str(i),
+            "original_activity_type": "Run" if i % 2 else "Walk",
+            "start_time": (today - timedelta(days=i)).isoformat() + "T06:00:00+00:00",
+            "distance_meters": 5000, "moving_time_seconds": 1500, "total_elevation_gain": 10,
+        }
+        for i in range(10)
+    ])
+
+    with install_fake(fake):
+        await training_rollup_service.rebuild_user(test_user_id)
+        result = await dashboard_service.get_dashboard(test_user_id, weeks=4)
+
+    total_volume = sum(w["volume_m"] for w in result["weekly_metrics"])
+    assert total_volume == 5 * 5000  # only the tracked Run activities
+    assert len(result["recent_activities"]) == dashboard_service.RECENT_ACTIVITY_LIMIT
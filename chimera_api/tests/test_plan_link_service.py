@@ -0,0 +1,119 @@
+"""
+Unit tests for activity <-> planned workout linking (services/plan_link_service.py)
+
+These tests verify:
+1. Two same-type activities on one day go to the plans that fit their
+   duration, distance and time of day, one-to-one
+2. Incremental linking only uses open plans
+3. relink_history fixes wrong links and releases plans that lost theirs
+4. Link writes and id filters are sent in bounded chunks
+"""
+from zoneinfo import ZoneInfo
+from unittest.mock import patch
+
+import pytest
+
+from services import plan_link_service
+from services.user_settings_service import settings_cache
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+UTC = ZoneInfo("UTC")
+
+PLANS = [
+    {"id": "plan-long", "user_id": USER_ID, "title": "Long run 18K", "activity_type": "run",
+     "status": "planned", "start_time": "2026-03-14T07:00:00+00:00", "end_time": "2026-03-14T08:45:00+00:00"},
+    {"id": "plan-shakeout", "user_id": USER_ID, "title": "Shakeout 4K", "activity_type": "run",
+     "status": "planned", "start_time": "2026-03-14T17:00:00+00:00", "end_time": "2026-03-14T17:25:00+00:00"},
+    {"id": "plan-swim", "user_id": USER_ID, "title": "Swim", "activity_type": "swim",
+     "status": "planned", "start_time": "2026-03-15T07:00:00+00:00", "end_time": "2026-03-15T08:00:00+00:00"},
+]
+# Listed evening-first: a first-hit matcher would give the shakeout the long plan
+ACTIVITIES = [
+    {"id": "act-evening", "user_id": USER_ID, "source_type": "strava", "source_id": "2",
+     "original_activity_type": "Run", "start_date_local": "2026-03-14T18:10:00Z",
+     "moving_time_seconds": 1500, "distance_meters": 4200.0},
+    {"id": "act-morning", "user_id": USER_ID, "source_type": "strava", "source_id": "1",
+     "original_activity_type": "Run", "start_date_local": "2026-03-14T07:20:00Z",
+     "moving_time_seconds": 6300, "distance_meters": 18300.0},
+]
+
+
+@pytest.fixture
+def fake():
+    settings_cache.clear()
+    fake = FakeSupabase()
+    fake.seed("user_settings", [{"user_id": USER_ID, "timezone": "UTC"}])
+    fake.seed("planned_workouts", [dict(p) for p in PLANS])
+    fake.seed("completed_activities", [dict(a) for a in ACTIVITIES])
+    with install_fake(fake):
+        yield fake
+
+
+def _links(fake) -> dict:
+    return {a["id"]: a.get("planned_workout_id") for a in fake.tables["completed_activities"]}
+
+
+def test_same_day_activities_get_the_plans_that_fit():
+    assert plan_link_service.assign(ACTIVITIES, PLANS, UTC) == {
+        "act-morning": "plan-long",
+        "act-evening": "plan-shakeout",
+    }
+    # One plan that day: it goes to the activity that fits it best, not the first listed
+    assert plan_link_service.assign(ACTIVITIES, PLANS[:1], UTC) == {"act-morning": "plan-long"}
+
+
+@pytest.mark.asyncio
+async def test_link_activities_uses_open_plans(fake):
+    fake.tables["planned_workouts"][0]["status"] = "completed"
+
+    assert await plan_link_service.link_activities(USER_ID, ACTIVITIES) == 1
+
+    assert _links(fake) == {"act-evening": "plan-shakeout", "act-morning": None}
+    statuses = {p["id"]: p["status"] for p in fake.tables["planned_workouts"]}
+    assert statuses["plan-shakeout"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_relink_history_fixes_links(fake):
+    # Crossed links plus a swim plan marked done by a link that no longer fits
+    rows = {a["id"]: a for a in fake.tables["completed_activities"]}
+    rows["act-morning"]["planned_workout_id"] = "plan-shakeout"
+    rows["act-evening"]["planned_workout_id"] = "plan-swim"
+    for plan in fake.tables["planned_workouts"]:
+        if plan["id"] != "plan-long":
+            plan["status"] = "completed"
+
+    summary = await plan_link_service.relink_history(USER_ID)
+
+    assert summary == {"activities": 2, "plans": 3, "linked": 2, "changed": 2}
+    assert _links(fake) == {"act-morning": "plan-long", "act-evening": "plan-shakeout"}
+    statuses = {p["id"]: p["status"] for p in fake.tables["planned_workouts"]}
+    assert statuses == {"plan-long": "completed", "plan-shakeout": "completed", "plan-swim": "planned"}
+
+
+@pytest.mark.asyncio
+async def test_relink_writes_in_chunks(fake):
+    fake.tables["completed_activities"].clear()
+    fake.tables["planned_workouts"].clear()
+    for day in range(1, 8):
+        fake.seed("planned_workouts", [{
+            "id": f"plan-{day}", "user_id": USER_ID, "title": "Run", "activity_type": "run", "status": "completed",
+            "start_time": f"2026-03-{day:02d}T07:00:00+00:00", "end_time": f"2026-03-{day:02d}T08:00:00+00:00",
+        }])
+        fake.seed("completed_activities", [{
+            "id": f"act-{day}", "user_id": USER_ID, "source_type": "strava", "source_id": str(day),
+            "original_activity_type": "Run", "start_date_local": f"2026-03-{day:02d}T07:05:00Z",
+            # Days 1-3 point at the wrong plan; days 4-7 hold links to deleted plans
+            "planned_workout_id": f"plan-{day % 3 + 1}" if day <= 3 else f"gone-{day}",
+        }])
+
+    with patch.object(plan_link_service, "ID_CHUNK", 2), patch.object(plan_link_service, "LINK_CHUNK", 3):
+        before = fake.query_count
+        summary = await plan_link_service.relink_history(USER_ID)
+        writes = fake.query_count - before - 3  # two reads + settings
+
+    assert summary["changed"] == 7
+    assert _links(fake) == {f"act-{day}": f"plan-{day}" for day in range(1, 8)}
+    # 7 links in RPC chunks of 3, 4 released plans and 7 completed in chunks of 2
+    assert writes == 3 + 2 + 4
@@ -0,0 +1,86 @@
+"""
+Unit tests for the agent's plan working set (services/plan_working_set.py)
+
+These tests verify:
+1. A multi-step reschedule reads planned_workouts once, inside the loaded window
+2. Tool mutations write through, so later reads match the database
+3. Days outside the window load on demand, and invalidated days reload
+"""
+from datetime import date
+
+import pytest
+
+import ai_tools
+from services.plan_working_set import working_set_scope
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+TODAY = date(2026, 3, 2)
+
+
+def _workout(n, day, kind="run", hour=6):
+    return {
+        "id": f"00000000-0000-0000-0000-{n:012d}",
+        "user_id": USER_ID,
+        "title": f"Workout {n}",
+        "activity_type": kind,
+        "status": "planned",
+        "start_time": f"2026-03-{day:02d}T{hour:02d}:00:00+00:00",
+        "end_time": f"2026-03-{day:02d}T{hour + 1:02d}:00:00+00:00",
+    }
+
+
+@pytest.fixture
+def fake():
+    fake = FakeSupabase()
+    fake.seed("planned_workouts", [
+        _workout(1, 2), _workout(2, 3), _workout(3, 3, "strength", 18), _workout(4, 5),
+    ])
+    with install_fake(fake):
+        yield fake
+
+
+async def _upcoming():
+    result = await ai_tools.execute_tool_call(
+        "get_upcoming_workouts", {"start_date": "2026-03-01", "end_date": "2026-03-08"}, USER_ID
+    )
+    return [(w["title"], w["start_time"][:10]) for w in result["workouts"]]
+
+
+@pytest.mark.asyncio
+async def test_reschedule_reads_plan_once_and_writes_through(fake):
+    async with working_set_scope(USER_ID) as working_set:
+        await working_set.load_window(TODAY)
+        await _upcoming()
+        results = await ai_tools.execute_tool_calls([
+            ("move_workout_to_date", {"target_date_iso": "2026-03-02", "new_date_iso": "2026-03-04"}),
+            ("update_workout", {"target_date_iso": "2026-03-05", "new_title": "Long run"}),
+            ("delete_workout", {"target_date_iso": "2026-03-03", "activity_type": "strength"}),
+        ], USER_ID)
+        # Next model turn: the day touched above is looked up again
+        results += await ai_tools.execute_tool_calls([
+            ("duplicate_workout_to_date", {"target_date_iso": "2026-03-03", "new_date_iso": "2026-03-06"}),
+        ], USER_ID)
+        assert all(ok for _, ok in results)
+        in_scope = await _upcoming()
+        assert working_set.queries == 1
+
+    assert in_scope == await _upcoming()
+    assert in_scope == [("Workout 2", "2026-03-03"), ("Workout 1", "2026-03-04"),
+                        ("Long run", "2026-03-05"), ("Workout 2", "2026-03-06")]
+
+
+@pytest.mark.asyncio
+async def test_outside_window_loads_on_demand_and_invalidation_reloads(fake):
+    fake.seed("planned_workouts", [_workout(9, 30)])
+    async with working_set_scope(USER_ID) as working_set:
+        await working_set.load_window(date(2026, 2, 1))  # window ends before Mar 2
+
+        assert (await working_set.find_on_day(date(2026, 3, 30)))["title"] == "Workout 9"
+        assert (await working_set.find_on_day(date(2026, 3, 30)))["title"] == "Workout 9"
+        assert working_set.queries == 2
+
+        fake.tables["planned_workouts"].append(_workout(10, 30, "bike", 5))
+        working_set.invalidate(date(2026, 3, 30))
+        assert (await working_set.find_on_day(date(2026, 3, 30)))["title"] == "Workout 10"
+        assert working_set.queries == 3
@@ -0,0 +1,55 @@
+"""
+Unit tests for query_metrics.py
+
+These tests verify:
+1. InstrumentedClient records table, operation and filter shape (not values)
+2. Repeated same-shape queries in one request are flagged as N+1 suspects
+"""
+import pytest
+from unittest.mock import MagicMock
+
+import query_metrics
+from query_metrics import InstrumentedClient, collect_queries
+
+
+@pytest.mark.asyncio
+async def test_records_query_shape_and_rows(mock_supabase_client, test_user_id):
+    mock_supabase_client.execute.return_value = MagicMock(data=[{"id": 1}, {"id": 2}])
+    client = InstrumentedClient(mock_supabase_client)
+
+    with collect_queries() as log:
+        await (
+            client.table("planned_workouts")
+            .select("id")
+            .eq("user_id", test_user_id)
+            .gte("start_time", "2025-01-01")
+            .order("start_time", desc=False)
+            .execute()
+        )
+
+    [record] = log.records
+    assert record.table == "planned_workouts"
+    assert record.operation == "select"
+    assert record.shape == "[user_id:eq,start_time:gte,start_time:order]"
+    assert record.rows == 2
+    assert test_user_id not in record.shape
+
+
+@pytest.mark.asyncio
+async def test_flags_n_plus_one(mock_supabase_client, test_user_id):
+    query_metrics.reset()
+    client = InstrumentedClient(mock_supabase_client)
+
+    with collect_queries() as log:
+        for workout_id in ("w1", "w2", "w3"):
+            await client.table("planned_workouts").delete().eq("id", workout_id).execute()
+        await client.table("planned_workouts").select("*").eq("user_id", test_user_id).execute()
+
+    assert log.n_plus_one_suspects(threshold=3) == [{
+        "table": "planned_workouts", "operation": "delete", "shape": "[id:eq]", "count": 3,
+    }]
+
+    query_metrics.finish_request("DELETE /v1/plan/week", log)
+    metrics = query_metrics.snapshot()
+    assert metrics["routes"]["DELETE /v1/plan/week"]["n_plus_one_requests"] == 1
+    assert metrics["tables"]["planned_workouts.delete"]["latency_ms"]["count"] == 3
@@ -0,0 +1,46 @@
+"""
+Unit tests for the readiness probe (db_client.check_supabase_ready and GET /ready)
+
+These tests verify:
+1. Importing the app does not touch the network or exit on bad credentials
+2. /ready returns 200 when the database answers and 503 with the reason otherwise
+"""
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+import db_client
+import main
+from tests.fake_supabase import FakeSupabase, install_fake
+
+
+def test_ready_when_database_answers():
+    with patch.object(db_client, "CONFIG_PROBLEMS", []), install_fake(FakeSupabase()):
+        response = TestClient(main.app).get("/ready")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert body["checks"]["supabase"]["ok"] is True
+    assert body["import_ms"] > 0
+
+
+def test_not_ready_reports_config_problems():
+    problems = ["SUPABASE_URL is missing"]
+    with patch.object(db_client, "CONFIG_PROBLEMS", problems):
+        response = TestClient(main.app).get("/ready")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["supabase"] == {
+        "ok": False, "latency_ms": None, "error": "SUPABASE_URL is missing",
+    }
+
+
+@pytest.mark.asyncio
+async def test_probe_reports_query_errors(mock_supabase_client):
+    mock_supabase_client.execute.side_effect = Exception("database is paused")
+    with patch.object(db_client, "CONFIG_PROBLEMS", []), \
+         patch.object(db_client, "supabase_admin", mock_supabase_client):
+        result = await db_client.check_supabase_ready()
+
+    assert result == {"ok": False, "latency_ms": None, "error": "database is paused"}
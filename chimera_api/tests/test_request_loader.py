@@ -0,0 +1,62 @@
+"""
+Unit tests for request_loader.py
+
+These tests verify:
+1. Repeat loads in one scope reuse the first query
+2. Loads issued in the same tick are batched into one in_ query
+3. invalidate() forces a re-read
+"""
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+
+import request_loader
+
+
+@pytest.mark.asyncio
+async def test_load_is_memoized_within_scope(mock_supabase_client, test_user_id):
+    mock_supabase_client.execute.return_value = MagicMock(
+        data=[{"user_id": test_user_id, "timezone": "UTC"}]
+    )
+
+    with patch('request_loader.supabase_admin', mock_supabase_client):
+        async with request_loader.loader_scope():
+            first = await request_loader.load("user_settings", test_user_id)
+            first["timezone"] = "mutated"
+            second = await request_loader.load("user_settings", test_user_id)
+
+    assert mock_supabase_client.execute.await_count == 1
+    # Callers get their own copy of the row
+    assert second["timezone"] == "UTC"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_loads_are_batched(mock_supabase_client):
+    mock_supabase_client.execute.return_value = MagicMock(
+        data=[{"user_id": "u1", "timezone": "UTC"}, {"user_id": "u2", "timezone": "Europe/Paris"}]
+    )
+
+    with patch('request_loader.supabase_admin', mock_supabase_client):
+        async with request_loader.loader_scope():
+            a, b, missing = await asyncio.gather(
+                request_loader.load("user_settings", "u1"),
+                request_loader.load("user_settings", "u2"),
+                request_loader.load("user_settings", "u3"),
+            )
+
+    assert mock_supabase_client.execute.await_count == 1
+    mock_supabase_client.in_.assert_called_once_with("user_id", ["u1", "u2", "u3"])
+    assert (a["timezone"], b["timezone"], missing) == ("UTC", "Europe/Paris", None)
+
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_reload(mock_supabase_client, test_user_id):
+    mock_supabase_client.execute.return_value = MagicMock(data=[{"user_id": test_user_id}])
+
+    with patch('request_loader.supabase_admin', mock_supabase_client):
+        async with request_loader.loader_scope():
+            await request_loader.load("user_settings", test_user_id)
+            request_loader.invalidate("user_settings", test_user_id)
+            await request_loader.load("user_settings", test_user_id)
+
+    assert mock_supabase_client.execute.await_count == 2
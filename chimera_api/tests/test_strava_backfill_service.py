@@ -0,0 +1,197 @@
+"""
+Unit tests for the resumable Strava backfill (services/strava_backfill_service.py)
+
+These tests verify:
+1. A backfill pages through the list oldest-first, upserts every activity once
+   and bulk-links activities to planned workouts
+2. A failed job resumes from its checkpoint cursor instead of starting over
+3. An activity whose detail fetch failed is fetched again on resume, not skipped;
+   one Strava will never serve (403) is skipped and counted once
+4. A backfill started from a request does not inherit its loader or query log
+"""
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+import query_metrics
+import request_loader
+from services import strava_backfill_service as backfill
+from services import strava_service
+from strava_client import StravaClient, RateLimiter
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _strava_activities(count: int) -> list[dict]:
+    activities = []
+    for i in range(count):
+        start = NOW - timedelta(days=20) + timedelta(hours=3 * i)
+        activities.append({
+            "id": 9000 + i,
+            "name": f"Run {i}",
+            "type": "Run",
+            "start_date": start.isoformat().replace("+00:00", "Z"),
+            "start_date_local": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "distance": 5000.0,
+            "moving_time": 1500,
+            "elapsed_time": 1600,
+        })
+    return activities
+
+
+class FakeStrava:
+    """Serves /athlete/activities (after= cursor, oldest first) and /activities/{id}."""
+
+    def __init__(self, activities, fail_list_calls: set[int] = frozenset(), fail_details_once: set[int] = frozenset(),
+                 forbidden: set[int] = frozenset()):
+        self.activities = activities
+        self.forbidden = forbidden
+        self.fail_list_calls = fail_list_calls
+        self.fail_details_once = set(fail_details_once)
+        self.list_calls = 0
+        self.detail_calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/athlete/activities"):
+            self.list_calls += 1
+            if self.list_calls in self.fail_list_calls:
+                return httpx.Response(503)
+            after = int(request.url.params["after"])
+            per_page = int(request.url.params["per_page"])
+            page = [
+                a for a in self.activities
+                if datetime.fromisoformat(a["start_date"].replace("Z", "+00:00")).timestamp() > after
+            ][:per_page]
+            return httpx.Response(200, json=page)
+        self.detail_calls += 1
+        activity_id = int(request.url.path.rsplit("/", 1)[1])
+        if activity_id in self.forbidden:
+            return httpx.Response(403)
+        if activity_id in self.fail_details_once:
+            self.fail_details_once.discard(activity_id)
+            return httpx.Response(500)
+        return httpx.Response(200, json=next(a for a in self.activities if a["id"] == activity_id))
+
+
+@pytest.fixture
+def env():
+    fake = FakeSupabase()
+    fake.seed("user_settings", [{"user_id": USER_ID, "timezone": "UTC", "tracked_activity_types": ["Run"]}])
+    day = (NOW - timedelta(days=19)).replace(hour=12, minute=0, second=0)
+    fake.seed("planned_workouts", [
+        {"user_id": USER_ID, "title": "Easy run", "activity_type": "run", "status": "planned",
+         "start_time": day.isoformat()},
+    ])
+    with install_fake(fake), \
+         patch.object(strava_service, "_get_access_token", AsyncMock(return_value="token")), \
+         patch.object(backfill, "LIST_PAGE_SIZE", 5):
+        yield fake
+
+
+@contextmanager
+def _use_strava(fake_strava: FakeStrava):
+    client = StravaClient(RateLimiter(limit_15min=10**6, limit_daily=10**7))
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(fake_strava))
+    with patch.object(backfill, "strava_client", client), patch.object(strava_service, "strava_client", client):
+        yield
+
+
+async def _run_to_completion(days: int = 30) -> dict:
+    job = await backfill.start_backfill(USER_ID, days=days)
+    await asyncio.gather(*backfill._running)
+    return await backfill.get_job(USER_ID, job["id"])
+
+
+@pytest.mark.asyncio
+async def test_backfill_syncs_pages_and_links_plan(env):
+    strava = FakeStrava(_strava_activities(12))
+    with _use_strava(strava):
+        job = await _run_to_completion()
+
+    assert job["status"] == "done"
+    assert (job["pages"], job["listed"], job["synced"], job["errors"]) == (3, 12, 12, 0)
+    assert job["linked"] == 1
+    assert strava.detail_calls == 12
+
+    rows = env.tables["completed_activities"]
+    assert len(rows) == 12
+    assert sum(1 for r in rows if r.get("planned_workout_id")) == 1
+    assert env.tables["planned_workouts"][0]["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_failed_backfill_resumes_from_cursor(env):
+    # Second list call fails: page 1 is stored and checkpointed, then the job fails
+    strava = FakeStrava(_strava_activities(12), fail_list_calls={2})
+    with _use_strava(strava):
+        failed = await _run_to_completion()
+        assert failed["status"] == "failed"
+        assert failed["synced"] == 5
+
+        resumed = await _run_to_completion()
+
+    assert resumed["id"] == failed["id"]
+    assert resumed["status"] == "done"
+    assert resumed["synced"] == 12
+    # Page 1 details were not fetched again
+    assert strava.detail_calls == 12
+    assert len(env.tables["completed_activities"]) == 12
+
+
+@pytest.mark.asyncio
+async def test_failed_detail_fetch_is_retried_on_resume(env):
+    # Activity 9006 (page 2) fails once: the checkpoint stops just before it
+    strava = FakeStrava(_strava_activities(12), fail_details_once={9006})
+    with _use_strava(strava):
+        failed = await _run_to_completion()
+        assert failed["status"] == "failed"
+        assert (failed["synced"], failed["errors"]) == (6, 1)
+
+        resumed = await _run_to_completion()
+
+    assert resumed["status"] == "done"
+    assert resumed["synced"] == 12
+    assert {r["source_id"] for r in env.tables["completed_activities"]} == {str(9000 + i) for i in range(12)}
+
+
+@pytest.mark.asyncio
+async def test_unavailable_activity_is_skipped_once(env):
+    # 9006 is private (403), 9008 fails once (500) on the same page
+    strava = FakeStrava(_strava_activities(12), fail_details_once={9008}, forbidden={9006})
+    with _use_strava(strava):
+        failed = await _run_to_completion()
+        assert failed["status"] == "failed"
+        assert (failed["synced"], failed["errors"]) == (7, 2)
+
+        resumed = await _run_to_completion()
+
+    assert resumed["status"] == "done"
+    assert (resumed["synced"], resumed["errors"]) == (11, 2)
+    assert "9006" not in {r["source_id"] for r in env.tables["completed_activities"]}
+
+
+@pytest.mark.asyncio
+async def test_backfill_runs_outside_the_starting_request(env):
+    seen = []
+
+    async def sync_page(job):
+        seen.append((request_loader._current_loader.get(), query_metrics._current_log.get()))
+        return False
+
+    log_token = query_metrics._current_log.set(query_metrics.QueryLog())
+    try:
+        with patch.object(backfill, "_sync_page", sync_page):
+            async with request_loader.loader_scope() as request_scope:
+                await _run_to_completion()
+    finally:
+        query_metrics._current_log.reset(log_token)
+
+    [(page_loader, page_log)] = seen
+    assert page_loader is not None and page_loader is not request_scope
+    assert page_log is None
@@ -0,0 +1,135 @@
+"""
+Unit tests for strava_client.py
+
+These tests verify:
+1. Usage and limits are resynced from Strava's rate-limit headers
+2. Backfills queue once their share of the window is spent while webhooks proceed
+3. Queued calls resume when the window resets, higher lanes first
+4. A wait longer than the caller's budget raises RateLimited with the reset time,
+   which the OAuth exchange answers with 503 and Retry-After
+"""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from dependencies import get_current_user
+from routers import strava as strava_router
+
+from strava_client import RateLimiter, RateLimited, StravaClient, Lane, lane, wait_budget
+
+WINDOW_START = 1_760_000_400.0  # a 15-minute boundary
+
+
+class Clock:
+    def __init__(self, now: float = WINDOW_START + 10):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _headers(usage: str, limit: str = "100,1000") -> httpx.Headers:
+    return httpx.Headers({"X-ReadRateLimit-Limit": limit, "X-ReadRateLimit-Usage": usage})
+
+
+def test_headers_resync_usage_and_limits():
+    limiter = RateLimiter(limit_15min=100, limit_daily=1000, clock=Clock())
+    limiter.update_from_headers(_headers("42,420", limit="200,2000"))
+
+    stats = limiter.stats()["windows"]
+    assert stats["15min"]["limit"] == 200
+    assert stats["15min"]["used"] == 42
+    assert stats["daily"]["used"] == 420
+    assert stats["15min"]["resets_in_s"] == 890
+
+
+@pytest.mark.asyncio
+async def test_backfill_queues_while_webhooks_proceed():
+    limiter = RateLimiter(limit_15min=100, limit_daily=1000, clock=Clock())
+    limiter.update_from_headers(_headers("60,60"))  # backfill budget (60%) spent
+
+    backfill = asyncio.create_task(limiter.acquire(Lane.BACKFILL))
+    await asyncio.sleep(0)
+    assert not backfill.done()
+
+    await asyncio.wait_for(limiter.acquire(Lane.WEBHOOK), 1)
+    await asyncio.wait_for(limiter.acquire(Lane.INTERACTIVE), 1)
+    assert limiter.stats()["waiting"] == {"backfill": 1}
+
+    backfill.cancel()
+    await asyncio.gather(backfill, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_queued_calls_resume_after_reset_webhooks_first():
+    clock = Clock()
+    limiter = RateLimiter(limit_15min=100, limit_daily=1000, clock=clock)
+    limiter.exhaust()  # 429: the short window is spent for every lane
+
+    order = []
+
+    async def call(priority):
+        await limiter.acquire(priority)
+        order.append(priority)
+
+    tasks = [asyncio.create_task(call(p)) for p in (Lane.BACKFILL, Lane.WEBHOOK, Lane.INTERACTIVE)]
+    await asyncio.sleep(0)
+    assert order == []
+
+    clock.now = WINDOW_START + 900 + 5  # next window
+    limiter.update_from_headers(_headers("0,101"))
+    await asyncio.wait_for(asyncio.gather(*tasks), 1)
+
+    assert order == [Lane.WEBHOOK, Lane.INTERACTIVE, Lane.BACKFILL]
+    assert limiter.stats()["windows"]["15min"]["used"] == 3
+
+
+@pytest.mark.asyncio
+async def test_wait_past_budget_raises_rate_limited():
+    limiter = RateLimiter(limit_15min=100, limit_daily=1000, clock=Clock())
+    limiter.exhaust()
+
+    with wait_budget(120), pytest.raises(RateLimited) as raised:
+        await asyncio.wait_for(limiter.acquire(Lane.WEBHOOK), 1)
+
+    assert raised.value.resets_at == WINDOW_START + 900 + 1
+    assert limiter.stats()["deferred"] == {"webhook": 1}
+    assert limiter.stats()["waiting"] == {}
+
+
+@pytest.mark.asyncio
+async def test_client_reads_headers_and_uses_current_lane():
+    def handler(request):
+        return httpx.Response(200, json={"id": 1}, headers=_headers("7,70"))
+
+    client = StravaClient(RateLimiter(clock=Clock()))
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with lane(Lane.BACKFILL):
+        response = await client.get("https://www.strava.com/api/v3/activities/1")
+    await client.aclose()
+
+    assert response.json() == {"id": 1}
+    stats = client.limiter.stats()
+    assert stats["granted"] == {"backfill": 1}
+    assert stats["windows"]["15min"]["used"] == 7
+
+
+def test_exchange_answers_503_when_rate_limited():
+    client = StravaClient(RateLimiter())
+    client.limiter.exhaust()
+    main.app.dependency_overrides[get_current_user] = lambda: "dc43c3a8-1234-5678-9abc-def012345678"
+    try:
+        # No wait allowed, so the test never depends on how close the window reset is
+        with patch.object(strava_router, "strava_client", client), \
+             patch.object(strava_router, "EXCHANGE_MAX_WAIT_SECONDS", 0):
+            response = TestClient(main.app).post("/v1/integrations/strava/exchange", json={"code": "abc"})
+    finally:
+        main.app.dependency_overrides.pop(get_current_user)
+
+    assert response.status_code == 503
+    assert 1 <= int(response.headers["retry-after"]) <= 901
@@ -0,0 +1,97 @@
+"""
+Unit tests for nightly Strava reconciliation (services/strava_reconcile_service.py)
+
+These tests verify:
+1. Stored rows and Strava summaries of the same activity fingerprint alike
+2. Only missing and changed activities are queued, from one list call per athlete
+3. A night's run happens once, whichever worker gets there first
+"""
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from services import strava_reconcile_service as reconcile
+from services import strava_service
+from strava_client import StravaClient, RateLimiter
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+NOW = datetime(2026, 3, 20, 3, 30, tzinfo=timezone.utc)
+
+
+def _summary(activity_id: int, day: int, name: str = "Morning Run") -> dict:
+    return {
+        "id": activity_id,
+        "name": name,
+        "type": "Run",
+        "start_date": f"2026-03-{day:02d}T06:00:00Z",
+        "distance": 10012.3,
+        "moving_time": 3000,
+        "elapsed_time": 3100,
+        "total_elevation_gain": 55.2,
+    }
+
+
+LISTED = [_summary(1, 15), _summary(2, 16), _summary(3, 17)]
+
+
+@pytest.fixture
+def env():
+    fake = FakeSupabase()
+    fake.seed("user_settings", [
+        {"user_id": USER_ID, "strava_athlete_id": "777"},
+        {"user_id": "not-connected", "strava_athlete_id": None},
+    ])
+    stored = [strava_service._build_activity_record(USER_ID, s) for s in LISTED[:2]]
+    stored[1]["name"] = "Old title"  # renamed on Strava while our webhook was down
+    for row in stored:
+        row["start_time"] = row["start_time"].replace("Z", "+00:00")  # as Postgres returns it
+    fake.seed("completed_activities", stored)
+
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=LISTED)
+
+    client = StravaClient(RateLimiter(limit_15min=10**6, limit_daily=10**7))
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with install_fake(fake), \
+         patch.object(reconcile, "strava_client", client), \
+         patch.object(strava_service, "_get_access_token", AsyncMock(return_value="token")):
+        yield fake, calls
+
+
+def test_fingerprints_match_across_sources():
+    record = strava_service._build_activity_record(USER_ID, LISTED[0])
+    record["start_time"] = "2026-03-15T06:00:00+00:00"
+    assert reconcile.stored_fingerprint(record) == reconcile.listed_fingerprint(LISTED[0])
+    assert reconcile.listed_fingerprint(_summary(1, 15, "Tempo")) != reconcile.listed_fingerprint(LISTED[0])
+
+
+@pytest.mark.asyncio
+async def test_queues_only_missing_and_changed(env):
+    fake, calls = env
+
+    totals = await reconcile.run_once(NOW)
+
+    assert totals == {"athletes": 1, "listed": 3, "missing": 1, "changed": 1, "errors": 0}
+    assert len(calls) == 1
+    jobs = {(j["object_id"], j["aspect_type"]) for j in fake.tables["webhook_jobs"]}
+    assert jobs == {(3, "create"), (2, "update")}
+    assert all(j["owner_id"] == 777 for j in fake.tables["webhook_jobs"])
+    assert {j["source"] for j in fake.tables["webhook_jobs"]} == {"reconcile"}
+    [run] = fake.tables["strava_reconcile_runs"]
+    assert run["status"] == "done" and run["missing"] == 1
+
+
+@pytest.mark.asyncio
+async def test_runs_once_per_night(env):
+    fake, calls = env
+
+    assert await reconcile.run_once(NOW) is not None
+    assert await reconcile.run_once(NOW.replace(hour=5)) is None
+    assert len(calls) == 1
+    assert len(fake.tables["webhook_jobs"]) == 2
@@ -0,0 +1,104 @@
+"""
+Unit tests for the Strava token cache (services/strava_token_service.py)
+
+These tests verify:
+1. Valid tokens are served from memory after the first read
+2. Concurrent callers with an expired token share one OAuth refresh
+3. Tokens of active users are renewed ahead of expiry, and settings
+   invalidation drops the cached entry
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from services import strava_token_service
+from services.strava_token_service import StravaTokenCache
+from services.user_settings_service import settings_cache, invalidate_user_settings
+from strava_client import StravaClient, RateLimiter
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+
+
+@pytest.fixture
+def fake():
+    settings_cache.clear()
+    fake = FakeSupabase()
+    with install_fake(fake):
+        yield fake
+
+
+def _seed_tokens(fake, expires_in: float):
+    fake.seed("user_settings", [{
+        "user_id": USER_ID,
+        "strava_access_token": "old-access",
+        "strava_refresh_token": "old-refresh",
+        "strava_expires_at": int(time.time() + expires_in),
+    }])
+
+
+@contextmanager
+def _oauth():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)  # keep the refresh in flight while others arrive
+        return httpx.Response(200, json={
+            "access_token": f"new-access-{len(calls)}",
+            "refresh_token": f"new-refresh-{len(calls)}",
+            "expires_at": int(time.time() + 6 * 3600),
+        })
+
+    client = StravaClient(RateLimiter(limit_15min=10**6, limit_daily=10**7))
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch.object(strava_token_service, "strava_client", client):
+        yield calls
+
+
+@pytest.mark.asyncio
+async def test_valid_token_is_served_from_memory(fake):
+    _seed_tokens(fake, expires_in=3600)
+    cache = StravaTokenCache()
+
+    assert await cache.get(USER_ID) == "old-access"
+    reads = fake.query_count
+    assert await cache.get(USER_ID) == "old-access"
+    assert fake.query_count == reads
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_are_single_flight(fake):
+    _seed_tokens(fake, expires_in=-10)
+    cache = StravaTokenCache()
+
+    with _oauth() as calls:
+        tokens = await asyncio.gather(*(cache.get(USER_ID) for _ in range(5)))
+
+    assert tokens == ["new-access-1"] * 5
+    assert len(calls) == 1
+    assert b"refresh_token=old-refresh" in calls[0].content
+    row = fake.tables["user_settings"][0]
+    assert row["strava_refresh_token"] == "new-refresh-1"
+    assert cache.stats()["joined_refreshes"] == 4
+
+
+@pytest.mark.asyncio
+async def test_renews_ahead_of_expiry_and_forgets_on_invalidation(fake):
+    _seed_tokens(fake, expires_in=120)  # valid, but inside the renewal window
+    cache = StravaTokenCache()
+    settings_cache.backend.subscribe(cache.forget)
+
+    with _oauth() as calls:
+        assert await cache.get(USER_ID) == "old-access"
+        assert await cache.renew_expiring() == 1
+        assert await cache.get(USER_ID) == "new-access-1"
+        assert len(calls) == 1
+
+    invalidate_user_settings(USER_ID)
+    assert cache.stats()["size"] == 0
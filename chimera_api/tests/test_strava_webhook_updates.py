@@ -0,0 +1,120 @@
+"""
+Unit tests for applying Strava webhook `updates` payloads (strava_service._handle_activity_update)
+
+These tests verify:
+1. Title/privacy edits patch the stored row and raw payload without a Strava fetch
+2. A type change re-links the activity to a matching plan and tracks the new type
+3. Updates we can't apply locally fall back to fetching the activity, and a
+   fetched type change still re-links and tracks the new type
+4. Rows without a raw payload are fetched instead of patched into a fragment
+"""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from services import strava_service
+from services import activity_payload_service
+from services.user_settings_service import settings_cache
+from tests.fake_supabase import FakeSupabase, install_fake
+
+USER_ID = "dc43c3a8-1234-5678-9abc-def012345678"
+BLOB = {
+    "id": 4242,
+    "name": "Afternoon Ride",
+    "type": "Ride",
+    "sport_type": "Ride",
+    "private": False,
+    "start_date": "2026-03-10T16:00:00Z",
+    "start_date_local": "2026-03-10T17:00:00Z",
+    "distance": 30000.0,
+}
+
+
+@pytest.fixture
+def fake():
+    settings_cache.clear()
+    fake = FakeSupabase()
+    fake.seed("user_settings", [{"user_id": USER_ID, "timezone": "UTC", "tracked_activity_types": ["Ride"]}])
+    fake.seed("planned_workouts", [
+        {"id": "plan-ride", "user_id": USER_ID, "title": "Spin", "activity_type": "bike",
+         "status": "completed", "start_time": "2026-03-10T07:00:00+00:00"},
+        {"id": "plan-run", "user_id": USER_ID, "title": "Tempo", "activity_type": "run",
+         "status": "planned", "start_time": "2026-03-10T08:00:00+00:00"},
+    ])
+    fake.seed("completed_activities", [{
+        "id": "act-1", "user_id": USER_ID, "source_type": "strava", "source_id": "4242",
+        "original_activity_type": "Ride", "name": "Afternoon Ride", "sport_type": "Ride",
+        "start_time": BLOB["start_date"], "start_date_local": BLOB["start_date_local"],
+        "distance_meters": 30000.0, "planned_workout_id": "plan-ride", "activity_data_blob": BLOB,
+    }])
+    with install_fake(fake), \
+         patch.object(strava_service, "_fetch_strava_activity", AsyncMock(return_value=BLOB)) as fetch, \
+         patch.object(strava_service, "_get_access_token", AsyncMock(return_value="token")):
+        fake.fetch = fetch
+        yield fake
+
+
+@pytest.mark.asyncio
+async def test_title_and_privacy_are_patched_without_fetch(fake):
+    await strava_service._handle_activity_update(USER_ID, 4242, {"title": "Hill repeats", "private": "true"})
+
+    fake.fetch.assert_not_awaited()
+    [row] = fake.tables["completed_activities"]
+    assert row["name"] == "Hill repeats"
+    raw = await activity_payload_service.get(row["payload_hash"])
+    assert raw["name"] == "Hill repeats"
+    assert raw["private"] is True
+    assert row["planned_workout_id"] == "plan-ride"
+
+
+@pytest.mark.asyncio
+async def test_type_change_relinks_and_tracks_type(fake):
+    await strava_service._handle_activity_update(USER_ID, 4242, {"type": "Run"})
+
+    fake.fetch.assert_not_awaited()
+    [row] = fake.tables["completed_activities"]
+    assert row["original_activity_type"] == "Run"
+    assert (await activity_payload_service.get(row["payload_hash"]))["type"] == "Run"
+    assert row["planned_workout_id"] == "plan-run"
+    plans = {p["id"]: p["status"] for p in fake.tables["planned_workouts"]}
+    assert plans == {"plan-ride": "planned", "plan-run": "completed"}
+    assert fake.tables["user_settings"][0]["tracked_activity_types"] == ["Ride", "Run"]
+
+
+@pytest.mark.asyncio
+async def test_unpatchable_update_falls_back_to_fetch(fake):
+    await strava_service._handle_activity_update(USER_ID, 4242, {"authorized": "false"})
+    fake.fetch.assert_awaited_once()
+
+    # Not stored yet: fetch it even though the change itself is patchable
+    fake.tables["completed_activities"].clear()
+    await strava_service._handle_activity_update(USER_ID, 4242, {"title": "Hill repeats"})
+    assert fake.fetch.await_count == 2
+    assert len(fake.tables["completed_activities"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_fetched_type_change_relinks(fake):
+    fake.fetch.return_value = {**BLOB, "type": "Run", "sport_type": "Run", "name": "Tempo"}
+
+    await strava_service._handle_activity_update(USER_ID, 4242, {"type": "Run", "title": "Tempo", "authorized": "true"})
+
+    fake.fetch.assert_awaited_once()
+    [row] = fake.tables["completed_activities"]
+    assert row["original_activity_type"] == "Run"
+    assert row["planned_workout_id"] == "plan-run"
+    plans = {p["id"]: p["status"] for p in fake.tables["planned_workouts"]}
+    assert plans == {"plan-ride": "planned", "plan-run": "completed"}
+    assert fake.tables["user_settings"][0]["tracked_activity_types"] == ["Ride", "Run"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stored", [None, '{"name": "legacy json string"}'])
+async def test_missing_or_legacy_payload_is_fetched(fake, stored):
+    fake.tables["completed_activities"][0]["activity_data_blob"] = stored
+
+    await strava_service._handle_activity_update(USER_ID, 4242, {"title": "Hill repeats"})
+
+    fake.fetch.assert_awaited_once()
+    [row] = fake.tables["completed_activities"]
+    assert await activity_payload_service.get(row["payload_hash"]) == BLOB
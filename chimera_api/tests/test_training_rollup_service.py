@@ -0,0 +1,62 @@
+"""
+Unit tests for training_rollup_service.py
+
+These tests verify:
+1. compute_rollups buckets activities per ISO week, activity type and stats mode
+2. is_rollup_included mirrors is_activity_included for override modes
+3. rebuild_all reaches every user, past one page of the users table
+"""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from services import training_rollup_service
+from services.training_rollup_service import compute_rollups, is_rollup_included
+from tests.fake_supabase import FakeSupabase, install_fake
+
+
+def test_compute_rollups_buckets_by_week_type_and_mode(test_user_id):
+    activities = [
+        {"start_time": "2025-01-13T06:00:00Z", "original_activity_type": "Run",
+         "distance_meters": 10000, "moving_time_seconds": 3000, "average_heartrate": 150},
+        {"start_time": "2025-01-19T06:00:00Z", "original_activity_type": "Run",
+         "distance_meters": 20000, "moving_time_seconds": 6000, "average_heartrate": 140},
+        {"start_time": "2025-01-20T06:00:00Z", "original_activity_type": "Run",
+         "distance_meters": 5000, "moving_time_seconds": 1500},
+        {"start_time": "2025-01-14T06:00:00Z", "original_activity_type": "Ride",
+         "stats_override": True, "stats_excluded": True, "distance_meters": 40000},
+    ]
+
+    rollups = compute_rollups(test_user_id, activities)
+
+    week = rollups[("2025-01-13", "Run", "default")]
+    assert week["activity_count"] == 2
+    assert week["volume_m"] == 30000
+    assert week["long_run_m"] == 20000
+    assert week["hr_weighted_sum"] == 150 * 3000 + 140 * 6000
+    assert week["hr_weight_s"] == 9000
+    assert rollups[("2025-01-20", "Run", "default")]["hr_weight_s"] == 0
+    assert ("2025-01-13", "Ride", "exclude") in rollups
+
+
+def test_is_rollup_included_respects_overrides():
+    tracked = ["Run"]
+    assert is_rollup_included({"activity_type": "Run", "stats_mode": "default"}, tracked)
+    assert not is_rollup_included({"activity_type": "Ride", "stats_mode": "default"}, tracked)
+    assert is_rollup_included({"activity_type": "Ride", "stats_mode": "include"}, tracked)
+    assert not is_rollup_included({"activity_type": "Run", "stats_mode": "exclude"}, tracked)
+    assert is_rollup_included({"activity_type": "", "stats_mode": "default"}, tracked)
+
+
+@pytest.mark.asyncio
+async def test_rebuild_all_pages_through_users():
+    fake = FakeSupabase()
+    fake.seed("users", [{"id": f"user-{n:02d}", "email": f"{n}@example.com"} for n in range(5)])
+    rebuild_user = AsyncMock(return_value=1)
+
+    with install_fake(fake), patch.object(training_rollup_service, "PAGE_SIZE", 2), \
+         patch.object(training_rollup_service, "rebuild_user", rebuild_user):
+        counts = await training_rollup_service.rebuild_all()
+
+    assert counts == {"users": 5, "rows": 5, "errors": 0}
+    assert [c.args[0] for c in rebuild_user.await_args_list] == [f"user-{n:02d}" for n in range(5)]
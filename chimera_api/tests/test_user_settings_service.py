@@ -0,0 +1,93 @@
+"""
+Unit tests for the user settings cache in user_settings_service.py
+
+These tests verify:
+1. Reads are served from cache after the first load, with hit/miss counters
+2. Entries expire after the TTL and the LRU evicts the oldest user
+3. Writers invalidate through the shared backend
+4. A read that races an invalidation is returned but not cached
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+
+import request_loader
+
+from services.user_settings_service import (
+    _MISSING,
+    SettingsCache,
+    InvalidationBackend,
+    settings_cache,
+    get_user_settings,
+    load_user_settings,
+    invalidate_user_settings,
+    update_user_settings,
+)
+
+
+@pytest.mark.asyncio
+async def test_get_user_settings_is_cached_until_write(mock_supabase_client, test_user_id):
+    settings_cache.clear()
+    mock_supabase_client.execute.return_value = MagicMock(
+        data=[{"user_id": test_user_id, "timezone": "UTC"}]
+    )
+
+    with patch('request_loader.supabase_admin', mock_supabase_client), \
+            patch('services.user_settings_service.supabase_admin', mock_supabase_client):
+        hits_before = settings_cache.hits
+        await get_user_settings(test_user_id)
+        settings = await get_user_settings(test_user_id)
+        assert settings["timezone"] == "UTC"
+        assert mock_supabase_client.execute.await_count == 1
+        assert settings_cache.hits == hits_before + 1
+
+        await update_user_settings(test_user_id, {"timezone": "UTC"})
+        await get_user_settings(test_user_id)
+
+    # read + upsert + re-read after invalidation
+    assert mock_supabase_client.execute.await_count == 3
+
+
+def test_cache_ttl_and_lru_eviction():
+    cache = SettingsCache(max_entries=2, ttl_seconds=60)
+    cache.set("u1", {"a": 1})
+    cache.set("u2", {"a": 2})
+    cache.get("u1")  # u1 is now most recently used
+    cache.set("u3", {"a": 3})
+
+    assert cache.evictions == 1
+    assert cache.get("u2") is _MISSING
+    assert cache.get("u1") == {"a": 1}
+
+    with patch('services.user_settings_service.time.monotonic', return_value=10**12):
+        assert cache.get("u1") is _MISSING
+        assert cache.get("u3") is _MISSING
+    assert cache.stats()["size"] == 0
+
+
+def test_invalidation_reaches_every_subscribed_cache():
+    backend = InvalidationBackend()
+    worker_a = SettingsCache(10, 60, backend)
+    worker_b = SettingsCache(10, 60, backend)
+    worker_a.set("u1", {"a": 1})
+    worker_b.set("u1", {"a": 1})
+
+    worker_a.invalidate("u1")
+
+    assert worker_a.stats()["size"] == 0
+    assert worker_b.stats()["size"] == 0
+
+
+
+@pytest.mark.asyncio
+async def test_read_racing_an_invalidation_is_not_cached(test_user_id):
+    settings_cache.clear()
+
+    async def load(table, key):
+        # A write lands (and invalidates) while this read is in flight
+        invalidate_user_settings(key)
+        return {"user_id": key, "timezone": "UTC"}
+
+    with patch.object(request_loader, "load", load):
+        assert (await load_user_settings(test_user_id))["timezone"] == "UTC"
+
+    assert settings_cache.get(test_user_id) is _MISSING
@@ -0,0 +1,269 @@
+"""
+Unit tests for the Strava webhook job queue (services/webhook_queue_service.py)
+
+These tests verify:
+1. Redelivered events (same object_id, aspect_type, event_time) are stored once
+2. A job is claimed by exactly one worker
+3. Failures retry with backoff, then dead-letter; permanent errors dead-letter at once;
+   a job that would wait out the rate limit past its timeout is requeued for the reset
+4. Bursts for one activity coalesce into a single action
+5. Reconciler repairs run in the backfill lane unless a live event joins them
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from services import webhook_queue_service as queue
+from services import strava_service
+from services.strava_service import UnknownAthleteError
+import strava_client
+from strava_client import RateLimiter, Lane
+from tests.fake_supabase import FakeSupabase, install_fake
+
+EVENT = {
+    "object_id": 12345,
+    "owner_id": 777,
+    "object_type": "activity",
+    "aspect_type": "create",
+    "event_time": 1760000000,
+    "subscription_id": 1,
+    "updates": None,
+}
+
+
+@pytest.fixture
+def fake():
+    with install_fake(FakeSupabase()) as fake, patch.object(queue, "WEBHOOK_COALESCE_SECONDS", 0):
+        yield fake
+
+
+@pytest.mark.asyncio
+async def test_enqueue_is_idempotent(fake):
+    assert await queue.enqueue(EVENT) is True
+    assert await queue.enqueue(EVENT) is False
+    assert await queue.enqueue({**EVENT, "aspect_type": "update"}) is True
+
+    jobs = fake.tables["webhook_jobs"]
+    assert len(jobs) == 2
+    assert {j["status"] for j in jobs} == {"pending"}
+
+
+@pytest.mark.asyncio
+async def test_job_is_claimed_once(fake):
+    await queue.enqueue(EVENT)
+    [pending] = fake.tables["webhook_jobs"]
+    snapshot = dict(pending)
+
+    first = await queue.claim_job("worker-a")
+    assert first["status"] == "running"
+    assert first["attempts"] == 1
+    assert first["locked_by"] == "worker-a"
+
+    # A second worker that read the same row before the claim loses the race
+    assert await queue._try_claim(snapshot, "worker-b") is None
+    assert await queue.claim_job("worker-b") is None
+
+
+@pytest.mark.asyncio
+async def test_successful_job_is_marked_done(fake):
+    await queue.enqueue(EVENT)
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    handler = AsyncMock()
+
+    with patch("services.strava_service.handle_webhook_event", handler):
+        await pool.run_job(await queue.claim_job("test"))
+
+    handler.assert_awaited_once_with(12345, 777, "create", None)
+    [job] = fake.tables["webhook_jobs"]
+    assert job["status"] == "done"
+    assert pool.stats["processed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_retry_with_backoff_then_dead_letter(fake):
+    await queue.enqueue(EVENT)
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    handler = AsyncMock(side_effect=Exception("Strava 503"))
+
+    with patch("services.strava_service.handle_webhook_event", handler), \
+         patch.object(queue, "WEBHOOK_MAX_ATTEMPTS", 2):
+        await pool.run_job(await queue.claim_job("test"))
+
+        [job] = fake.tables["webhook_jobs"]
+        assert job["status"] == "pending"
+        assert job["last_error"] == "Strava 503"
+        assert datetime.fromisoformat(job["run_after"]) > queue._now()
+        # Not due yet
+        assert await queue.claim_job("test") is None
+
+        job["run_after"] = queue._now().isoformat()
+        await pool.run_job(await queue.claim_job("test"))
+
+    assert job["status"] == "dead"
+    assert job["attempts"] == 2
+    assert pool.stats == {"processed": 0, "retried": 1, "dead_lettered": 1, "duplicates": 0, "coalesced": 0,
+                          "rate_limited": 0}
+
+
+@pytest.mark.asyncio
+async def test_permanent_error_dead_letters_immediately(fake):
+    await queue.enqueue(EVENT)
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    handler = AsyncMock(side_effect=UnknownAthleteError("No user found for Strava Athlete ID: 777"))
+
+    with patch("services.strava_service.handle_webhook_event", handler):
+        await pool.run_job(await queue.claim_job("test"))
+
+    [job] = fake.tables["webhook_jobs"]
+    assert job["status"] == "dead"
+    assert job["attempts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_dead_letter_reports_the_coalesced_action(fake):
+    await queue.enqueue(EVENT)
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    job = {**await queue.claim_job("test"), "effective_aspect": "delete"}
+
+    fake.seed("user_settings", [{"user_id": "dc43c3a8-1234-5678-9abc-def012345678", "strava_athlete_id": "777"}])
+
+    with patch.object(queue, "analytics_track") as track, \
+         patch.object(strava_service, "athlete_directory", strava_service.AthleteDirectory()), \
+         patch.object(queue, "WEBHOOK_MAX_ATTEMPTS", 1):
+        await pool._fail(job, ValueError("bad payload"), "bad payload")
+
+    # Tracked under the app user, like the rest of their analytics
+    user_id, event, properties = track.call_args.args
+    assert user_id == "dc43c3a8-1234-5678-9abc-def012345678"
+    assert properties["aspect_type"] == "delete"
+
+
+@pytest.mark.asyncio
+async def test_dead_letter_for_unknown_athlete_is_not_tracked(fake):
+    await queue.enqueue(EVENT)
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    handler = AsyncMock(side_effect=UnknownAthleteError("No user found for Strava Athlete ID: 777"))
+
+    with patch("services.strava_service.handle_webhook_event", handler), \
+         patch.object(strava_service, "athlete_directory", strava_service.AthleteDirectory()), \
+         patch.object(queue, "analytics_track") as track:
+        await pool.run_job(await queue.claim_job("test"))
+
+    assert fake.tables["webhook_jobs"][0]["status"] == "dead"
+    track.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cached_unknown_athlete_is_retried(fake):
+    # The negative cache may predate a reconnect handled by another worker
+    await queue.enqueue(EVENT)
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    handler = AsyncMock(side_effect=UnknownAthleteError("No user found for Strava Athlete ID: 777", cached=True))
+
+    with patch("services.strava_service.handle_webhook_event", handler):
+        await pool.run_job(await queue.claim_job("test"))
+
+    [job] = fake.tables["webhook_jobs"]
+    assert job["status"] == "pending"
+    assert job["attempts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_job_waits_for_reset_without_an_attempt(fake):
+    await queue.enqueue(EVENT)
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    window_start = 1_760_000_400.0
+    limiter = RateLimiter(clock=lambda: window_start + 10)
+    limiter.exhaust()  # 429: nothing left until the 15-minute window resets
+
+    async def handler(*args):
+        await limiter.acquire(Lane.WEBHOOK)
+
+    with patch("services.strava_service.handle_webhook_event", handler):
+        await pool.run_job(await queue.claim_job("test"))
+
+    [job] = fake.tables["webhook_jobs"]
+    assert job["status"] == "pending"
+    assert job["attempts"] == 0
+    assert datetime.fromisoformat(job["run_after"]).timestamp() == window_start + 900 + 1
+    assert pool.stats["rate_limited"] == 1 and pool.stats["retried"] == 0
+
+
+def test_backoff_grows_and_caps():
+    with patch.object(queue.random, "uniform", return_value=1.0):
+        delays = [queue.backoff_seconds(n) for n in range(1, 12)]
+    assert delays[0] == queue.WEBHOOK_BACKOFF_BASE_SECONDS
+    assert delays == sorted(delays)
+    assert delays[-1] == queue.WEBHOOK_BACKOFF_MAX_SECONDS
+
+
+def test_coalesce_events_merge_rules():
+    create = {"aspect_type": "create", "event_time": 1}
+    title = {"aspect_type": "update", "event_time": 2, "updates": {"title": "Morning Run"}}
+    retitle = {"aspect_type": "update", "event_time": 3, "updates": {"title": "Tempo", "private": "true"}}
+    delete = {"aspect_type": "delete", "event_time": 4}
+
+    assert queue.coalesce_events([create, title, retitle]) == ("create", None)
+    assert queue.coalesce_events([retitle, title]) == ("update", {"title": "Tempo", "private": "true"})
+    assert queue.coalesce_events([title, delete, create]) == ("delete", None)
+
+
+@pytest.mark.asyncio
+async def test_burst_is_processed_once(fake):
+    await queue.enqueue(EVENT)
+    await queue.enqueue({**EVENT, "aspect_type": "update", "event_time": EVENT["event_time"] + 5,
+                         "updates": {"title": "Tempo"}})
+    await queue.enqueue({**EVENT, "aspect_type": "update", "event_time": EVENT["event_time"] + 9,
+                         "updates": {"private": "true"}})
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    handler = AsyncMock()
+
+    with patch("services.strava_service.handle_webhook_event", handler):
+        job = await queue.claim_job("test")
+        await pool.run_job(job)
+        assert await queue.claim_job("test") is None
+
+    handler.assert_awaited_once_with(12345, 777, "create", None)
+    jobs = fake.tables["webhook_jobs"]
+    assert {j["status"] for j in jobs} == {"done"}
+    assert sorted(j.get("coalesced_into") or "" for j in jobs) == ["", job["id"], job["id"]]
+    assert pool.stats["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_delete_cancels_queued_create(fake):
+    with patch.object(queue, "WEBHOOK_COALESCE_SECONDS", 60):
+        await queue.enqueue(EVENT)
+        await queue.enqueue({**EVENT, "aspect_type": "delete", "event_time": EVENT["event_time"] + 30})
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    handler = AsyncMock()
+
+    with patch("services.strava_service.handle_webhook_event", handler):
+        # Only the delete is due; it retires the create still in its window
+        job = await queue.claim_job("test")
+        assert job["aspect_type"] == "delete"
+        await pool.run_job(job)
+
+    handler.assert_awaited_once_with(12345, 777, "delete", None)
+    assert {j["status"] for j in fake.tables["webhook_jobs"]} == {"done"}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_jobs_run_in_backfill_lane(fake):
+    lanes = []
+
+    async def handler(*args):
+        lanes.append(strava_client._current_lane.get())
+
+    pool = queue.WebhookWorkerPool(workers=0, worker_id="test")
+    with patch("services.strava_service.handle_webhook_event", handler):
+        await queue.enqueue({**EVENT, "source": "reconcile"})
+        await pool.run_job(await queue.claim_job("test"))
+
+        # A live update for the same activity lifts the repair to the webhook lane
+        await queue.enqueue({**EVENT, "object_id": 54321, "source": "reconcile"})
+        await queue.enqueue({**EVENT, "object_id": 54321, "aspect_type": "update",
+                             "event_time": EVENT["event_time"] + 5, "updates": {"title": "Tempo"}})
+        await pool.run_job(await queue.claim_job("test"))
+
+    assert lanes == [Lane.BACKFILL, Lane.WEBHOOK]